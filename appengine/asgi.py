@@ -0,0 +1,4 @@
+from drs.asgi import create_asgi_app
+
+# run with an asyncio worker, e.g., gunicorn -k uvicorn.workers.UvicornWorker asgi:app
+app = create_asgi_app()
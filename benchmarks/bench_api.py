@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+Load test of the file API.  HEAD, GET and PUT requests are driven through the Flask test client at a fixed concurrency
+against a local blobstore, and their latency and throughput are compared with a stored baseline.  The exit status is
+non-zero if any metric regressed by more than the tolerance.
+
+Baselines depend on the machine they were recorded on; record a new one with --update-baseline before comparing
+changes on a different machine.
+"""
+import argparse
+import datetime
+import io
+import json
+import os
+import sys
+import typing
+from uuid import uuid4
+
+from dcplib.checksumming_io import ChecksummingSink
+from dcplib.s3_multipart import get_s3_multipart_chunk_size
+
+pkg_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))  # noqa
+sys.path.insert(0, pkg_root)  # noqa
+
+import drs
+from drs import storage
+from drs.util.version import datetime_to_version_format
+from benchmarks.harness import compare, load_baseline, run_concurrently, save_baseline
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+STAGING_BUCKET = "bench-staging"
+
+
+def stage_file(handle: typing.Any, data: bytes) -> str:
+    """Upload `data` to the staging bucket with the checksums the staging area sets, and return its URL."""
+    with ChecksummingSink(write_chunk_size=get_s3_multipart_chunk_size(len(data))) as sink:
+        sink.write(data)
+        sums = sink.get_checksums()
+    metadata = {f"hca-dss-{name}": sums[name].lower() for name in ("crc32c", "s3_etag", "sha1", "sha256")}
+    key = f"staging/{uuid4()}"
+    handle.upload_file_handle(STAGING_BUCKET, key, io.BytesIO(data), "application/octet-stream", metadata)
+    return f"gs://{STAGING_BUCKET}/{key}"
+
+
+def new_version() -> str:
+    return datetime_to_version_format(datetime.datetime.utcnow())
+
+
+def put_file(client: typing.Any, uuid: str, version: str, source_url: str) -> None:
+    response = client.put(
+        f"/v1/files/{uuid}?version={version}",
+        data=json.dumps(dict(creator_uid=123, source_url=source_url)),
+        headers={'Content-Type': "application/json"})
+    assert response.status_code in (200, 201), response.data
+
+
+def run(args: argparse.Namespace) -> dict:
+    app = drs.create_app()
+    app.app.config['TESTING'] = True
+    handle = storage.get_blobstore_handle()
+
+    # the files that HEAD and GET requests are made for.
+    source_url = stage_file(handle, os.urandom(args.size))
+    client = app.app.test_client()
+    fqids = [(str(uuid4()), new_version()) for _ in range(args.files)]
+    for uuid, version in fqids:
+        put_file(client, uuid, version, source_url)
+
+    def setup():
+        return app.app.test_client()
+
+    def head(client, i):
+        uuid, version = fqids[i % len(fqids)]
+        assert client.head(f"/v1/files/{uuid}?version={version}").status_code == 200
+
+    def get(client, i):
+        uuid, _ = fqids[i % len(fqids)]
+        assert client.get(f"/v1/files/{uuid}").status_code == 302
+
+    def put(client, i):
+        put_file(client, str(uuid4()), new_version(), source_url)
+
+    results = dict()
+    for name, operation in (('head', head), ('get_latest', get), ('put', put)):
+        results[f"{name}_c{args.concurrency}"] = run_concurrently(operation, setup, args.requests, args.concurrency)
+    return results
+
+
+def main(argv: typing.List[str]) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000, help="number of requests of each kind")
+    parser.add_argument("--concurrency", type=int, default=8, help="number of requests in flight at once")
+    parser.add_argument("--files", type=int, default=100, help="number of files to make HEAD and GET requests for")
+    parser.add_argument("--size", type=int, default=1024, help="size of each file, in bytes")
+    parser.add_argument("--latency", type=float, default=0.001, help="seconds added to every blobstore call")
+    parser.add_argument("--backend", choices=("memory", "filesystem"), default="memory")
+    parser.add_argument("--root", help="directory of the filesystem blobstore")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="fraction by which a metric may be worse than the baseline")
+    parser.add_argument("--update-baseline", action="store_true", help="store the results as the new baseline")
+    args = parser.parse_args(argv)
+
+    os.environ['DRS_BLOBSTORE'] = args.backend
+    os.environ['DRS_BLOBSTORE_LATENCY'] = str(args.latency)
+    if args.backend == "filesystem":
+        if args.root is None:
+            parser.error("--root is required for the filesystem backend")
+        os.environ['DRS_BLOBSTORE_ROOT'] = args.root
+    os.environ['DRS_BUCKET'] = "bench"
+    os.environ.setdefault('DRS_API_VERSION', "v1")
+
+    results = run(args)
+    regressions = compare(results, load_baseline(args.baseline), args.tolerance)
+    if args.update_baseline:
+        save_baseline(args.baseline, results)
+        return 0
+    for regression in regressions:
+        print(f"REGRESSION: {regression}")
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,143 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+Throughput of one worker serving HEAD requests for the latest versions of files, through the Flask app in a pool of
+threads (the synchronous gunicorn workers) and through the ASGI app on an event loop (drs.asgi).  Each request makes
+one or two reads of a local blobstore that waits --latency seconds per call, which stands in for the round trips to GCS
+that bound the throughput of the synchronous workers.  The metadata and latest-version caches are disabled, so that
+every request waits on the blobstore.  The exit status is non-zero if any metric regressed by more than the tolerance.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+import typing
+from unittest import mock
+from uuid import uuid4
+
+pkg_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))  # noqa
+sys.path.insert(0, pkg_root)  # noqa
+
+import drs
+from drs import storage
+from drs.asgi import create_asgi_app
+from drs.storage import FileMetadata, files
+from drs.storage.files import update_latest_version, write_file_metadata
+from drs.util.cache import LRUCache, StaleWhileRevalidateCache
+from benchmarks.harness import compare, load_baseline, run_concurrently, save_baseline, summarize
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+VERSION = "2018-01-01T000000.000000Z"
+
+
+def write_files(count: int) -> typing.List[str]:
+    handle = storage.get_blobstore_handle()
+    uuids = [str(uuid4()) for _ in range(count)]
+    for uuid in uuids:
+        metadata = {
+            FileMetadata.FORMAT: FileMetadata.FILE_FORMAT_VERSION,
+            FileMetadata.CREATOR_UID: 0,
+            FileMetadata.VERSION: VERSION,
+            FileMetadata.CONTENT_TYPE: "application/octet-stream",
+            FileMetadata.SIZE: 3,
+            FileMetadata.CRC32C: "352441c2",
+            FileMetadata.S3_ETAG: "900150983cd24fb0d6963f7d28e17f72",
+            FileMetadata.SHA1: "a9993e364706816aba3e25717850c26c9cd0d89d",
+            FileMetadata.SHA256: "ba7816bf8f01cfea414140de5dae2223b00361a396177a9cb410ff61f20015ad",
+        }
+        write_file_metadata(handle, "bench", uuid, VERSION, json.dumps(metadata))
+        update_latest_version(handle, "bench", uuid, VERSION)
+    return uuids
+
+
+def run_sync(uuids: typing.List[str], requests: int, threads: int) -> dict:
+    app = drs.create_app()
+    app.app.config['TESTING'] = True
+
+    def head(client, i):
+        assert client.head(f"/v1/files/{uuids[i % len(uuids)]}").status_code == 200
+
+    return run_concurrently(head, app.app.test_client, requests, threads)
+
+
+def run_async(uuids: typing.List[str], requests: int, concurrency: int) -> dict:
+    app = create_asgi_app()
+    indices = iter(range(requests))
+    latencies = list()  # type: typing.List[float]
+
+    async def head(uuid: str) -> None:
+        scope = dict(type="http", http_version="1.1", method="HEAD", scheme="http", path=f"/v1/files/{uuid}",
+                     root_path="", query_string=b"", headers=[(b"host", b"localhost")], server=("localhost", 80))
+        status = list()
+
+        async def receive():
+            return dict(type="http.request", body=b"", more_body=False)
+
+        async def send(message):
+            if message['type'] == "http.response.start":
+                status.append(message['status'])
+
+        await app(scope, receive, send)
+        assert status == [200], status
+
+    async def worker():
+        for i in indices:
+            start = time.perf_counter()
+            await head(uuids[i % len(uuids)])
+            latencies.append(time.perf_counter() - start)
+
+    async def main():
+        # the first request builds the reader, which is not part of serving.
+        await head(uuids[0])
+        start = time.perf_counter()
+        await asyncio.gather(*[worker() for _ in range(concurrency)])
+        return time.perf_counter() - start
+
+    loop = asyncio.new_event_loop()
+    try:
+        elapsed = loop.run_until_complete(main())
+    finally:
+        loop.close()
+    return summarize(latencies, elapsed)
+
+
+def main(argv: typing.List[str]) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000, help="number of requests through each path")
+    parser.add_argument("--threads", type=int, default=8, help="number of threads of the synchronous worker")
+    parser.add_argument("--concurrency", type=int, default=64, help="number of requests in flight on the event loop")
+    parser.add_argument("--files", type=int, default=1000, help="number of files to make requests for")
+    parser.add_argument("--latency", type=float, default=0.005, help="seconds added to every blobstore call")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="fraction by which a metric may be worse than the baseline")
+    parser.add_argument("--update-baseline", action="store_true", help="store the results as the new baseline")
+    args = parser.parse_args(argv)
+
+    os.environ['DRS_BLOBSTORE'] = "memory"
+    os.environ['DRS_BLOBSTORE_LATENCY'] = "0"
+    os.environ['DRS_BUCKET'] = "bench"
+    os.environ.setdefault('DRS_API_VERSION', "v1")
+
+    uuids = write_files(args.files)
+    storage.get_blobstore_handle().handle.latency = args.latency
+    with mock.patch.object(files, "metadata_cache", LRUCache(0)), \
+            mock.patch.object(files, "latest_version_cache", StaleWhileRevalidateCache(0, 0, 0)):
+        results = {
+            f"head_latest_sync_t{args.threads}": run_sync(uuids, args.requests, args.threads),
+            f"head_latest_async_c{args.concurrency}": run_async(uuids, args.requests, args.concurrency),
+        }
+    regressions = compare(results, load_baseline(args.baseline), args.tolerance)
+    if args.update_baseline:
+        save_baseline(args.baseline, results)
+        return 0
+    for regression in regressions:
+        print(f"REGRESSION: {regression}")
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+Startup benchmark.  Each run starts a fresh interpreter that imports the app, builds it with create_app, and serves
+one request, and reports how long each step took.  Runs are made with the compiled API specification, and without it
+for comparison.  The median of each step is compared with the stored baseline.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+import typing
+
+pkg_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))  # noqa
+sys.path.insert(0, pkg_root)  # noqa
+
+from drs.spec import compile_spec
+from benchmarks.harness import compare, load_baseline, percentile, save_baseline
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+CHILD = """
+import json, sys, time
+start = time.perf_counter()
+sys.path.insert(0, {pkg_root!r})
+import drs
+imported = time.perf_counter()
+if not {compiled!r}:
+    drs.load_compiled_spec = lambda: None
+app = drs.create_app()
+created = time.perf_counter()
+app.app.test_client().head("/v1/files/5a7c8e3e-0d4f-4a36-9a55-0c6d3bd9e4e1")
+responded = time.perf_counter()
+print(json.dumps(dict(
+    import_ms=(imported - start) * 1000,
+    create_app_ms=(created - imported) * 1000,
+    first_request_ms=(responded - created) * 1000,
+)))
+"""
+
+
+def run_once(compiled: bool) -> dict:
+    env = dict(os.environ, DRS_BLOBSTORE="memory", DRS_BUCKET="bench", DRS_API_VERSION="v1")
+    start = time.perf_counter()
+    output = subprocess.check_output(
+        [sys.executable, "-W", "ignore", "-c", CHILD.format(pkg_root=pkg_root, compiled=compiled)], env=env)
+    timings = json.loads(output.decode("utf-8").splitlines()[-1])
+    timings['process_ms'] = (time.perf_counter() - start) * 1000
+    return timings
+
+
+def run(runs: int, compiled: bool) -> dict:
+    samples = [run_once(compiled) for _ in range(runs)]
+    return {
+        metric: round(percentile(sorted(sample[metric] for sample in samples), 0.5), 3)
+        for metric in samples[0]
+    }
+
+
+def main(argv: typing.List[str]) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10, help="number of interpreters to start for each configuration")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="fraction by which a metric may be worse than the baseline")
+    parser.add_argument("--update-baseline", action="store_true", help="store the results as the new baseline")
+    args = parser.parse_args(argv)
+
+    compile_spec()
+    results = dict(
+        startup=run(args.runs, compiled=True),
+        startup_uncompiled_spec=run(args.runs, compiled=False),
+    )
+    regressions = compare(results, load_baseline(args.baseline), args.tolerance)
+    if args.update_baseline:
+        save_baseline(args.baseline, results)
+        return 0
+    for regression in regressions:
+        print(f"REGRESSION: {regression}")
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+Microbenchmark of the validation of version parameters, which runs on every request that names a version.  Reports the
+cost per call of the full parse, and of the fast check for versions that have not been seen before and for versions that
+are in its cache.
+"""
+import argparse
+import datetime
+import os
+import sys
+import timeit
+import typing
+
+pkg_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))  # noqa
+sys.path.insert(0, pkg_root)  # noqa
+
+from drs import _check_DSS_VERSION, is_DSS_VERSION
+from drs.util import version
+from drs.util.version import datetime_to_version_format
+from benchmarks.harness import compare, load_baseline, save_baseline
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+
+def per_call_us(function: typing.Callable[[str], typing.Any], versions: typing.List[str], repeat: int) -> float:
+    """The lowest of `repeat` measurements of the mean cost of calling `function` on each of `versions`."""
+    def run():
+        for val in versions:
+            function(val)
+    return round(min(timeit.repeat(run, number=1, repeat=repeat)) / len(versions) * 1e6, 3)
+
+
+def main(argv: typing.List[str]) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--versions", type=int, default=10000, help="number of distinct versions")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="fraction by which a metric may be worse than the baseline")
+    parser.add_argument("--update-baseline", action="store_true", help="store the results as the new baseline")
+    args = parser.parse_args(argv)
+
+    start = datetime.datetime(2018, 1, 1)
+    versions = [datetime_to_version_format(start + datetime.timedelta(microseconds=7919 * i))
+                for i in range(args.versions)]
+
+    def cold(val):
+        version._is_version_format.cache_clear()
+        return is_DSS_VERSION(val)
+
+    results = dict(version_check=dict(
+        full_parse_us=per_call_us(_check_DSS_VERSION, versions, args.repeat),
+        uncached_us=per_call_us(cold, versions, args.repeat),
+        cached_us=per_call_us(is_DSS_VERSION, versions[:100], args.repeat * 100),
+    ))
+    regressions = compare(results, load_baseline(args.baseline), args.tolerance)
+    if args.update_baseline:
+        save_baseline(args.baseline, results)
+        return 0
+    for regression in regressions:
+        print(f"REGRESSION: {regression}")
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,114 @@
+"""
+Helpers shared by the benchmarks: timing operations at a fixed concurrency, summarizing the latencies, and comparing
+the summaries against a stored baseline.
+"""
+import json
+import math
+import os
+import threading
+import time
+import typing
+
+
+def percentile(sorted_values: typing.Sequence[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already-sorted, non-empty sequence."""
+    rank = max(1, math.ceil(fraction * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize(latencies: typing.List[float], elapsed: float) -> dict:
+    latencies = sorted(latencies)
+    return dict(
+        requests=len(latencies),
+        p50_ms=round(percentile(latencies, 0.50) * 1000, 3),
+        p99_ms=round(percentile(latencies, 0.99) * 1000, 3),
+        throughput_rps=round(len(latencies) / elapsed, 1),
+    )
+
+
+def run_concurrently(
+        operation: typing.Callable[[typing.Any, int], None],
+        setup: typing.Callable[[], typing.Any],
+        requests: int,
+        concurrency: int) -> dict:
+    """
+    Call `operation(state, i)` for i in range(requests) from `concurrency` threads, and summarize the latencies.  Each
+    thread calls `setup()` once to build its own state (e.g., a test client) before the clock starts.
+    """
+    indices = iter(range(requests))
+    indices_lock = threading.Lock()
+    ready = threading.Barrier(concurrency + 1)
+    latencies = list()  # type: typing.List[float]
+    errors = list()  # type: typing.List[BaseException]
+
+    def worker():
+        state = setup()
+        ready.wait()
+        while True:
+            with indices_lock:
+                i = next(indices, None)
+            if i is None:
+                return
+            start = time.perf_counter()
+            try:
+                operation(state, i)
+            except BaseException as ex:
+                errors.append(ex)
+                return
+            latencies.append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    ready.wait()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    if errors:
+        raise errors[0]
+    return summarize(latencies, elapsed)
+
+
+def load_baseline(path: str) -> dict:
+    if not os.path.exists(path):
+        return dict()
+    with open(path) as fh:
+        return json.load(fh)
+
+
+def save_baseline(path: str, results: dict) -> None:
+    """Store `results` in the baseline, keeping the baselines of benchmarks that were not run."""
+    baseline = load_baseline(path)
+    baseline.update(results)
+    with open(path, "w") as fh:
+        json.dump(baseline, fh, indent=4, sort_keys=True)
+        fh.write("\n")
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> typing.List[str]:
+    """
+    Print each result next to its baseline, and return a description of every metric that is worse than the baseline by
+    more than `tolerance` (a fraction).  Metrics ending in "_ms" or "_us" are better when lower, and those ending in
+    "_rps" are better when higher; other values are not compared.
+    """
+    regressions = list()
+    for name, result in sorted(results.items()):
+        expected = baseline.get(name, dict())
+        parts = list()
+        for metric, value in sorted(result.items()):
+            if metric.endswith(("_ms", "_us")):
+                higher_is_better = False
+            elif metric.endswith("_rps"):
+                higher_is_better = True
+            else:
+                continue
+            part = f"{metric}={value:.2f}"
+            if metric in expected:
+                change = value / expected[metric] - 1
+                part += f" ({change:+.0%})"
+                if (-change if higher_is_better else change) > tolerance:
+                    regressions.append(f"{name} {metric}: {value:.2f} vs. {expected[metric]:.2f}")
+            parts.append(part)
+        print(f"{name:<24}" + "  ".join(parts) + ("" if expected else "  (no baseline)"))
+    return regressions
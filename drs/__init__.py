@@ -4,8 +4,11 @@ import json
 import requests
 import logging
 import functools
+import time
 import traceback
+import typing
 
+import flask
 from flask import jsonify
 from six.moves import http_client
 
@@ -17,11 +20,16 @@ from connexion.lifecycle import ConnexionResponse
 import connexion
 from connexion.resolver import RestyResolver
 from connexion.exceptions import OAuthProblem, OAuthResponseProblem, OAuthScopeProblem
+from iso8601 import iso8601
 from jsonschema import draft4_format_checker
 from flask import Response as FlaskResponse
 from werkzeug.exceptions import Forbidden
 
-from drs.util.version import datetime_to_version_format
+from drs.spec import load_compiled_spec
+from drs.util import metrics
+from drs.util.metrics import timed
+from drs.util.ratelimit import RateLimiter
+from drs.util.version import datetime_to_version_format, is_version_format
 
 
 logger = logging.getLogger(__name__)
@@ -43,16 +51,13 @@ class DRSApp(connexion.App):
         In both cases, the exception would be punted here, and we return this very generic error that also happens to
         bypass all validation.
         """
-        problem = {
-            'status': requests.codes.server_error,
-            'code': "unhandled_exception",
-            'title': str(exception),
-            'stacktrace': traceback.format_exc(),
-        }
         if isinstance(exception, (OAuthProblem, OAuthResponseProblem, OAuthScopeProblem, Forbidden)):
-            problem['status'] = exception.code
-            problem['code'] = exception.__class__.__name__
-            problem['title'] = exception.description
+            problem = problem_body(exception.code, exception.__class__.__name__, exception.description)
+        elif isinstance(exception, werkzeug.exceptions.HTTPException):
+            # e.g., a request for a path that does not exist.
+            problem = problem_body(exception.code, exception.name, exception.description)
+        else:
+            problem = problem_body(requests.codes.server_error, "unhandled_exception", str(exception), expected=False)
         return FlaskApi.get_response(ConnexionResponse(
             status_code=problem['status'],
             mimetype="application/problem+json",
@@ -74,17 +79,45 @@ class DSSBindingException(DRSException):
         super().__init__(requests.codes.bad_request, "illegal_arguments", title, *args, **kwargs)
 
 
+# stack traces of unexpected errors are logged at most this often, so that a storm of errors does not also become a
+# storm of logging.
+_stacktrace_log_limiter = RateLimiter(
+    rate=float(os.environ.get("DRS_STACKTRACE_LOG_RATE", 1)),
+    burst=int(os.environ.get("DRS_STACKTRACE_LOG_BURST", 10)))
+
+
+def problem_body(status: int, code: str, title: str, expected: bool = True) -> dict:
+    """
+    Builds the problem+json body of an error response for the exception being handled.  Formatting a stack trace costs
+    more than serving most requests, so one is only included for unexpected errors, unless DRS_ERROR_MODE is "debug".
+    """
+    problem = {
+        'status': status,
+        'code': code,
+        'title': title,
+    }  # type: typing.Dict[str, typing.Any]
+    if expected and os.environ.get("DRS_ERROR_MODE", "production") != "debug":
+        logger.debug("Returning error %s %s: %s", status, code, title)
+        return problem
+    problem['stacktrace'] = traceback.format_exc()
+    if expected:
+        logger.error(problem['stacktrace'])
+    else:
+        suppressed = _stacktrace_log_limiter.acquire()
+        if suppressed is not None:
+            if suppressed:
+                logger.error("%s(%d earlier errors were not logged)", problem['stacktrace'], suppressed)
+            else:
+                logger.error(problem['stacktrace'])
+    return problem
+
+
 def drs_exception_handler(e: DRSException) -> FlaskResponse:
     return FlaskResponse(
         status=e.status,
         mimetype="application/problem+json",
         content_type="application/problem+json",
-        response=json.dumps({
-            'status': e.status,
-            'code': e.code,
-            'title': e.message,
-            'stacktrace': traceback.format_exc(),
-        }))
+        response=json.dumps(problem_body(e.status, e.code, e.message)))
 
 
 def unexpected_error(e):
@@ -103,36 +136,21 @@ def drs_handler(func):
         try:
             return func(*args, **kwargs)
         except werkzeug.exceptions.HTTPException as ex:
-            status = ex.code
-            code = ex.name
-            title = str(ex)
-            stacktrace = traceback.format_exc()
+            problem = problem_body(ex.code, ex.name, str(ex))
             headers = None
         except DRSException as ex:
-            status = ex.status
-            code = ex.code
-            title = ex.message
-            stacktrace = traceback.format_exc()
+            problem = problem_body(ex.status, ex.code, ex.message)
             headers = None
         except Exception as ex:
-            status = requests.codes.server_error
-            code = "unhandled_exception"
-            title = str(ex)
-            stacktrace = traceback.format_exc()
+            problem = problem_body(requests.codes.server_error, "unhandled_exception", str(ex), expected=False)
             headers = None
-        logger.error(stacktrace)
 
         return ConnexionResponse(
-            status_code=status,
+            status_code=problem['status'],
             mimetype="application/problem+json",
             content_type="application/problem+json",
             headers=headers,
-            body={
-                'status': status,
-                'code': code,
-                'title': title,
-                'stacktrace': stacktrace,
-            })
+            body=problem)
 
     return wrapper
 
@@ -145,7 +163,13 @@ def is_DSS_VERSION(val):
     :param val: the value to verify
     :return: the verified value
     """
-    from iso8601 import iso8601
+    if is_version_format(val):
+        return val
+    # the full check is only needed to explain why the value was rejected.
+    return _check_DSS_VERSION(val)
+
+
+def _check_DSS_VERSION(val):
     # convert it to date-time so we can format exactly as the system requires (with microsecond precision)
     try:
         timestamp = iso8601.parse_date(val)
@@ -175,7 +199,8 @@ class DSSParameterValidator(ParameterValidator):
 
     @staticmethod
     def validate_parameter(*args, **kwargs):
-        result = ParameterValidator.validate_parameter(*args, **kwargs)
+        with timed("validate_parameter"):
+            result = ParameterValidator.validate_parameter(*args, **kwargs)
         if result is not None:
             raise DSSBindingException(result)
         return result
@@ -188,21 +213,11 @@ class DSSParameterValidator(ParameterValidator):
             try:
                 return origwrapper(request)
             except DSSBindingException as ex:
-                status = ex.status
-                code = ex.code
-                title = ex.message
-                stacktrace = traceback.format_exc()
-
                 return FlaskApi.get_response(ConnexionResponse(
-                    status_code=status,
+                    status_code=ex.status,
                     mimetype="application/problem+json",
                     content_type="application/problem+json",
-                    body={
-                        'status': status,
-                        'code': code,
-                        'title': title,
-                        'stacktrace': stacktrace,
-                    },
+                    body=problem_body(ex.status, ex.code, ex.message),
                 ))
 
         return wrapper
@@ -219,7 +234,8 @@ class DSSRequestBodyValidator(RequestBodyValidator):
     """
 
     def validate_schema(self, *args, **kwargs):
-        result = super().validate_schema(*args, **kwargs)
+        with timed("validate_body"):
+            result = super().validate_schema(*args, **kwargs)
         if result is not None:
             raise DSSBindingException(result.body['detail'])
         return result
@@ -232,26 +248,23 @@ class DSSRequestBodyValidator(RequestBodyValidator):
             try:
                 return origwrapper(request)
             except DSSBindingException as ex:
-                status = ex.status
-                code = ex.code
-                title = ex.message
-                stacktrace = traceback.format_exc()
-
                 return FlaskApi.get_response(ConnexionResponse(
-                    status_code=status,
+                    status_code=ex.status,
                     mimetype="application/problem+json",
                     content_type="application/problem+json",
-                    body={
-                        'status': status,
-                        'code': code,
-                        'title': title,
-                        'stacktrace': stacktrace,
-                    },
+                    body=problem_body(ex.status, ex.code, ex.message),
                 ))
 
         return wrapper
 
 
+class PrevalidatedFlaskApi(FlaskApi):
+    """FlaskApi for a specification that was validated when it was compiled.  See drs.spec."""
+
+    def _validate_spec(self, spec):
+        pass
+
+
 def create_app():
     app = DRSApp(
         __name__,
@@ -261,6 +274,41 @@ def create_app():
         },
     )
     base_path = "/" + os.environ['DRS_API_VERSION']
-    app.add_api("../drs-api.yml", base_path=base_path, resolver=RestyResolver("drs.api"))
+    spec = load_compiled_spec()
+    if spec is None:
+        app.add_api("../drs-api.yml", base_path=base_path, resolver=RestyResolver("drs.api"))
+    else:
+        app.api_cls = PrevalidatedFlaskApi
+        app.add_api(spec, base_path=base_path, resolver=RestyResolver("drs.api"))
     app.add_error_handler(DRSException, drs_exception_handler)
+    add_metrics(app.app)
     return app
+
+
+def add_metrics(flask_app):
+    """
+    Time every request, and serve the timings at /metrics in the Prometheus text format.  If DRS_SERVER_TIMING is set,
+    each response also carries a Server-Timing header with the breakdown of its own request.
+    """
+    server_timing = os.environ.get("DRS_SERVER_TIMING", "false").lower() in ("1", "true")
+
+    @flask_app.before_request
+    def start_timer():
+        flask.g.request_start = time.perf_counter()
+        if server_timing:
+            metrics.start_request()
+
+    @flask_app.after_request
+    def stop_timer(response):
+        start = getattr(flask.g, 'request_start', None)
+        if start is not None:
+            metrics.registry.observe("request", time.perf_counter() - start)
+        spans = metrics.current_request()
+        if server_timing and spans is not None:
+            response.headers['Server-Timing'] = spans.server_timing()
+        return response
+
+    def get_metrics():
+        return FlaskResponse(metrics.registry.render(), mimetype="text/plain; version=0.0.4")
+
+    flask_app.add_url_rule("/metrics", "metrics", get_metrics)
@@ -3,20 +3,33 @@ import json
 import logging
 import os
 import re
+import threading
 import time
 import typing
 from enum import Enum, auto
 from uuid import uuid4
 
 import requests
-from cloud_blobstore import BlobAlreadyExistsError, BlobNotFoundError
+from cloud_blobstore import BlobAlreadyExistsError, BlobNotFoundError, BlobStore
 from dcplib.s3_multipart import AWS_MIN_CHUNK_SIZE
-from flask import jsonify, make_response, redirect, request
+from flask import Response, jsonify, make_response, redirect, request
+from werkzeug.datastructures import ETags
+from werkzeug.http import quote_etag
 
-from drs import DRSException, drs_handler
+from drs import DRSException, drs_handler, is_DSS_VERSION
 from drs import storage
-from drs.storage.files import write_file_metadata
-from drs.storage import FileMetadata, HCABlobStore, compose_blob_key
+from drs.storage import reads
+from drs.storage.files import (cached_latest_version_lookup, file_metadata_lookup, read_file_metadata,
+                               update_latest_version, write_file_metadata)
+from drs.storage import BlobPreconditionFailedError, DRSBlobStore, FileMetadata, HCABlobStore
+from drs.storage.blob_index import get_blob_index
+from drs.storage.copy import resumable_copy
+from drs.storage.encoding import encode_file_metadata
+from drs.storage.jobs import (JobStatus, claim_job, create_job, get_job, is_abandoned, job_id_for, replace_job,
+                              update_job)
+from drs.storage.signing import get_url_signer
+from drs.util.concurrency import get_executor
+from drs.util.metrics import timed, timed_iterator
 from drs.util.version import datetime_to_version_format
 
 
@@ -33,59 +46,270 @@ def get(uuid: str, version: str = None, token: str = None):
     return get_helper(uuid, version, token)
 
 
+@timed("get_helper")
 def get_helper(uuid: str, version: str = None, token: str = None):
     handle = storage.get_blobstore_handle()
     bucket = os.environ['DRS_BUCKET']
+    mode = get_redirect_mode()
+    cacheable = is_cacheable(request.method, mode)
+    versioned = version is not None
+
+    version, file_metadata = lookup_file_metadata(
+        handle, bucket, uuid, version, request.if_none_match if cacheable else None)
+    if file_metadata is None:
+        return not_modified(uuid, version, versioned)
+
+    if request.method == "GET":
+        if mode == "proxy":
+            response = proxy_response(handle, bucket, file_metadata.blob_key, file_metadata)
+        else:
+            response = redirect(redirect_url(bucket, file_metadata.blob_key, mode))
+    else:
+        response = make_response('', 200)
+
+    response.headers.extend(file_metadata.headers)
+    if cacheable:
+        response.headers.extend(cache_headers(uuid, version, versioned))
+
+    return response
+
+
+def get_redirect_mode() -> str:
+    """How GET serves file contents: "public" or "signed" redirects, or "proxy"."""
+    return os.environ.get("DRS_GET_REDIRECT", "public")
 
-    if version is None:
-        # list the files and find the one that is the most recent.
-        prefix = "files/{}.".format(uuid)
-        for matching_file in handle.list(bucket, prefix):
-            matching_file = matching_file[len(prefix):]
-            if version is None or matching_file > version:
-                version = matching_file
 
+def is_cacheable(method: str, mode: str) -> bool:
+    # signed URLs expire, so a redirect to one must not be reused.
+    return method != "GET" or mode != "signed"
+
+
+def file_lookup(bucket: str, uuid: str, version: typing.Optional[str], if_none_match: typing.Optional[ETags]):
+    """
+    Lookup of what a HEAD or GET needs: the metadata of a version of a file, or of its latest version if `version` is
+    None.  If the client already has that version, according to `if_none_match`, the metadata is not read.  Raises a
+    404 DRSException if there is no such file or version.
+    :return: a tuple of (version, file metadata), where the metadata is None if the client already has the version.
+    """
     if version is None:
-        # no matches!
-        raise DRSException(404, "not_found", "Cannot find file!")
+        version = yield from cached_latest_version_lookup(bucket, uuid)
+        if version is None:
+            raise DRSException(404, "not_found", "Cannot find file!")
+        client_has_version = if_none_match is not None and if_none_match.contains_weak(file_etag(uuid, version))
+    else:
+        # the metadata of a version never changes, so a client that already has it can be answered without a lookup.
+        client_has_version = if_none_match is not None and not if_none_match.star_tag and \
+            if_none_match.contains_weak(file_etag(uuid, version))
+    if client_has_version:
+        return version, None
 
-    # retrieve the file metadata.
-    key = f"files/{uuid}.{version}"
     try:
-        file_metadata = json.loads(handle.get(bucket, key).decode("utf-8"))
+        file_metadata = yield from file_metadata_lookup(bucket, uuid, version)
     except BlobNotFoundError:
         raise DRSException(404, "not_found", "Cannot find file!")
+    return version, file_metadata
 
-    blob_path = compose_blob_key(file_metadata)
 
-    if request.method == "GET":
-        url = f"https://storage.googleapis.com/{bucket}/{blob_path}"
-        response = redirect(url)
+def redirect_url(bucket: str, blob_path: str, mode: str) -> str:
+    if mode == "signed":
+        return get_url_signer().sign(bucket, blob_path)
+    return f"https://storage.googleapis.com/{bucket}/{blob_path}"
+
+
+def file_etag(uuid: str, version: str) -> str:
+    """
+    Returns the entity tag of a file version.  The metadata and contents of a version never change, and versions are
+    never deleted, so its UUID and version identify them exactly.
+    """
+    return f"{uuid.lower()}.{version}"
+
+
+def cache_headers(uuid: str, version: str, versioned: bool) -> typing.List[typing.Tuple[str, str]]:
+    if versioned:
+        cache_control = "public, max-age=31536000, immutable"
     else:
-        response = make_response('', 200)
+        # the latest version can change, so caches must check with us before reusing a response.
+        cache_control = "no-cache"
+    return [('ETag', quote_etag(file_etag(uuid, version))), ('Cache-Control', cache_control)]
+
 
-    headers = response.headers
-    headers['X-DSS-CREATOR-UID'] = file_metadata[FileMetadata.CREATOR_UID]
-    headers['X-DSS-VERSION'] = version
-    headers['X-DSS-CONTENT-TYPE'] = file_metadata[FileMetadata.CONTENT_TYPE]
-    headers['X-DSS-SIZE'] = file_metadata[FileMetadata.SIZE]
-    headers['X-DSS-CRC32C'] = file_metadata[FileMetadata.CRC32C]
-    headers['X-DSS-S3-ETAG'] = file_metadata[FileMetadata.S3_ETAG]
-    headers['X-DSS-SHA1'] = file_metadata[FileMetadata.SHA1]
-    headers['X-DSS-SHA256'] = file_metadata[FileMetadata.SHA256]
+def not_modified(uuid: str, version: str, versioned: bool) -> Response:
+    response = make_response('', requests.codes.not_modified)
+    response.headers.extend(cache_headers(uuid, version, versioned))
+    return response
+
+
+_proxy_streams = None  # type: typing.Optional[threading.BoundedSemaphore]
+_proxy_streams_lock = threading.Lock()
+
+
+def get_proxy_streams() -> threading.BoundedSemaphore:
+    """Returns the semaphore that limits how many responses this process streams at once."""
+    global _proxy_streams
+    with _proxy_streams_lock:
+        if _proxy_streams is None:
+            _proxy_streams = threading.BoundedSemaphore(int(os.environ.get("DRS_PROXY_MAX_STREAMS", 16)))
+        return _proxy_streams
+
+
+def get_proxy_chunk_size() -> int:
+    chunk_size = int(os.environ.get("DRS_PROXY_CHUNK_SIZE", 8 * 1024 * 1024))
+    if chunk_size <= 0:
+        raise ValueError(f"DRS_PROXY_CHUNK_SIZE must be positive, not {chunk_size}")
+    return chunk_size
+
+
+def proxy_response(handle: DRSBlobStore, bucket: str, blob_path: str, file_metadata: FileMetadata) -> Response:
+    """
+    Stream the contents of a blob through the service, one chunk at a time, so that no more than a chunk is held in
+    memory.  A Range header with a single range is honored; any other Range header is ignored, as RFC 7233 allows.
+    """
+    size = int(file_metadata.size)
+    start, stop = 0, size
+    status_code = requests.codes.ok
+    if request.range is not None:
+        byte_range = request.range.range_for_length(size)
+        if byte_range is None and request.range.units == "bytes" and len(request.range.ranges) == 1:
+            response = make_response('', requests.codes.requested_range_not_satisfiable)
+            response.headers['Content-Range'] = f"bytes */{size}"
+            return response
+        if byte_range is not None:
+            start, stop = byte_range
+            status_code = requests.codes.partial_content
+
+    chunk_size = get_proxy_chunk_size()
+
+    def chunks() -> typing.Iterator[bytes]:
+        for offset in range(start, stop, chunk_size):
+            yield handle.get_range(bucket, blob_path, offset, min(offset + chunk_size, stop) - 1)
 
+    response = Response(
+        timed_iterator("proxy.stream", chunks()),
+        status=status_code,
+        content_type=file_metadata.content_type or "application/octet-stream")
+    response.headers['Accept-Ranges'] = "bytes"
+    response.headers['Content-Length'] = stop - start
+    if status_code == requests.codes.partial_content:
+        response.headers['Content-Range'] = f"bytes {start}-{stop - 1}/{size}"
+
+    # nothing can raise between taking a stream slot and handing its release to the response.
+    streams = get_proxy_streams()
+    if not streams.acquire(blocking=False):
+        raise DRSException(
+            requests.codes.service_unavailable, "too_many_streams", "Too many files are being served; try again later")
+    # the stream slot is held until the server is done with the response, however that ends.
+    response.call_on_close(streams.release)
     return response
 
 
+def lookup_file_metadata(handle: BlobStore, bucket: str, uuid: str, version: str = None,
+                         if_none_match: ETags = None) -> typing.Tuple[str, typing.Optional[FileMetadata]]:
+    """See :func:`file_lookup`."""
+    return reads.run(handle, file_lookup(bucket, uuid, version, if_none_match))
+
+
+@drs_handler
+def post_batch(json_request_body: dict):
+    """
+    Resolve the metadata of many files at once.  Lookups run concurrently on a bounded, process-wide pool.  The response
+    is always 200; each item carries its own status.
+    """
+    handle = storage.get_blobstore_handle()
+    bucket = os.environ['DRS_BUCKET']
+    executor = get_executor("batch-lookup", int(os.environ.get("DRS_BATCH_WORKERS", 8)))
+
+    def lookup(item: dict) -> dict:
+        uuid = item['uuid']
+        version = item.get('version')
+        try:
+            if version is not None:
+                is_DSS_VERSION(version)
+            version, file_metadata = lookup_file_metadata(handle, bucket, uuid, version)
+        except DRSException as ex:
+            return dict(uuid=uuid, version=version, status=ex.status, code=ex.code, title=ex.message)
+        except Exception as ex:
+            logger.exception("Unexpected error while resolving file %s", uuid)
+            return dict(
+                uuid=uuid,
+                version=version,
+                status=requests.codes.server_error,
+                code="unhandled_exception",
+                title=str(ex))
+        return dict(uuid=uuid, version=version, status=requests.codes.ok, metadata=file_metadata.to_dict())
+
+    results = list(executor.map(lookup, json_request_body['files']))
+    return jsonify(dict(files=results)), requests.codes.ok
+
+
+class CopyMode(Enum):
+    NO_COPY = auto()
+    COPY_INLINE = auto()
+    COPY_ASYNC = auto()
+
+
 @drs_handler
+@timed("put")
 def put(uuid: str, json_request_body: dict, version: str):
-    class CopyMode(Enum):
-        NO_COPY = auto()
-        COPY_INLINE = auto()
-        COPY_ASYNC = auto()
+    handle = storage.get_blobstore_handle()
+    dst_bucket = os.environ['DRS_BUCKET']
+    status_code, job_id = ingest_file(
+        handle, dst_bucket, uuid, version, json_request_body['source_url'], json_request_body['creator_uid'])
+    body = dict(version=version)
+    if job_id is not None:
+        body['job_id'] = job_id
+    return jsonify(body), status_code
+
+
+@drs_handler
+def put_batch(json_request_body: dict):
+    """
+    Register many staged files at once.  Each file goes through the same steps as a single PUT, on a bounded,
+    process-wide pool.  The response is always 200; each item carries the status a single PUT would have returned.
+    """
+    handle = storage.get_blobstore_handle()
+    dst_bucket = os.environ['DRS_BUCKET']
+    executor = get_executor("batch-ingest", int(os.environ.get("DRS_BATCH_INGEST_WORKERS", 8)))
+
+    def ingest(item: dict) -> dict:
+        uuid = item['uuid']
+        version = item['version']
+        try:
+            is_DSS_VERSION(version)
+            status_code, job_id = ingest_file(
+                handle, dst_bucket, uuid, version, item['source_url'], item['creator_uid'])
+        except DRSException as ex:
+            return dict(uuid=uuid, version=version, status=ex.status, code=ex.code, title=ex.message)
+        except Exception as ex:
+            logger.exception("Unexpected error while registering file %s", uuid)
+            return dict(
+                uuid=uuid,
+                version=version,
+                status=requests.codes.server_error,
+                code="unhandled_exception",
+                title=str(ex))
+        result = dict(uuid=uuid, version=version, status=status_code)
+        if job_id is not None:
+            result['job_id'] = job_id
+        return result
+
+    results = list(executor.map(ingest, json_request_body['files']))
+    return jsonify(dict(files=results)), requests.codes.ok
 
+
+def ingest_file(
+        handle: DRSBlobStore,
+        dst_bucket: str,
+        uuid: str,
+        version: str,
+        source_url: str,
+        creator_uid: int) -> typing.Tuple[int, typing.Optional[str]]:
+    """
+    Copy a staged file into the data store and record its metadata.  Registering an identical file again is not an
+    error.  Large files are copied in the background; the file becomes visible once that job completes.
+    :return: a tuple of (status, job ID).  The status is 201 if the file was created, 200 if an identical file was
+             already present, or 202 if the copy was handed to a background job, in which case the job ID is set.
+    """
     uuid = uuid.lower()
-    source_url = json_request_body['source_url']
     cre = re.compile(
         "^"
         "(?P<schema>(?:s3|gs|wasb))"
@@ -104,16 +328,16 @@ def put(uuid: str, json_request_body: dict, version: str):
             "unknown_source_schema",
             f"source_url schema {schema} not supported")
 
-    handle = storage.get_blobstore_handle()
     hca_handle = storage.DRSHCABlobstore(handle)
-    dst_bucket = os.environ['DRS_BUCKET']
 
     src_bucket = mobj.group('bucket')
     src_key = mobj.group('key')
 
-    metadata = handle.get_user_metadata(src_bucket, src_key)
-    size = handle.get_size(src_bucket, src_key)
-    content_type = handle.get_content_type(src_bucket, src_key)
+    # everything we need to know about the source comes from one metadata request.
+    src_stat = handle.stat(src_bucket, src_key)
+    metadata = dict(src_stat.user_metadata)
+    size = src_stat.size
+    content_type = src_stat.content_type
 
     try:
         # format all the checksums so they're lower-case.
@@ -137,47 +361,197 @@ def put(uuid: str, json_request_body: dict, version: str):
         )
     )).lower()
 
-    # does it exist? if so, we can skip the copy part.
+    # does it exist? if so, we can skip the copy part.  the blob index answers that without a round trip if it can.
     copy_mode = CopyMode.COPY_INLINE
-    try:
-        if hca_handle.verify_blob_checksum_from_staging_metadata(dst_bucket, dst_key, metadata):
-            copy_mode = CopyMode.NO_COPY
-    except BlobNotFoundError:
+    blob_index = get_blob_index(handle, dst_bucket)
+    if dst_key in blob_index:
+        copy_mode = CopyMode.NO_COPY
+    elif blob_index.persisted and size < get_async_copy_threshold():
+        # the blob did not exist when the index was built.  it may have been written since, but copying a blob that is
+        # not large over itself costs little more than checking for it.
         pass
+    else:
+        try:
+            dst_stat = handle.stat(dst_bucket, dst_key)
+        except BlobNotFoundError:
+            pass
+        else:
+            if hca_handle.checksum_matches_staging_metadata(dst_stat.cloud_checksum, metadata):
+                copy_mode = CopyMode.NO_COPY
+                blob_index.add(dst_key)
+
+    # build the record of the file metadata.
+    file_metadata = FileMetadata(
+        format=FileMetadata.FILE_FORMAT_VERSION,
+        creator_uid=creator_uid,
+        version=version,
+        content_type=content_type,
+        size=size,
+        crc32c=metadata['hca-dss-crc32c'],
+        s3_etag=metadata['hca-dss-s3_etag'],
+        sha1=metadata['hca-dss-sha1'],
+        sha256=metadata['hca-dss-sha256'],
+    )
+
+    if copy_mode == CopyMode.COPY_INLINE and size >= get_async_copy_threshold():
+        copy_mode = CopyMode.COPY_ASYNC
+
+    if copy_mode == CopyMode.COPY_ASYNC:
+        # a job would only find out that the version already exists once the copy is done, so check now.
+        if file_exists(handle, dst_bucket, uuid, version, file_metadata):
+            update_latest_version(handle, dst_bucket, uuid, version)
+            return requests.codes.ok, None
+        job_id = submit_copy_job(handle, dst_bucket, dict(
+            uuid=uuid,
+            version=version,
+            src_bucket=src_bucket,
+            src_key=src_key,
+            src_generation=src_stat.generation,
+            dst_key=dst_key,
+            staging_metadata=metadata,
+            file_metadata=file_metadata.to_dict(),
+        ))
+        return requests.codes.accepted, job_id
+
+    if copy_mode == CopyMode.COPY_INLINE:
+        copy_blob(handle, src_bucket, src_key, src_stat.generation, dst_bucket, dst_key, metadata)
+
+    return record_file(handle, dst_bucket, uuid, version, file_metadata), None
 
-    # build the json document for the file metadata.
-    file_metadata = {
-        FileMetadata.FORMAT: FileMetadata.FILE_FORMAT_VERSION,
-        FileMetadata.CREATOR_UID: json_request_body['creator_uid'],
-        FileMetadata.VERSION: version,
-        FileMetadata.CONTENT_TYPE: content_type,
-        FileMetadata.SIZE: size,
-        FileMetadata.CRC32C: metadata['hca-dss-crc32c'],
-        FileMetadata.S3_ETAG: metadata['hca-dss-s3_etag'],
-        FileMetadata.SHA1: metadata['hca-dss-sha1'],
-        FileMetadata.SHA256: metadata['hca-dss-sha256'],
-    }
-    file_metadata_json = json.dumps(file_metadata)
-
-    if copy_mode != CopyMode.NO_COPY:
-        handle.copy(src_bucket, src_key, dst_bucket, dst_key)
-        # verify the copy was done correctly.
-        assert hca_handle.verify_blob_checksum_from_staging_metadata(dst_bucket, dst_key, metadata)
 
+def get_async_copy_threshold() -> int:
+    """Files at least this large are copied in the background, so the copy is not bound by the request timeout."""
+    return int(os.environ.get("DRS_ASYNC_COPY_THRESHOLD", 1024 * 1024 * 1024))
+
+
+def copy_blob(
+        handle: DRSBlobStore,
+        src_bucket: str,
+        src_key: str,
+        src_generation: typing.Any,
+        dst_bucket: str,
+        dst_key: str,
+        staging_metadata: typing.Dict[str, str],
+        progress: typing.Callable[[int, int], None] = None):
+    # pin the copy to the generation we inspected, in case the staged object is replaced in the meantime.
+    dst_stat = resumable_copy(
+        handle, src_bucket, src_key, dst_bucket, dst_key, copy_token=src_generation, progress=progress)
+    # verify the copy was done correctly.
+    assert storage.DRSHCABlobstore.checksum_matches_staging_metadata(dst_stat.cloud_checksum, staging_metadata)
+    get_blob_index(handle, dst_bucket).add(dst_key)
+
+
+def record_file(handle: DRSBlobStore, dst_bucket: str, uuid: str, version: str, file_metadata: FileMetadata) -> int:
+    """
+    Write the metadata document for a file whose blob is already in place, and advance its latest-version pointer.
+    :return: 201 if the document was written, 200 if an identical document was already present.
+    """
     try:
-        write_file_metadata(handle, dst_bucket, uuid, version, file_metadata_json)
+        write_file_metadata(handle, dst_bucket, uuid, version, encode_file_metadata(file_metadata))
         status_code = requests.codes.created
     except BlobAlreadyExistsError:
-        # fetch the file metadata, compare it to what we have.
-        key = f"files/{uuid}.{version}"
-        existing_file_metadata = json.loads(
-            handle.get(dst_bucket, key).decode("utf-8"))
-        if existing_file_metadata != file_metadata:
+        if not file_exists(handle, dst_bucket, uuid, version, file_metadata):
+            # the document was there a moment ago, and documents are never deleted.
+            raise
+        status_code = requests.codes.ok
+
+    # the metadata document is in place, so the pointer can move.  this is also done for the idempotent case, in case a
+    # previous attempt failed before it got here.
+    update_latest_version(handle, dst_bucket, uuid, version)
+
+    return status_code
+
+
+def file_exists(handle: DRSBlobStore, dst_bucket: str, uuid: str, version: str, file_metadata: FileMetadata) -> bool:
+    """
+    Returns True iff the metadata document for a file version already exists and matches `file_metadata`.  Raises a 409
+    DRSException if it exists with different metadata.
+    """
+    try:
+        # this process may have cached the document as missing, or be reading it from before it was written, so it is
+        # read afresh.
+        existing_file_metadata = read_file_metadata(handle, dst_bucket, uuid, version)
+    except BlobNotFoundError:
+        return False
+    if not existing_file_metadata.same_file(file_metadata):
+        raise DRSException(
+            requests.codes.conflict,
+            "file_already_exists",
+            f"file with UUID {uuid} and version {version} already exists")
+    return True
+
+
+def submit_copy_job(handle: DRSBlobStore, dst_bucket: str, job: dict) -> str:
+    """
+    Persist a copy job for a file version and start it in the background.  If there already is a job for the same file
+    version and payload, that job is reused, and restarted if it had failed.  A job with a different payload is replaced
+    if it failed or was abandoned, since it has not created the file version.
+    :return: the job ID.
+    """
+    job_id = job_id_for(job['uuid'], job['version'])
+    job = dict(job, job_id=job_id)
+    generation = create_job(handle, dst_bucket, job)
+    while generation is None:
+        existing_job, existing_generation = get_job(handle, dst_bucket, job_id)
+        if existing_job['file_metadata'] == job['file_metadata']:
+            break
+        if existing_job['status'] != JobStatus.FAILED and not is_abandoned(existing_job):
             raise DRSException(
                 requests.codes.conflict,
                 "file_already_exists",
-                f"file with UUID {uuid} and version {version} already exists")
-        status_code = requests.codes.ok
+                f"file with UUID {job['uuid']} and version {job['version']} already exists")
+        generation = replace_job(handle, dst_bucket, job, existing_generation)
+    resume_copy_job(handle, dst_bucket, job_id, generation)
+    return job_id
+
+
+def resume_copy_job(handle: DRSBlobStore, dst_bucket: str, job_id: str, generation: int = None):
+    """Run a copy job on this process's job pool.  See :func:`~drs.storage.jobs.claim_job` for `generation`."""
+    executor = get_executor("copy-jobs", int(os.environ.get("DRS_COPY_JOB_WORKERS", 4)))
+    executor.submit(run_copy_job, handle, dst_bucket, job_id, generation)
+
+
+def run_copy_job(handle: DRSBlobStore, dst_bucket: str, job_id: str, generation: int = None):
+    try:
+        claimed = claim_job(handle, dst_bucket, job_id, generation)
+        if claimed is None:
+            return
+        job, generation = claimed
+
+        def progress(bytes_copied: int, total_bytes: int):
+            # this also serves as the job's heartbeat, so it is not considered abandoned while the copy is running.
+            nonlocal job, generation
+            job, generation = update_job(
+                handle, dst_bucket, job, generation, bytes_copied=bytes_copied, total_bytes=total_bytes)
+
+        try:
+            copy_blob(
+                handle,
+                job['src_bucket'],
+                job['src_key'],
+                job['src_generation'],
+                dst_bucket,
+                job['dst_key'],
+                job['staging_metadata'],
+                progress)
+            status_code = record_file(
+                handle, dst_bucket, job['uuid'], job['version'], FileMetadata.from_dict(job['file_metadata']))
+        except BlobPreconditionFailedError:
+            logger.warning("Copy job %s was taken over by another process; abandoning it here", job_id)
+            return
+        except DRSException as ex:
+            status, result = JobStatus.FAILED, dict(status=ex.status, code=ex.code, title=ex.message)
+        except Exception as ex:
+            logger.exception("Copy job %s failed", job_id)
+            status, result = JobStatus.FAILED, dict(
+                status=requests.codes.server_error, code="unhandled_exception", title=str(ex))
+        else:
+            status, result = JobStatus.SUCCEEDED, dict(status=status_code)
 
-    return jsonify(
-        dict(version=version)), status_code
+        try:
+            update_job(handle, dst_bucket, job, generation, status=status, result=result)
+        except BlobPreconditionFailedError:
+            logger.warning("Copy job %s was taken over by another process before it completed", job_id)
+    except Exception:
+        # nothing is waiting on this thread, so this is the only place the error can surface.
+        logger.exception("Unable to run copy job %s", job_id)
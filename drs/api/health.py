@@ -0,0 +1,21 @@
+import requests
+from flask import jsonify
+
+from drs import drs_handler
+from drs import storage
+from drs.storage.blob_index import get_blob_index_stats
+from drs.storage.reads import get_coalescing_stats
+from drs.storage.files import latest_version_cache, metadata_cache, missing_metadata_cache
+
+
+@drs_handler
+def get():
+    return jsonify(dict(
+        status="ok",
+        blobstore=storage.get_blobstore_stats(),
+        metadata_cache=metadata_cache.stats(),
+        missing_metadata_cache=missing_metadata_cache.stats(),
+        latest_version_cache=latest_version_cache.stats(),
+        blob_index=get_blob_index_stats(),
+        coalescing=get_coalescing_stats(),
+    )), requests.codes.ok
@@ -0,0 +1,37 @@
+import os
+
+import requests
+from cloud_blobstore import BlobNotFoundError
+from flask import jsonify
+
+from drs import DRSException, drs_handler
+from drs import storage
+from drs.api.files import resume_copy_job
+from drs.storage.jobs import get_job, is_abandoned
+
+
+@drs_handler
+def get(job_id: str):
+    handle = storage.get_blobstore_handle()
+    bucket = os.environ['DRS_BUCKET']
+
+    try:
+        job, _ = get_job(handle, bucket, job_id)
+    except BlobNotFoundError:
+        raise DRSException(requests.codes.not_found, "not_found", "Cannot find job!")
+
+    if is_abandoned(job):
+        # whichever process was running this job has gone away, e.g., because the instance was restarted.
+        resume_copy_job(handle, bucket, job_id)
+
+    return jsonify(dict(
+        job_id=job['job_id'],
+        status=job['status'],
+        uuid=job['uuid'],
+        version=job['version'],
+        created=job['created'],
+        updated=job['updated'],
+        bytes_copied=job.get('bytes_copied', 0),
+        total_bytes=job.get('total_bytes'),
+        result=job.get('result'),
+    )), requests.codes.ok
@@ -0,0 +1,159 @@
+"""
+ASGI application that serves HEAD and GET of /files/{uuid} from an asyncio event loop, so that a worker waiting on the
+blobstore for one request can serve others in the meantime.  The lookups are the ones get_helper runs (see
+drs.api.files.file_lookup), with their reads awaited from a drs.storage.aio reader instead of made with the blocking
+handle.  Every other request, and any HEAD or GET the fast path does not handle exactly as the Flask app would (e.g.,
+malformed parameters, or GET when files are proxied), is passed to the Flask app, which runs in a pool of threads.
+"""
+import asyncio
+import json
+import os
+import re
+import time
+import typing
+from urllib.parse import parse_qs
+
+import requests
+from a2wsgi import WSGIMiddleware
+from werkzeug.datastructures import Headers
+from werkzeug.http import parse_etags
+
+import drs
+from drs import DRSException, problem_body
+from drs.api.files import cache_headers, file_lookup, get_redirect_mode, is_cacheable, redirect_url
+from drs.storage import reads
+from drs.storage.aio import AsyncBlobReader, create_async_reader
+from drs.util import metrics
+from drs.util.metrics import timed
+from drs.util.version import is_version_format
+
+# the uuid pattern of the API specification, which the fast path applies to HEAD as well as GET.
+_UUID_PATTERN = re.compile("[A-Za-z0-9]{8}-[A-Za-z0-9]{4}-[A-Za-z0-9]{4}-[A-Za-z0-9]{4}-[A-Za-z0-9]{12}")
+
+DEFAULT_WSGI_THREADS = 10
+
+
+class DRSAsgiApp:
+    def __init__(self, wsgi_app: typing.Any, wsgi_threads: int = DEFAULT_WSGI_THREADS) -> None:
+        self.fallback = WSGIMiddleware(wsgi_app, workers=wsgi_threads)
+        self.files_path = f"/{os.environ['DRS_API_VERSION']}/files/"
+        self.server_timing = os.environ.get("DRS_SERVER_TIMING", "false").lower() in ("1", "true")
+        self._reader = None  # type: typing.Optional[AsyncBlobReader]
+
+    @property
+    def reader(self) -> AsyncBlobReader:
+        if self._reader is None:
+            self._reader = create_async_reader()
+        return self._reader
+
+    async def __call__(self, scope: dict, receive: typing.Callable, send: typing.Callable) -> None:
+        if scope['type'] == "lifespan":
+            await self._lifespan(receive, send)
+            return
+        if scope['type'] == "http":
+            request = self._match_file_request(scope)
+            if request is not None:
+                await self._serve_file(scope, send, *request)
+                return
+        await self.fallback(scope, receive, send)
+
+    async def _lifespan(self, receive: typing.Callable, send: typing.Callable) -> None:
+        while True:
+            message = await receive()
+            if message['type'] == "lifespan.startup":
+                await send({'type': "lifespan.startup.complete"})
+            elif message['type'] == "lifespan.shutdown":
+                if self._reader is not None:
+                    await self._reader.close()
+                await send({'type': "lifespan.shutdown.complete"})
+                return
+
+    def _match_file_request(self, scope: dict) -> typing.Optional[typing.Tuple[str, typing.Optional[str]]]:
+        """
+        Returns the uuid and version of a HEAD or GET of a file that the fast path can serve, or None if the request
+        should go to the Flask app.
+        """
+        method, path = scope['method'], scope['path']
+        if method not in ("HEAD", "GET") or not path.startswith(self.files_path):
+            return None
+        if method == "GET" and get_redirect_mode() == "proxy":
+            return None
+        uuid = path[len(self.files_path):]
+        if not _UUID_PATTERN.fullmatch(uuid):
+            return None
+        versions = parse_qs(scope['query_string'].decode("latin-1"), keep_blank_values=True).get("version")
+        if versions is None:
+            return uuid, None
+        if len(versions) == 1 and is_version_format(versions[0]):
+            return uuid, versions[0]
+        return None
+
+    async def _serve_file(self, scope: dict, send: typing.Callable, uuid: str, version: typing.Optional[str]) -> None:
+        start = time.perf_counter()
+        spans = metrics.start_request() if self.server_timing else None
+        method = scope['method']
+        try:
+            with timed("get_helper"):
+                status, headers = await self._file_response(method, Headers(
+                    [(name.decode("latin-1"), value.decode("latin-1")) for name, value in scope['headers']]),
+                    uuid, version)
+            body = b""
+        except DRSException as ex:
+            status, headers, body = self._problem(problem_body(ex.status, ex.code, ex.message))
+        except Exception as ex:
+            status, headers, body = self._problem(
+                problem_body(requests.codes.server_error, "unhandled_exception", str(ex), expected=False))
+
+        headers.append(('Content-Length', str(len(body))))
+        metrics.registry.observe("request", time.perf_counter() - start)
+        if spans is not None:
+            headers.append(('Server-Timing', spans.server_timing()))
+        await send({
+            'type': "http.response.start",
+            'status': status,
+            'headers': [(name.lower().encode("latin-1"), str(value).encode("latin-1")) for name, value in headers],
+        })
+        await send({'type': "http.response.body", 'body': b"" if method == "HEAD" else body})
+
+    async def _file_response(self, method: str, request_headers: Headers, uuid: str,
+                             version: typing.Optional[str]) -> typing.Tuple[int, typing.List[typing.Tuple[str, str]]]:
+        """The asynchronous counterpart of drs.api.files.get_helper."""
+        bucket = os.environ['DRS_BUCKET']
+        mode = get_redirect_mode()
+        cacheable = is_cacheable(method, mode)
+        versioned = version is not None
+
+        if_none_match = parse_etags(request_headers.get("If-None-Match")) if cacheable else None
+        version, file_metadata = await reads.run_async(self.reader, file_lookup(bucket, uuid, version, if_none_match))
+        headers = [('Content-Type', "text/html; charset=utf-8")]
+        if file_metadata is None:
+            return requests.codes.not_modified, headers + cache_headers(uuid, version, versioned)
+
+        if method == "GET":
+            status = requests.codes.found
+            blob_path = file_metadata.blob_key
+            if mode == "signed":
+                # signing may call the IAM API, so it must not hold up the event loop.
+                url = await asyncio.get_event_loop().run_in_executor(None, redirect_url, bucket, blob_path, mode)
+            else:
+                url = redirect_url(bucket, blob_path, mode)
+            headers.append(('Location', url))
+        else:
+            status = requests.codes.ok
+
+        headers.extend(file_metadata.headers)
+        if cacheable:
+            headers.extend(cache_headers(uuid, version, versioned))
+        return status, headers
+
+    @staticmethod
+    def _problem(problem: dict) -> typing.Tuple[int, typing.List[typing.Tuple[str, str]], bytes]:
+        return problem['status'], [('Content-Type', "application/problem+json")], json.dumps(problem).encode("utf-8")
+
+
+def create_asgi_app() -> DRSAsgiApp:
+    """
+    Builds the ASGI application, with the Flask app as its fallback.  DRS_ASGI_WSGI_THREADS is the number of threads the
+    Flask app runs in.
+    """
+    return DRSAsgiApp(drs.create_app().app, int(os.environ.get("DRS_ASGI_WSGI_THREADS", DEFAULT_WSGI_THREADS)))
@@ -0,0 +1,53 @@
+"""
+Parsing drs-api.yml and validating it against the Swagger 2.0 schema takes most of the time spent in `create_app`.  The
+build compiles the specification once, with `compile_spec`, into drs-api.json: the parsed and validated specification,
+along with a digest of the YAML it came from.  At startup, `load_compiled_spec` returns the compiled specification if it
+was built from the current YAML.
+"""
+import copy
+import hashlib
+import json
+import os
+import typing
+
+SPEC_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "drs-api.yml")
+COMPILED_SPEC_PATH = os.path.splitext(SPEC_PATH)[0] + ".json"
+
+
+def _digest(path: str) -> str:
+    with open(path, "rb") as fh:
+        return hashlib.sha256(fh.read()).hexdigest()
+
+
+def compile_spec(source: str = SPEC_PATH, destination: str = COMPILED_SPEC_PATH) -> None:
+    """Parse and validate the specification the same way Connexion does, and save the result as JSON."""
+    import jinja2
+    import yaml
+    from connexion.apis.abstract import compatibility_layer
+    from swagger_spec_validator.validator20 import validate_spec
+
+    with open(source, "rb") as fh:
+        template = fh.read().decode("utf-8")
+    spec = compatibility_layer(yaml.safe_load(jinja2.Template(template).render()))
+    validate_spec(copy.deepcopy(spec))
+
+    compiled = dict(source_sha256=_digest(source), spec=spec)
+    temp_destination = destination + ".tmp"
+    with open(temp_destination, "w") as fh:
+        json.dump(compiled, fh)
+    os.replace(temp_destination, destination)
+
+
+def load_compiled_spec(source: str = SPEC_PATH, compiled: str = COMPILED_SPEC_PATH) -> typing.Optional[dict]:
+    """
+    Returns the compiled specification, or None if it has not been built, or was built from a different version of the
+    YAML.
+    """
+    try:
+        with open(compiled) as fh:
+            document = json.load(fh)
+    except FileNotFoundError:
+        return None
+    if document.get('source_sha256') != _digest(source):
+        return None
+    return document['spec']
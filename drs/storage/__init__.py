@@ -1,16 +1,67 @@
 import os
+import sys
 import typing
 
-from google.cloud.storage import Client
 from cloud_blobstore import BlobStore
-from cloud_blobstore.gs import GSBlobStore
+
+from drs.storage.blobstore import BlobPreconditionFailedError, BlobStat, DRSBlobStore
+from drs.storage.instrumented import InstrumentedBlobStore
+from drs.storage.local import FilesystemBlobStore, MemoryBlobStore
+from drs.storage.pool import HandleRegistry, create_http_adapter, get_pool_size
+
 
 def get_blobstore_handle() -> typing.Any:
-    gcp_handle = get_gcp_handle()
-    return GSBlobStore(gcp_handle)
+    """Returns the blobstore handle shared by all threads of this process."""
+    return _handle_registry.get()
+
+def get_blobstore_stats() -> dict:
+    return _handle_registry.stats()
+
+def __getattr__(name: str) -> typing.Any:
+    # the google cloud libraries take longer to import than the rest of the app combined, so the GCS backend is only
+    # imported once it is used.
+    if name == "DRSGSBlobStore":
+        from drs.storage.gs import DRSGSBlobStore
+        return DRSGSBlobStore
+    raise AttributeError(f"module {__name__} has no attribute {name}")
+
+def get_gcp_handle(http: typing.Any = None) -> typing.Any:
+    from google.cloud.storage import Client
+    if http is None:
+        return Client()
+    return Client(credentials=http.credentials, _http=http)
+
+def _create_blobstore_handle() -> typing.Tuple[typing.Any, typing.Any]:
+    """
+    Builds the handle for the backend named by DRS_BLOBSTORE: "gs" (the default), or, for development and benchmarking,
+    "memory" or "filesystem" (rooted at DRS_BLOBSTORE_ROOT).  The local backends sleep for DRS_BLOBSTORE_LATENCY seconds
+    on every call.
+    """
+    backend = os.environ.get("DRS_BLOBSTORE", "gs")
+    latency = float(os.environ.get("DRS_BLOBSTORE_LATENCY", 0))
+    if backend == "memory":
+        return MemoryBlobStore(latency), None
+    elif backend == "filesystem":
+        return FilesystemBlobStore(os.environ['DRS_BLOBSTORE_ROOT'], latency), None
+    elif backend != "gs":
+        raise ValueError(f"Unknown blobstore backend {backend}")
 
-def get_gcp_handle() -> typing.Any:
-    return Client()
+    import google.auth
+    from google.auth.transport.requests import AuthorizedSession
+    from google.cloud.storage import Client
+    from drs.storage.gs import DRSGSBlobStore
+
+    credentials, _ = google.auth.default(scopes=Client.SCOPE)
+    http = AuthorizedSession(credentials)
+    adapter = create_http_adapter(get_pool_size())
+    http.mount("https://", adapter)
+    return DRSGSBlobStore(get_gcp_handle(http)), adapter
+
+def _create_instrumented_blobstore_handle() -> typing.Tuple[typing.Any, typing.Any]:
+    handle, adapter = _create_blobstore_handle()
+    return InstrumentedBlobStore(handle), adapter
+
+_handle_registry = HandleRegistry(_create_instrumented_blobstore_handle)
 
 class HCABlobStore:
     """Abstract base class for all HCA-specific logic for dealing with individual clouds."""
@@ -68,8 +119,16 @@ class HCABlobStore:
 
 
 class FileMetadata:
+    """
+    The metadata of a version of a file.  Records are immutable, so one can be shared by every request for the version,
+    and what each request needs from it, its blob key and the values of the response headers, is built once, with the
+    record.
+    """
     FILE_FORMAT_VERSION = "0.0.4"
+    # the format of documents in the compact encoding.  see drs.storage.encoding.
+    COMPACT_FORMAT_VERSION = "0.0.5"
 
+    # the keys of the fields in metadata documents.
     FORMAT = "format"
     CREATOR_UID = "creator_uid"
     VERSION = "version"
@@ -80,14 +139,110 @@ class FileMetadata:
     SHA1 = "sha1"
     SHA256 = "sha256"
 
+    __slots__ = ("format", "creator_uid", "version", "content_type", "size", "crc32c", "s3_etag", "sha1", "sha256",
+                 "blob_key", "_header_values")
+    format: str
+    creator_uid: int
+    version: str
+    content_type: typing.Optional[str]
+    size: int
+    crc32c: str
+    s3_etag: str
+    sha1: str
+    sha256: str
+    # derived from the fields above.
+    blob_key: str
+    _header_values: typing.Tuple[str, ...]
+
+    HEADER_NAMES = ('X-DSS-CREATOR-UID', 'X-DSS-VERSION', 'X-DSS-CONTENT-TYPE', 'X-DSS-SIZE', 'X-DSS-CRC32C',
+                    'X-DSS-S3-ETAG', 'X-DSS-SHA1', 'X-DSS-SHA256')
+
+    def __init__(self, format: str, creator_uid: int, version: str, content_type: typing.Optional[str], size: int,
+                 crc32c: str, s3_etag: str, sha1: str, sha256: str) -> None:
+        # there are only a few formats and content types, so cached records share them.
+        if isinstance(format, str):
+            format = sys.intern(format)
+        if isinstance(content_type, str):
+            content_type = sys.intern(content_type)
+        values = (format, creator_uid, version, content_type, size, crc32c, s3_etag, sha1, sha256)
+        for name, value in zip(FileMetadata.__slots__, values):
+            object.__setattr__(self, name, value)
+        object.__setattr__(self, "blob_key", "blobs/" + ".".join((sha256, sha1, s3_etag, crc32c)))
+        object.__setattr__(self, "_header_values", (
+            str(creator_uid), version, str(content_type), str(size), crc32c, s3_etag, sha1, sha256))
 
-def compose_blob_key(file_info: typing.Dict[str, str]) -> str:
+    @property
+    def headers(self) -> typing.Tuple[typing.Tuple[str, str], ...]:
+        """The X-DSS-* headers of responses about this version."""
+        return tuple(zip(FileMetadata.HEADER_NAMES, self._header_values))
+
+    @classmethod
+    def from_dict(cls, document: typing.Mapping[str, typing.Any]) -> "FileMetadata":
+        """Builds the record of a parsed metadata document.  Raises KeyError if a field is missing."""
+        return cls(
+            document[cls.FORMAT],
+            document[cls.CREATOR_UID],
+            document[cls.VERSION],
+            document[cls.CONTENT_TYPE],
+            document[cls.SIZE],
+            document[cls.CRC32C],
+            document[cls.S3_ETAG],
+            document[cls.SHA1],
+            document[cls.SHA256],
+        )
+
+    def to_dict(self) -> typing.Dict[str, typing.Any]:
+        """Returns the record as a metadata document, with its fields in the order they have always been written."""
+        return {
+            FileMetadata.FORMAT: self.format,
+            FileMetadata.CREATOR_UID: self.creator_uid,
+            FileMetadata.VERSION: self.version,
+            FileMetadata.CONTENT_TYPE: self.content_type,
+            FileMetadata.SIZE: self.size,
+            FileMetadata.CRC32C: self.crc32c,
+            FileMetadata.S3_ETAG: self.s3_etag,
+            FileMetadata.SHA1: self.sha1,
+            FileMetadata.SHA256: self.sha256,
+        }
+
+    def _fields(self) -> tuple:
+        return (self.format, self.creator_uid, self.version, self.content_type, self.size, self.crc32c, self.s3_etag,
+                self.sha1, self.sha256)
+
+    def same_file(self, other: "FileMetadata") -> bool:
+        """True iff `other` describes the same file version, whatever the format of its document."""
+        return self._fields()[1:] == other._fields()[1:]
+
+    def __setattr__(self, name: str, value: typing.Any) -> None:
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __delattr__(self, name: str) -> None:
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __reduce__(self) -> tuple:
+        return type(self), self._fields()
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, FileMetadata):
+            return NotImplemented
+        return self._fields() == other._fields()
+
+    def __hash__(self) -> int:
+        return hash(self._fields())
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({', '.join(repr(value) for value in self._fields())})"
+
+
+def compose_blob_key(file_info: typing.Union[FileMetadata, typing.Dict[str, str]]) -> str:
     """
     Create the key for a blob, given the file metadata.
 
-    :param file_info: This can either be an object that contains the four keys (SHA256, SHA1, S3_ETAG, and CRC32C) in
-                      the key_class.
+    :param file_info: This can either be a :class:`FileMetadata`, or an object that contains the four keys (SHA256,
+                      SHA1, S3_ETAG, and CRC32C) in the key_class.
     """
+    if isinstance(file_info, FileMetadata):
+        return file_info.blob_key
     return "blobs/" + ".".join((
         file_info[FileMetadata.SHA256],
         file_info[FileMetadata.SHA1],
@@ -108,8 +263,16 @@ class DRSHCABlobstore(HCABlobStore):
         :return: True iff the checksum is correct.
         """
         checksum = self.handle.get_cloud_checksum(bucket, key)
+        return self.checksum_matches_staging_metadata(checksum, metadata)
+
+    @staticmethod
+    def checksum_matches_staging_metadata(cloud_checksum: str, metadata: typing.Dict[str, str]) -> bool:
+        """
+        Compare a cloud-provided checksum that has already been fetched, e.g., as part of a :class:`BlobStat`, against
+        the checksum in the staging metadata dictionary.
+        """
         metadata_checksum_key = typing.cast(str, HCABlobStore.MANDATORY_STAGING_METADATA['CRC32C']['keyname'])
-        return checksum.lower() == metadata[metadata_checksum_key].lower()
+        return cloud_checksum.lower() == metadata[metadata_checksum_key].lower()
 
     def verify_blob_checksum_from_dss_metadata(
             self, bucket: str, key: str, dss_metadata: typing.Dict[str, str]) -> bool:
@@ -0,0 +1,129 @@
+"""
+Non-blocking readers of the blobstore, for serving requests from an asyncio event loop (see drs.asgi).  They support
+only the reads that lookups make (see drs.storage.reads).
+"""
+import asyncio
+import os
+import typing
+from urllib.parse import quote
+
+from cloud_blobstore import BlobNotFoundError
+
+from drs.storage import MemoryBlobStore, get_blobstore_handle
+
+GCS_JSON_API = "https://storage.googleapis.com/storage/v1"
+DEFAULT_ASYNC_POOL_SIZE = 100
+
+
+class AsyncBlobReader:
+    async def get(self, bucket: str, key: str) -> bytes:
+        """Returns the contents of an object.  Raises BlobNotFoundError if it does not exist."""
+        raise NotImplementedError()
+
+    async def list(self, bucket: str, prefix: str) -> typing.List[str]:
+        """Returns the keys of the objects that start with `prefix`."""
+        raise NotImplementedError()
+
+    async def close(self) -> None:
+        pass
+
+
+class LocalAsyncReader(AsyncBlobReader):
+    """
+    Reader for the memory and filesystem blobstores.  It reads through the same handle as the rest of the process, so it
+    sees what the handle writes.  The handle's latency is awaited rather than slept, as a stand-in for a round trip to a
+    real blobstore that does not hold up the event loop.
+    """
+
+    def __init__(self, handle: MemoryBlobStore) -> None:
+        self.handle = handle
+
+    async def _delay(self) -> None:
+        if self.handle.latency > 0:
+            await asyncio.sleep(self.handle.latency)
+
+    async def get(self, bucket: str, key: str) -> bytes:
+        await self._delay()
+        return self.handle._get_now(bucket, key)
+
+    async def list(self, bucket: str, prefix: str) -> typing.List[str]:
+        await self._delay()
+        return self.handle._list_now(bucket, prefix)
+
+
+class GCSAsyncReader(AsyncBlobReader):
+    """
+    Reader for GCS that makes requests to the JSON API over a pool of at most `pool_size` connections.  The session is
+    created on first use, since it belongs to the event loop that it is created in.
+    """
+
+    def __init__(self, credentials: typing.Any, pool_size: int) -> None:
+        self.credentials = credentials
+        self.pool_size = pool_size
+        self._session = None  # type: typing.Any
+        self._refresh_lock = None  # type: typing.Optional[asyncio.Lock]
+
+    def _get_session(self) -> typing.Any:
+        import aiohttp
+        if self._session is None:
+            self._session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=self.pool_size))
+            self._refresh_lock = asyncio.Lock()
+        return self._session
+
+    async def _headers(self) -> typing.Dict[str, str]:
+        if not self.credentials.valid:
+            async with self._refresh_lock:
+                # another request may have refreshed the token while we waited for the lock.
+                if not self.credentials.valid:
+                    from google.auth.transport.requests import Request
+                    await asyncio.get_event_loop().run_in_executor(None, self.credentials.refresh, Request())
+        return {'Authorization': f"Bearer {self.credentials.token}"}
+
+    async def get(self, bucket: str, key: str) -> bytes:
+        session = self._get_session()
+        url = f"{GCS_JSON_API}/b/{quote(bucket, safe='')}/o/{quote(key, safe='')}"
+        async with session.get(url, params=dict(alt="media"), headers=await self._headers()) as response:
+            if response.status == 404:
+                raise BlobNotFoundError(f"Could not find {bucket}/{key}")
+            response.raise_for_status()
+            return await response.read()
+
+    async def list(self, bucket: str, prefix: str) -> typing.List[str]:
+        session = self._get_session()
+        url = f"{GCS_JSON_API}/b/{quote(bucket, safe='')}/o"
+        params = dict(prefix=prefix, fields="items(name),nextPageToken")
+        keys = list()  # type: typing.List[str]
+        while True:
+            async with session.get(url, params=params, headers=await self._headers()) as response:
+                response.raise_for_status()
+                page = await response.json()
+            keys.extend(item['name'] for item in page.get('items', ()))
+            if 'nextPageToken' not in page:
+                return keys
+            params['pageToken'] = page['nextPageToken']
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+
+def get_async_pool_size() -> int:
+    """
+    Number of connections to GCS kept by each worker's async reader.  A single event loop serves every request of the
+    worker, so this is the number of reads the worker can have in flight at once.
+    """
+    return int(os.environ.get("DRS_ASYNC_POOL_SIZE", DEFAULT_ASYNC_POOL_SIZE))
+
+
+def create_async_reader() -> AsyncBlobReader:
+    """Builds the reader for the backend named by DRS_BLOBSTORE.  See drs.storage._create_blobstore_handle."""
+    backend = os.environ.get("DRS_BLOBSTORE", "gs")
+    if backend != "gs":
+        return LocalAsyncReader(get_blobstore_handle().handle)
+
+    import google.auth
+    from google.cloud.storage import Client
+
+    credentials, _ = google.auth.default(scopes=Client.SCOPE)
+    return GCSAsyncReader(credentials, get_async_pool_size())
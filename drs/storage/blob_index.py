@@ -0,0 +1,204 @@
+import functools
+import hashlib
+import io
+import math
+import os
+import struct
+import threading
+import time
+import typing
+
+from cloud_blobstore import BlobNotFoundError, BlobStore
+
+from drs.util.concurrency import SingleFlight
+
+INDEX_KEY = "indexes/blobs"
+DIGEST_SIZE = 16
+
+# magic, format version, number of digests, number of bloom filter bits, number of bloom filter hashes.
+_HEADER = struct.Struct(">4sBQQB")
+_MAGIC = b"DRSB"
+_FORMAT_VERSION = 1
+
+
+def blob_key_digest(key: str) -> bytes:
+    return hashlib.sha256(key.encode("utf-8")).digest()[:DIGEST_SIZE]
+
+
+class BloomFilter:
+    def __init__(self, num_bits: int, num_hashes: int, bits: bytearray = None) -> None:
+        self.num_bits = num_bits
+        self.num_hashes = num_hashes
+        self.bits = bits if bits is not None else bytearray((num_bits + 7) // 8)
+
+    @classmethod
+    def for_capacity(cls, capacity: int, error_rate: float = 0.01) -> "BloomFilter":
+        capacity = max(capacity, 1)
+        num_bits = int(math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        num_hashes = max(1, int(round(num_bits / capacity * math.log(2))))
+        return cls(num_bits, num_hashes)
+
+    def _positions(self, digest: bytes) -> typing.Iterator[int]:
+        # the digests are already uniformly distributed, so two halves of one are enough for double hashing.
+        h1 = int.from_bytes(digest[:8], "big")
+        h2 = int.from_bytes(digest[8:16], "big") | 1
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+    def add(self, digest: bytes) -> None:
+        for position in self._positions(digest):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, digest: bytes) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(digest))
+
+
+class BlobIndex:
+    """
+    Set of the blob keys known to exist in a bucket.  It consists of a snapshot built from a listing of the bucket,
+    stored as a Bloom filter in front of a sorted array of key digests, plus the keys this process has seen since.
+
+    Blobs are content-addressed and never deleted, so a key in the index is known to exist.  A key not in the index may
+    still exist if it was written after the snapshot was built by another process.
+    """
+
+    def __init__(self, bloom: BloomFilter, digests: bytes, persisted: bool) -> None:
+        self.bloom = bloom
+        self.digests = digests
+        self.persisted = persisted
+        self.loaded_at = time.monotonic()
+        self._added = set()  # type: typing.Set[bytes]
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_keys(cls, keys: typing.Iterable[str]) -> "BlobIndex":
+        digests = sorted({blob_key_digest(key) for key in keys})
+        bloom = BloomFilter.for_capacity(len(digests))
+        for digest in digests:
+            bloom.add(digest)
+        return cls(bloom, b"".join(digests), persisted=False)
+
+    @classmethod
+    def empty(cls) -> "BlobIndex":
+        return cls(BloomFilter(8, 1), b"", persisted=False)
+
+    @classmethod
+    def deserialize(cls, data: bytes) -> "BlobIndex":
+        magic, version, count, num_bits, num_hashes = _HEADER.unpack_from(data)
+        if magic != _MAGIC or version != _FORMAT_VERSION:
+            raise ValueError("Unrecognized blob index format")
+        bloom_end = _HEADER.size + (num_bits + 7) // 8
+        bloom = BloomFilter(num_bits, num_hashes, bytearray(data[_HEADER.size:bloom_end]))
+        digests = data[bloom_end:bloom_end + count * DIGEST_SIZE]
+        return cls(bloom, digests, persisted=True)
+
+    def serialize(self) -> bytes:
+        """Serialize the snapshot.  Keys added by this process are not included."""
+        header = _HEADER.pack(_MAGIC, _FORMAT_VERSION, len(self), self.bloom.num_bits, self.bloom.num_hashes)
+        return header + bytes(self.bloom.bits) + self.digests
+
+    def __len__(self) -> int:
+        return len(self.digests) // DIGEST_SIZE
+
+    def add(self, key: str) -> None:
+        with self._lock:
+            self._added.add(blob_key_digest(key))
+
+    def __contains__(self, key: str) -> bool:
+        digest = blob_key_digest(key)
+        with self._lock:
+            if digest in self._added:
+                return True
+        return self._contains_digest(digest)
+
+    def _contains_digest(self, digest: bytes) -> bool:
+        """Whether the snapshot contains a digest."""
+        if digest not in self.bloom:
+            return False
+        # binary search of the sorted, fixed-width digests.
+        low, high = 0, len(self)
+        while low < high:
+            middle = (low + high) // 2
+            candidate = self.digests[middle * DIGEST_SIZE:(middle + 1) * DIGEST_SIZE]
+            if candidate < digest:
+                low = middle + 1
+            elif candidate > digest:
+                high = middle
+            else:
+                return True
+        return False
+
+    def stats(self) -> dict:
+        with self._lock:
+            added = len(self._added)
+        return dict(
+            persisted=self.persisted,
+            snapshot_entries=len(self),
+            added_entries=added,
+            age_seconds=time.monotonic() - self.loaded_at,
+        )
+
+
+def get_blob_index_ttl() -> float:
+    return float(os.environ.get("DRS_BLOB_INDEX_TTL", 300))
+
+
+_indexes = dict()  # type: typing.Dict[str, BlobIndex]
+# buckets whose index is being reloaded, while the previous copy is still served.
+_reloading = set()  # type: typing.Set[str]
+_indexes_lock = threading.Lock()
+# concurrent first loads of a bucket's index share the download.
+_first_loads = SingleFlight()
+
+
+def get_blob_index(handle: BlobStore, bucket: str) -> BlobIndex:
+    """
+    Returns this process's copy of the blob index for `bucket`, loading the persisted snapshot on first use and again
+    once it is older than DRS_BLOB_INDEX_TTL seconds.  If there is no snapshot, an empty index is returned.  Snapshots
+    are downloaded without holding up callers that have an index to use: while one caller reloads an expired copy,
+    the others are served that copy.
+    """
+    with _indexes_lock:
+        index = _indexes.get(bucket)
+        if index is not None:
+            if time.monotonic() - index.loaded_at < get_blob_index_ttl() or bucket in _reloading:
+                return index
+            _reloading.add(bucket)
+    if index is None:
+        return _first_loads.do(bucket, functools.partial(_load_blob_index, handle, bucket))
+    try:
+        return _load_blob_index(handle, bucket)
+    finally:
+        with _indexes_lock:
+            _reloading.discard(bucket)
+
+
+def _load_blob_index(handle: BlobStore, bucket: str) -> BlobIndex:
+    try:
+        index = BlobIndex.deserialize(handle.get(bucket, INDEX_KEY))
+    except BlobNotFoundError:
+        index = BlobIndex.empty()
+    with _indexes_lock:
+        previous = _indexes.get(bucket)
+        if previous is not None:
+            # the new snapshot may predate the blobs this process has written.  those it does contain need not be kept.
+            with previous._lock:
+                added = set(previous._added)
+            index._added.update(digest for digest in added if not index._contains_digest(digest))
+        _indexes[bucket] = index
+    return index
+
+
+def get_blob_index_stats() -> dict:
+    with _indexes_lock:
+        return {bucket: index.stats() for bucket, index in _indexes.items()}
+
+
+def rebuild_blob_index(handle: BlobStore, bucket: str) -> int:
+    """
+    Build a new snapshot of the blob index from a listing of the bucket and persist it.
+    :return: the number of blobs in the index.
+    """
+    index = BlobIndex.from_keys(handle.list(bucket, "blobs/"))
+    handle.upload_file_handle(bucket, INDEX_KEY, io.BytesIO(index.serialize()))
+    return len(index)
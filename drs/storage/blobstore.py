@@ -0,0 +1,130 @@
+import typing
+
+from cloud_blobstore import BlobAlreadyExistsError, BlobStore, BlobStoreError
+
+
+# the size of the parts of an upload.  GCS requires chunks of resumable uploads to be a multiple of 256 KiB.
+DEFAULT_PART_SIZE = 32 * 1024 * 1024
+
+
+class BlobPreconditionFailedError(BlobStoreError):
+    pass
+
+
+class BlobRewriteTokenError(BlobStoreError):
+    """The token of a rewrite step is not valid, e.g., because it has expired, so the rewrite must start over."""
+    pass
+
+
+class BlobStat(typing.NamedTuple):
+    """Everything the DRS needs to know about a blob, as returned by a single metadata request."""
+    size: int
+    content_type: str
+    user_metadata: typing.Dict[str, str]
+    cloud_checksum: str
+    generation: typing.Any
+
+
+class RewriteProgress(typing.NamedTuple):
+    """Outcome of one step of a server-side rewrite."""
+    token: typing.Optional[str]
+    bytes_rewritten: int
+    total_bytes: int
+    # set iff the rewrite is done, in which case `token` is None.
+    stat: typing.Optional[BlobStat]
+
+
+class DRSBlobStore(BlobStore):
+    """
+    Operations the DRS needs on top of what :class:`~cloud_blobstore.BlobStore` provides.  Each backend implements
+    these alongside the base ``BlobStore`` API.
+    """
+
+    def get_with_generation(self, bucket: str, key: str) -> typing.Tuple[bytes, int]:
+        """
+        Retrieves the data for a given object in a given bucket, along with the generation of the object that was read.
+        Raises BlobNotFoundError if the blob is not present.
+        :param bucket: the bucket the object resides in.
+        :param key: the key of the object to retrieve.
+        :return: a tuple of (data, generation)
+        """
+        raise NotImplementedError()
+
+    def get_range(self, bucket: str, key: str, start: int, end: int) -> bytes:
+        """
+        Retrieves bytes `start` through `end`, inclusive, of an object.  Raises BlobNotFoundError if the blob is not
+        present.  Backends should override this to fetch only the requested bytes.
+        """
+        return self.get(bucket, key)[start:end + 1]
+
+    def upload_from_path(
+            self,
+            bucket: str,
+            key: str,
+            path: str,
+            content_type: str=None,
+            metadata: dict=None,
+            part_size: int=DEFAULT_PART_SIZE,
+            workers: int=1):
+        """
+        Saves the contents of the file at `path` as an object, without reading the whole file into memory.  Backends
+        that can upload the parts of an object concurrently upload up to `workers` parts of `part_size` bytes at once.
+        """
+        with open(path, "rb") as fh:
+            self.upload_file_handle(bucket, key, fh, content_type, metadata)
+
+    def upload_if_generation_match(self, bucket: str, key: str, data: bytes, generation: int) -> int:
+        """
+        Saves `data` as the contents of an object, but only if the object's current generation is `generation`.  A
+        generation of 0 means the object must not exist.  Raises BlobPreconditionFailedError if the precondition does
+        not hold, in which case nothing is written.
+        :return: the generation of the object that was written.
+        """
+        raise NotImplementedError()
+
+    def upload_if_absent(self, bucket: str, key: str, data: bytes) -> int:
+        """
+        Saves `data` as the contents of a new object.  The check and the write are a single operation, so of several
+        concurrent callers, exactly one succeeds.  Raises BlobAlreadyExistsError if the object already exists.
+        :return: the generation of the object that was written.
+        """
+        try:
+            return self.upload_if_generation_match(bucket, key, data, 0)
+        except BlobPreconditionFailedError as ex:
+            raise BlobAlreadyExistsError(f"{bucket}/{key} already exists") from ex
+
+    def stat(self, bucket: str, key: str) -> BlobStat:
+        """
+        Retrieves the size, content-type, user metadata, and cloud-provided checksum of an object in one request.
+        Raises BlobNotFoundError if the blob is not present.
+        """
+        raise NotImplementedError()
+
+    def copy_and_stat(
+            self,
+            src_bucket: str, src_key: str,
+            dst_bucket: str, dst_key: str,
+            copy_token: typing.Any=None) -> BlobStat:
+        """
+        Copies an object, and returns the stat of the new object.  Backends whose copy call already describes the new
+        object should override this to avoid fetching it again.
+        """
+        self.copy(src_bucket, src_key, dst_bucket, dst_key, copy_token=copy_token)
+        return self.stat(dst_bucket, dst_key)
+
+    def rewrite(
+            self,
+            src_bucket: str, src_key: str,
+            dst_bucket: str, dst_key: str,
+            token: str=None,
+            copy_token: typing.Any=None) -> RewriteProgress:
+        """
+        Performs one step of a server-side copy.  Large copies may take many steps; each step but the last returns a
+        token that continues the copy from where it left off.  Backends that copy in a single call complete the copy in
+        the first step.
+        :param token: the token returned by the previous step, or None to start a new copy.  Raises
+                      BlobRewriteTokenError if it can no longer be used.
+        :param copy_token: see :func:`~cloud_blobstore.BlobStore.get_copy_token`.
+        """
+        stat = self.copy_and_stat(src_bucket, src_key, dst_bucket, dst_key, copy_token=copy_token)
+        return RewriteProgress(token=None, bytes_rewritten=stat.size, total_bytes=stat.size, stat=stat)
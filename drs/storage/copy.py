@@ -0,0 +1,87 @@
+import hashlib
+import io
+import json
+import logging
+import typing
+
+from cloud_blobstore import BlobNotFoundError
+
+from drs.storage.blobstore import BlobRewriteTokenError, BlobStat, DRSBlobStore
+
+logger = logging.getLogger(__name__)
+
+
+def checkpoint_key(dst_key: str, source: dict) -> str:
+    # blobs are content-addressed, so copies of different source objects can have the same destination.  each has a
+    # checkpoint of its own, so they do not overwrite, or delete, each other's.
+    digest = hashlib.sha256(json.dumps(source, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+    return f"checkpoints/{dst_key}.{digest[:16]}"
+
+
+def resumable_copy(
+        handle: DRSBlobStore,
+        src_bucket: str, src_key: str,
+        dst_bucket: str, dst_key: str,
+        copy_token: typing.Any=None,
+        progress: typing.Callable[[int, int], None]=None) -> BlobStat:
+    """
+    Server-side copy that is driven one rewrite step at a time.  Whenever a step does not finish the copy, its rewrite
+    token is checkpointed in the destination bucket, so a copy that is interrupted, e.g., by a crash, resumes from the
+    last checkpoint rather than from the start.  Copies that finish in a single step never write a checkpoint.
+
+    :param copy_token: see :func:`~cloud_blobstore.BlobStore.get_copy_token`.  A checkpoint is only resumed if it was
+                       made for the same source object and copy token.
+    :param progress: called after each step with the number of bytes copied so far and the total number of bytes.
+    :return: the stat of the new object.
+    """
+    source = dict(src_bucket=src_bucket, src_key=src_key, copy_token=copy_token)
+    key = checkpoint_key(dst_key, source)
+    token = _load_checkpoint(handle, dst_bucket, key, source)
+    resuming = token is not None
+    has_checkpoint = resuming
+
+    while True:
+        try:
+            step = handle.rewrite(src_bucket, src_key, dst_bucket, dst_key, token=token, copy_token=copy_token)
+        except BlobRewriteTokenError:
+            if not resuming:
+                raise
+            # rewrite tokens expire, so a stale checkpoint may not be usable.  start over.  any other error, e.g., a
+            # timeout, is raised, so that the copy is retried from the same checkpoint.
+            logger.warning("Unable to resume the copy to %s from its checkpoint; restarting it", dst_key, exc_info=True)
+            token = None
+            resuming = False
+            continue
+        resuming = False
+
+        if progress is not None:
+            progress(step.bytes_rewritten, step.total_bytes)
+        if step.token is None:
+            break
+        token = step.token
+        handle.upload_file_handle(
+            dst_bucket,
+            key,
+            io.BytesIO(json.dumps(dict(
+                source,
+                token=token,
+                bytes_rewritten=step.bytes_rewritten,
+                total_bytes=step.total_bytes)).encode("utf-8")))
+        has_checkpoint = True
+
+    if has_checkpoint:
+        handle.delete(dst_bucket, key)
+    return step.stat
+
+
+def _load_checkpoint(handle: DRSBlobStore, bucket: str, key: str, source: dict) -> typing.Optional[str]:
+    try:
+        checkpoint = json.loads(handle.get(bucket, key).decode("utf-8"))
+    except BlobNotFoundError:
+        return None
+    if any(checkpoint.get(name) != value for name, value in source.items()):
+        # the checkpoint belongs to a copy of a different source object, which happens to have the same contents.
+        return None
+    logger.info(
+        "Resuming the copy to %s at %d of %d bytes", key, checkpoint['bytes_rewritten'], checkpoint['total_bytes'])
+    return checkpoint['token']
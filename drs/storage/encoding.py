@@ -0,0 +1,106 @@
+"""
+Encodings of file metadata documents.
+
+Documents were originally JSON objects, most of which is key names and hex digests.  The compact encoding (format
+0.0.5) is a fixed-layout binary record with the digests stored as raw bytes, about a third the size.  Readers accept
+either: a compact record begins with a byte that cannot begin a JSON document.  Writers use the encoding named by
+DRS_METADATA_ENCODING, "json" (the default) or "compact".  It should only be set to "compact" once every process that
+reads the bucket understands the compact encoding.
+"""
+import datetime
+import json
+import os
+import struct
+
+from drs.storage import FileMetadata
+from drs.util.version import datetime_to_version_format
+
+JSON = "json"
+COMPACT = "compact"
+
+_MAGIC = b"\xd5M"
+_COMPACT_FORMATS = {5: FileMetadata.COMPACT_FORMAT_VERSION}
+
+# magic, format, creator uid, size, version (microseconds since the epoch), crc32c, sha256, sha1, md5 and part count of
+# the s3 etag (0 if it has no part count), and the length of the content type, which follows the record.
+_RECORD = struct.Struct(">2sBqQq4s32s20s16sHH")
+_EPOCH = datetime.datetime(1970, 1, 1)
+_ONE_MICROSECOND = datetime.timedelta(microseconds=1)
+
+
+def get_metadata_encoding() -> str:
+    encoding = os.environ.get("DRS_METADATA_ENCODING", JSON)
+    if encoding not in (JSON, COMPACT):
+        raise ValueError(f"Unknown metadata encoding {encoding}")
+    return encoding
+
+
+def encode_file_metadata(file_metadata: FileMetadata, encoding: str = None) -> bytes:
+    """
+    Encodes a metadata document in `encoding`, or in the configured encoding if that is None.  A document that the
+    compact encoding cannot represent exactly, e.g., one with upper-case digests, is encoded as JSON instead.
+    """
+    if encoding is None:
+        encoding = get_metadata_encoding()
+    if encoding == COMPACT:
+        try:
+            record = _encode_compact(file_metadata)
+        except (AttributeError, TypeError, ValueError, struct.error):
+            pass
+        else:
+            # the record only holds what it was designed to, so check that nothing was lost.
+            if _decode_compact(record).same_file(file_metadata):
+                return record
+    document = file_metadata.to_dict()
+    if file_metadata.format == FileMetadata.COMPACT_FORMAT_VERSION:
+        document[FileMetadata.FORMAT] = FileMetadata.FILE_FORMAT_VERSION
+    return json.dumps(document).encode("utf-8")
+
+
+def decode_file_metadata(document: bytes) -> FileMetadata:
+    """Decodes a metadata document in either encoding.  Raises KeyError if a field is missing."""
+    if document.startswith(_MAGIC):
+        return _decode_compact(document)
+    return FileMetadata.from_dict(json.loads(document.decode("utf-8")))
+
+
+def document_encoding(document: bytes) -> str:
+    return COMPACT if document.startswith(_MAGIC) else JSON
+
+
+def _encode_compact(file_metadata: FileMetadata) -> bytes:
+    s3_etag, _, parts = file_metadata.s3_etag.partition("-")
+    timestamp = datetime.datetime.strptime(file_metadata.version, "%Y-%m-%dT%H%M%S.%fZ")
+    content_type = file_metadata.content_type.encode("utf-8")
+    return _RECORD.pack(
+        _MAGIC,
+        5,
+        file_metadata.creator_uid,
+        file_metadata.size,
+        (timestamp - _EPOCH) // _ONE_MICROSECOND,
+        bytes.fromhex(file_metadata.crc32c),
+        bytes.fromhex(file_metadata.sha256),
+        bytes.fromhex(file_metadata.sha1),
+        bytes.fromhex(s3_etag),
+        int(parts) if parts else 0,
+        len(content_type),
+    ) + content_type
+
+
+def _decode_compact(document: bytes) -> FileMetadata:
+    (_, file_format, creator_uid, size, timestamp, crc32c, sha256, sha1, s3_etag, parts,
+     content_type_length) = _RECORD.unpack_from(document)
+    if file_format not in _COMPACT_FORMATS:
+        raise ValueError(f"Unknown metadata format {file_format}")
+    content_type = document[_RECORD.size:_RECORD.size + content_type_length].decode("utf-8")
+    return FileMetadata(
+        format=_COMPACT_FORMATS[file_format],
+        creator_uid=creator_uid,
+        version=datetime_to_version_format(_EPOCH + timestamp * _ONE_MICROSECOND),
+        content_type=content_type,
+        size=size,
+        crc32c=crc32c.hex(),
+        s3_etag=s3_etag.hex() + (f"-{parts}" if parts else ""),
+        sha1=sha1.hex(),
+        sha256=sha256.hex(),
+    )
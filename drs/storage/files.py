@@ -1,26 +1,279 @@
-import io
+import json
+import os
+import typing
 
-from cloud_blobstore import BlobAlreadyExistsError, BlobNotFoundError, BlobStore
+from cloud_blobstore import BlobNotFoundError, BlobStore
 
+from drs.storage import FileMetadata, reads
+from drs.storage.blobstore import BlobPreconditionFailedError, DRSBlobStore
+from drs.storage.encoding import JSON, decode_file_metadata, document_encoding, encode_file_metadata
+from drs.util.cache import LRUCache, StaleWhileRevalidateCache, TTLSet
+from drs.util.metrics import timed
 
+# file metadata documents never change once written, so they can be cached for as long as there is room.  the cache is
+# bounded by the total size of the serialized documents.
+metadata_cache = LRUCache(int(os.environ.get("DRS_METADATA_CACHE_BYTES", 64 * 1024 * 1024)))
+
+# lookups of documents that do not exist are remembered only briefly, since the document may be written at any time by
+# another process.
+missing_metadata_cache = TTLSet(float(os.environ.get("DRS_METADATA_NEGATIVE_TTL", 5)), max_entries=100000)
+
+# new versions of a file are rare, so the latest version found for it is served as is for DRS_LATEST_VERSION_TTL
+# seconds, and for DRS_LATEST_VERSION_STALE_TTL seconds after that while it is looked up again in the background.
+# versions written by this process are seen at once; those written by other processes may take that long to be seen.
+latest_version_cache = StaleWhileRevalidateCache(
+    float(os.environ.get("DRS_LATEST_VERSION_TTL", 5)),
+    float(os.environ.get("DRS_LATEST_VERSION_STALE_TTL", 30)),
+    max_entries=100000)
+
+
+@timed("write_file_metadata")
 def write_file_metadata(
-        handle: BlobStore,
+        handle: DRSBlobStore,
         dst_bucket: str,
         file_uuid: str,
         file_version: str,
-        document: str):
+        document: typing.Union[str, bytes]):
+    """
+    Write the metadata document for a version of a file.  `document` is either encoded already (see
+    drs.storage.encoding), or JSON text.
+    """
     # what's the target object name for the file metadata?
     metadata_key = f"files/{file_uuid}.{file_version}"
+    if isinstance(document, str):
+        document = document.encode("utf-8")
+
+    # if it already exists, then it's a failure.  the check is part of the write, so of two concurrent writers of the
+    # same document, exactly one succeeds.
+    handle.upload_if_absent(dst_bucket, metadata_key, document)
+    reads.note_write(dst_bucket, metadata_key)
+    missing_metadata_cache.discard((dst_bucket, file_uuid, file_version))
+
+
+def file_metadata_lookup(bucket: str, file_uuid: str, file_version: str) -> reads.Lookup:
+    """
+    Lookup of the metadata of a version of a file.  Raises BlobNotFoundError if it does not exist.  The record is shared
+    with other callers through the cache.
+    """
+    cache_key = (bucket, file_uuid, file_version)
+    file_metadata = metadata_cache.get(cache_key)
+    if file_metadata is not None:
+        return file_metadata
+    if cache_key in missing_metadata_cache:
+        raise BlobNotFoundError(f"Could not find {bucket}/files/{file_uuid}.{file_version}")
+
+    # if the document is written while it is being read, the read may not find it, but it must not be remembered as
+    # missing after the writer has discarded it from the cache.
+    epoch = missing_metadata_cache.epoch
+    try:
+        document = yield reads.Get(bucket, f"files/{file_uuid}.{file_version}")
+    except BlobNotFoundError:
+        missing_metadata_cache.add(cache_key, epoch)
+        raise
+    return _cache_file_metadata(cache_key, document)
+
 
-    # if it already exists, then it's a failure.
+def _cache_file_metadata(cache_key: typing.Tuple[str, str, str], document: bytes) -> FileMetadata:
+    with timed("metadata.parse"):
+        file_metadata = decode_file_metadata(document)
+    # the cache is budgeted in bytes of JSON, so that it holds as many documents whichever way they are encoded.
+    size = len(document) if document_encoding(document) == JSON else len(json.dumps(file_metadata.to_dict()))
+    metadata_cache.put(cache_key, file_metadata, size)
+    return file_metadata
+
+
+def get_file_metadata(handle: BlobStore, bucket: str, file_uuid: str, file_version: str) -> FileMetadata:
+    """See :func:`file_metadata_lookup`."""
+    return reads.run(handle, file_metadata_lookup(bucket, file_uuid, file_version))
+
+
+def read_file_metadata(handle: BlobStore, bucket: str, file_uuid: str, file_version: str) -> FileMetadata:
+    """
+    Read the metadata document for a version of a file from the blobstore, rather than from the caches or a read that is
+    already in flight, e.g., when a write has just found that it exists.  Raises BlobNotFoundError if it does not exist.
+    """
+    cache_key = (bucket, file_uuid, file_version)
+    document = handle.get(bucket, f"files/{file_uuid}.{file_version}")
+    missing_metadata_cache.discard(cache_key)
+    return _cache_file_metadata(cache_key, document)
+
+
+def latest_version_key(file_uuid: str) -> str:
+    # this must not share the files/{uuid}. prefix, or listing the versions of a file would pick it up.
+    return f"latest/{file_uuid}"
+
+
+def latest_version_lookup(bucket: str, file_uuid: str) -> reads.Lookup:
+    """
+    Lookup of the version recorded in the latest-version pointer for `file_uuid`, which is None if there is no pointer.
+    """
     try:
-        handle.get_user_metadata(dst_bucket, metadata_key)
+        data = yield reads.Get(bucket, latest_version_key(file_uuid))
     except BlobNotFoundError:
-        pass
+        return None
+    return data.decode("utf-8")
+
+
+def get_latest_version(handle: DRSBlobStore, bucket: str, file_uuid: str) -> typing.Optional[str]:
+    """See :func:`latest_version_lookup`."""
+    return reads.run(handle, latest_version_lookup(bucket, file_uuid))
+
+
+def update_latest_version(handle: DRSBlobStore, bucket: str, file_uuid: str, file_version: str) -> bool:
+    """
+    Advance the latest-version pointer for `file_uuid` to `file_version`, unless it already points to the same or a
+    newer version.  If there is no pointer yet, it is created at the most recent of `file_version` and the versions
+    already in the bucket.  Concurrent writers are serialized through generation preconditions, so the pointer never
+    moves backwards.
+    :return: True iff the pointer was written.
+    """
+    key = latest_version_key(file_uuid)
+    try:
+        while True:
+            version = file_version
+            try:
+                data, generation = handle.get_with_generation(bucket, key)
+            except BlobNotFoundError:
+                generation = 0
+                # files written before the latest-version pointer existed may already have newer versions, which only
+                # a listing finds.
+                listed_version = find_latest_version(handle, bucket, file_uuid)
+                if listed_version is not None and listed_version > version:
+                    version = listed_version
+            else:
+                if data.decode("utf-8") >= file_version:
+                    return False
+            try:
+                handle.upload_if_generation_match(bucket, key, version.encode("utf-8"), generation)
+            except BlobPreconditionFailedError:
+                # someone else moved the pointer since we read it; check it again.
+                continue
+            return True
+    finally:
+        # whatever the pointer says now, lookups in this process must read it again.
+        _latest_version_written(bucket, file_uuid)
+
+
+def _latest_version_written(bucket: str, file_uuid: str) -> None:
+    reads.note_write(bucket, latest_version_key(file_uuid))
+    latest_version_cache.invalidate((bucket, file_uuid))
+
+
+def listed_latest_version_lookup(bucket: str, file_uuid: str) -> reads.Lookup:
+    """
+    Lookup of the most recent version of `file_uuid`, found by listing all of its metadata documents.  The cost of this
+    grows with the number of versions, so it is only used when there is no latest-version pointer.
+    """
+    version = None
+    prefix = f"files/{file_uuid}."
+    for matching_file in (yield reads.List(bucket, prefix)):
+        matching_file = matching_file[len(prefix):]
+        if version is None or matching_file > version:
+            version = matching_file
+    return version
+
+
+def find_latest_version(handle: BlobStore, bucket: str, file_uuid: str) -> typing.Optional[str]:
+    """See :func:`listed_latest_version_lookup`."""
+    return reads.run(handle, listed_latest_version_lookup(bucket, file_uuid))
+
+
+def resolve_latest_version_lookup(bucket: str, file_uuid: str) -> reads.Lookup:
+    """Lookup of the most recent version of `file_uuid`, which is None if it has no versions."""
+    version = yield from latest_version_lookup(bucket, file_uuid)
+    if version is None:
+        # files written before the latest-version pointer existed can only be found by listing.
+        version = yield from listed_latest_version_lookup(bucket, file_uuid)
+    return version
+
+
+def cached_latest_version_lookup(bucket: str, file_uuid: str) -> reads.Lookup:
+    """
+    :func:`resolve_latest_version_lookup`, through `latest_version_cache`.  A stale version is returned without waiting,
+    while the lookup is run again in the background.
+    """
+    cache_key = (bucket, file_uuid)
+    cached = latest_version_cache.get(cache_key)
+    if cached is not None:
+        version, fresh = cached
+        if not fresh and latest_version_cache.claim_refresh(cache_key):
+            yield reads.Spawn(_refresh_latest_version_lookup(bucket, file_uuid, latest_version_cache.epoch))
+        return version
+
+    # a pointer written by this process since the epoch was taken is not stored; one written before it is seen by the
+    # lookup, whose reads are never shared with reads that started before that write (see reads.note_write).
+    epoch = latest_version_cache.epoch
+    version = yield from resolve_latest_version_lookup(bucket, file_uuid)
+    if version is not None:
+        latest_version_cache.put(cache_key, version, epoch)
+    return version
+
+
+def _refresh_latest_version_lookup(bucket: str, file_uuid: str, epoch: int) -> reads.Lookup:
+    cache_key = (bucket, file_uuid)
+    try:
+        version = yield from resolve_latest_version_lookup(bucket, file_uuid)
+    except BaseException:
+        latest_version_cache.abandon_refresh(cache_key)
+        raise
+    if version is None:
+        latest_version_cache.invalidate(cache_key)
     else:
-        raise BlobAlreadyExistsError()
+        latest_version_cache.put(cache_key, version, epoch)
+
+
+def rebuild_latest_version(handle: DRSBlobStore, bucket: str, file_uuid: str) -> typing.Optional[str]:
+    """
+    Reset the latest-version pointer for `file_uuid` to the most recent version found in the bucket.  Unlike
+    :func:`update_latest_version`, this can move the pointer backwards, e.g., if it refers to a version that was never
+    written.
+    :return: the version the pointer now refers to, or None if the file has no versions.
+    """
+    key = latest_version_key(file_uuid)
+    while True:
+        try:
+            data, generation = handle.get_with_generation(bucket, key)
+            current = data.decode("utf-8")  # type: typing.Optional[str]
+        except BlobNotFoundError:
+            current, generation = None, 0
+        version = find_latest_version(handle, bucket, file_uuid)
+        if version is None:
+            if current is not None:
+                handle.delete(bucket, key)
+                _latest_version_written(bucket, file_uuid)
+            return None
+        if version == current:
+            return version
+        try:
+            handle.upload_if_generation_match(bucket, key, version.encode("utf-8"), generation)
+        except BlobPreconditionFailedError:
+            continue
+        _latest_version_written(bucket, file_uuid)
+        return version
+
+
+def migrate_file_metadata(handle: DRSBlobStore, bucket: str, key: str, encoding: str) -> bool:
+    """
+    Rewrite the metadata document at `key` in `encoding`, unless it is already in it or cannot be represented in it.
+    The document is only replaced if it has not changed since it was read.
+    :return: True iff the document was rewritten.
+    """
+    data, generation = handle.get_with_generation(bucket, key)
+    if document_encoding(data) == encoding:
+        return False
+    document = encode_file_metadata(decode_file_metadata(data), encoding)
+    if document_encoding(document) != encoding:
+        return False
+    handle.upload_if_generation_match(bucket, key, document, generation)
+    reads.note_write(bucket, key)
+    return True
+
 
-    handle.upload_file_handle(
-        dst_bucket,
-        metadata_key,
-        io.BytesIO(document.encode("utf-8")))
+def list_file_uuids(handle: BlobStore, bucket: str) -> typing.Iterator[str]:
+    """Yields the UUID of every file with at least one version in the bucket."""
+    previous = None
+    for key in handle.list(bucket, "files/"):
+        file_uuid = key[len("files/"):].split(".", 1)[0]
+        if file_uuid != previous:
+            previous = file_uuid
+            yield file_uuid
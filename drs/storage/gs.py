@@ -0,0 +1,122 @@
+import os
+import typing
+
+from google.api_core.exceptions import GoogleAPICallError, PreconditionFailed
+from google.cloud.storage import transfer_manager
+from google.cloud.exceptions import NotFound
+from cloud_blobstore import BlobNotFoundError
+from cloud_blobstore.gs import CatchTimeouts, GSBlobStore
+
+from drs.storage.blobstore import (DEFAULT_PART_SIZE, BlobPreconditionFailedError, BlobRewriteTokenError, BlobStat,
+                                   DRSBlobStore, RewriteProgress)
+
+
+class DRSGSBlobStore(GSBlobStore, DRSBlobStore):
+    @CatchTimeouts
+    def get_with_generation(self, bucket: str, key: str) -> typing.Tuple[bytes, int]:
+        blob_obj = self._ensure_bucket_loaded(bucket).blob(key)
+        try:
+            data = blob_obj.download_as_bytes()
+        except NotFound:
+            raise BlobNotFoundError(f"Could not find gs://{bucket}/{key}")
+        # the generation is filled in from the download response headers.
+        return data, int(blob_obj.generation)
+
+    @CatchTimeouts
+    def get_range(self, bucket: str, key: str, start: int, end: int) -> bytes:
+        blob_obj = self._ensure_bucket_loaded(bucket).blob(key)
+        try:
+            return blob_obj.download_as_bytes(start=start, end=end)
+        except NotFound:
+            raise BlobNotFoundError(f"Could not find gs://{bucket}/{key}")
+
+    @CatchTimeouts
+    def upload_from_path(
+            self,
+            bucket: str,
+            key: str,
+            path: str,
+            content_type: str=None,
+            metadata: dict=None,
+            part_size: int=DEFAULT_PART_SIZE,
+            workers: int=1):
+        blob_obj = self._ensure_bucket_loaded(bucket).blob(key)
+        blob_obj.metadata = metadata
+        if workers > 1 and os.path.getsize(path) > part_size:
+            # an XML API multipart upload, whose parts are uploaded concurrently and assembled once they are all in.
+            transfer_manager.upload_chunks_concurrently(
+                path,
+                blob_obj,
+                content_type=content_type,
+                chunk_size=part_size,
+                worker_type=transfer_manager.THREAD,
+                max_workers=workers)
+        else:
+            # a resumable upload, one part at a time.
+            blob_obj.chunk_size = part_size
+            blob_obj.upload_from_filename(path, content_type=content_type)
+
+    @CatchTimeouts
+    def upload_if_generation_match(self, bucket: str, key: str, data: bytes, generation: int) -> int:
+        blob_obj = self._ensure_bucket_loaded(bucket).blob(key)
+        try:
+            blob_obj.upload_from_string(data, if_generation_match=generation)
+        except PreconditionFailed as ex:
+            raise BlobPreconditionFailedError(f"gs://{bucket}/{key} does not match generation {generation}") from ex
+        return int(blob_obj.generation)
+
+    @CatchTimeouts
+    def stat(self, bucket: str, key: str) -> BlobStat:
+        return self._blob_stat(self._get_blob_obj(bucket, key))
+
+    @CatchTimeouts
+    def copy_and_stat(
+            self,
+            src_bucket: str, src_key: str,
+            dst_bucket: str, dst_key: str,
+            copy_token: typing.Any=None) -> BlobStat:
+        src_bucket_obj = self._ensure_bucket_loaded(src_bucket)
+        dst_bucket_obj = self._ensure_bucket_loaded(dst_bucket)
+        # the copy only needs the name of the source, so there is no need to fetch it first.
+        src_blob_obj = src_bucket_obj.blob(src_key)
+        try:
+            dst_blob_obj = src_bucket_obj.copy_blob(
+                src_blob_obj, dst_bucket_obj, new_name=dst_key, source_generation=copy_token)
+        except NotFound as ex:
+            raise BlobNotFoundError(f"Could not find gs://{src_bucket}/{src_key}") from ex
+        return self._blob_stat(dst_blob_obj)
+
+    @CatchTimeouts
+    def rewrite(
+            self,
+            src_bucket: str, src_key: str,
+            dst_bucket: str, dst_key: str,
+            token: str=None,
+            copy_token: typing.Any=None) -> RewriteProgress:
+        src_blob_obj = self._ensure_bucket_loaded(src_bucket).blob(src_key, generation=copy_token)
+        dst_blob_obj = self._ensure_bucket_loaded(dst_bucket).blob(dst_key)
+        try:
+            token, bytes_rewritten, total_bytes = dst_blob_obj.rewrite(src_blob_obj, token=token)
+        except NotFound as ex:
+            raise BlobNotFoundError(f"Could not find gs://{src_bucket}/{src_key}") from ex
+        except GoogleAPICallError as ex:
+            # GCS rejects a rewrite token that is invalid or has expired with 400 or 410.
+            if token is None or ex.code not in (400, 410):
+                raise
+            raise BlobRewriteTokenError(f"Cannot continue the rewrite to gs://{dst_bucket}/{dst_key}") from ex
+        return RewriteProgress(
+            token=token,
+            bytes_rewritten=bytes_rewritten,
+            total_bytes=total_bytes,
+            # the destination's properties are only filled in by the final step.
+            stat=None if token else self._blob_stat(dst_blob_obj),
+        )
+
+    def _blob_stat(self, blob_obj) -> BlobStat:
+        return BlobStat(
+            size=blob_obj.size,
+            content_type=blob_obj.content_type,
+            user_metadata=blob_obj.metadata or dict(),
+            cloud_checksum=self.compute_cloud_checksum(blob_obj),
+            generation=blob_obj.generation,
+        )
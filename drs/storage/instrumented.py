@@ -0,0 +1,34 @@
+import functools
+import types
+import typing
+
+from drs.util.metrics import timed, timed_iterator
+
+
+class InstrumentedBlobStore:
+    """
+    Proxy for a blobstore handle that records every call made through it as a span called `blobstore.<method>`.  Calls
+    the handle makes to itself are not recorded separately.  For methods that return a generator, such as `list`, the
+    time spent iterating is recorded as well.
+    """
+
+    def __init__(self, handle: typing.Any) -> None:
+        self.handle = handle
+
+    def __getattr__(self, name: str) -> typing.Any:
+        attribute = getattr(self.handle, name)
+        if name.startswith("_") or not callable(attribute):
+            return attribute
+        span = f"blobstore.{name}"
+
+        @functools.wraps(attribute)
+        def wrapper(*args, **kwargs):
+            with timed(span):
+                result = attribute(*args, **kwargs)
+            if isinstance(result, types.GeneratorType):
+                result = timed_iterator(span + ".iterate", result)
+            return result
+
+        # later lookups find the wrapper without going through __getattr__.
+        setattr(self, name, wrapper)
+        return wrapper
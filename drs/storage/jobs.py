@@ -0,0 +1,119 @@
+import json
+import os
+import time
+import typing
+import uuid
+
+from cloud_blobstore import BlobAlreadyExistsError, BlobNotFoundError
+
+from drs.storage.blobstore import BlobPreconditionFailedError, DRSBlobStore
+
+# namespace for job IDs, which are derived from the FQID of the file being copied.
+JOB_ID_NAMESPACE = uuid.UUID("3b2a3c8e-6f4e-4f0a-9c55-5a1e1d7c2b90")
+
+
+class JobStatus:
+    PENDING = "pending"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+
+def get_job_lease() -> float:
+    """
+    Seconds after its last update that a pending or running job is considered abandoned, e.g., because the process
+    running it was restarted.  Abandoned jobs may be claimed and run again by any process.  A running copy job records
+    its progress after every rewrite step, which renews its lease, so the lease only needs to outlast a single step.
+    """
+    return float(os.environ.get("DRS_JOB_LEASE_SECONDS", 300))
+
+
+def job_id_for(file_uuid: str, file_version: str) -> str:
+    # a file version can only be created once, so there is at most one copy job for it.
+    return str(uuid.uuid5(JOB_ID_NAMESPACE, f"{file_uuid}.{file_version}"))
+
+
+def job_key(job_id: str) -> str:
+    return f"jobs/{job_id}"
+
+
+def create_job(handle: DRSBlobStore, bucket: str, job: dict) -> typing.Optional[int]:
+    """
+    Persist a new job document.
+    :return: the generation of the new document, or None if a job with the same ID already exists.
+    """
+    try:
+        return handle.upload_if_absent(bucket, job_key(job['job_id']), _new_job_document(job))
+    except BlobAlreadyExistsError:
+        return None
+
+
+def replace_job(handle: DRSBlobStore, bucket: str, job: dict, generation: int) -> typing.Optional[int]:
+    """
+    Replace a job document with a new job, provided nobody else has updated it since `generation` was read.
+    :return: the generation of the new document, or None if the job was updated in the meantime.
+    """
+    try:
+        return handle.upload_if_generation_match(bucket, job_key(job['job_id']), _new_job_document(job), generation)
+    except BlobPreconditionFailedError:
+        return None
+
+
+def _new_job_document(job: dict) -> bytes:
+    now = time.time()
+    job = dict(job, status=JobStatus.PENDING, created=now, updated=now)
+    return json.dumps(job).encode("utf-8")
+
+
+def get_job(handle: DRSBlobStore, bucket: str, job_id: str) -> typing.Tuple[dict, int]:
+    """
+    Returns the job document and its generation.  Raises BlobNotFoundError if there is no such job.
+    """
+    data, generation = handle.get_with_generation(bucket, job_key(job_id))
+    return json.loads(data.decode("utf-8")), generation
+
+
+def update_job(handle: DRSBlobStore, bucket: str, job: dict, generation: int, **changes) -> typing.Tuple[dict, int]:
+    """
+    Apply `changes` to a job document, provided nobody else has updated it since `generation` was read.  Raises
+    BlobPreconditionFailedError otherwise.
+    :return: the updated job document and its new generation.
+    """
+    job = dict(job, updated=time.time(), **changes)
+    generation = handle.upload_if_generation_match(
+        bucket, job_key(job['job_id']), json.dumps(job).encode("utf-8"), generation)
+    return job, generation
+
+
+def is_abandoned(job: dict, now: float = None) -> bool:
+    if job['status'] not in (JobStatus.PENDING, JobStatus.RUNNING):
+        return False
+    if now is None:
+        now = time.time()
+    return now - job['updated'] > get_job_lease()
+
+
+def claim_job(
+        handle: DRSBlobStore,
+        bucket: str,
+        job_id: str,
+        generation: int = None) -> typing.Optional[typing.Tuple[dict, int]]:
+    """
+    Mark a job as running in this process.  If `generation` is given, e.g., because the caller just created the job, it
+    is claimed only if nobody has touched it since.  Otherwise, it is claimed only if it has failed or was abandoned.
+    :return: the claimed job document and its generation, or None if the job cannot be claimed.
+    """
+    try:
+        job, current_generation = get_job(handle, bucket, job_id)
+    except BlobNotFoundError:
+        return None
+    if generation is None:
+        if job['status'] != JobStatus.FAILED and not is_abandoned(job):
+            return None
+    elif generation != current_generation:
+        return None
+    try:
+        return update_job(handle, bucket, job, current_generation, status=JobStatus.RUNNING, result=None)
+    except BlobPreconditionFailedError:
+        # another process got there first.
+        return None
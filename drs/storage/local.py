@@ -0,0 +1,257 @@
+import json
+import os
+import tempfile
+import threading
+import time
+import typing
+
+import google_crc32c
+from cloud_blobstore import BlobNotFoundError
+
+from drs.storage.blobstore import BlobPreconditionFailedError, BlobStat, DRSBlobStore
+
+
+class _Blob(typing.NamedTuple):
+    data: bytes
+    generation: int
+    content_type: typing.Optional[str]
+    metadata: typing.Dict[str, str]
+
+
+class MemoryBlobStore(DRSBlobStore):
+    """
+    Blobstore that keeps everything in memory.  It implements the same semantics as the cloud backends, including
+    generations and preconditions, so code that depends on them can be tested without a bucket.  Buckets spring into
+    existence when they are first written to.
+
+    Every call sleeps for `latency` seconds before doing anything, to stand in for the round trip to a real blobstore.
+    """
+
+    def __init__(self, latency: float = 0.0) -> None:
+        super().__init__()
+        self.latency = latency
+        self._lock = threading.Lock()
+        self._blobs = dict()  # type: typing.Dict[typing.Tuple[str, str], _Blob]
+        self._generation = 0
+
+    # the storage primitives below are called with the lock held.  subclasses override them to keep the blobs somewhere
+    # other than in memory.
+
+    def _load(self, bucket: str, key: str) -> typing.Optional[_Blob]:
+        return self._blobs.get((bucket, key))
+
+    def _store(self, bucket: str, key: str, blob: _Blob) -> None:
+        self._blobs[(bucket, key)] = blob
+
+    def _remove(self, bucket: str, key: str) -> None:
+        self._blobs.pop((bucket, key), None)
+
+    def _keys(self, bucket: str) -> typing.Iterable[str]:
+        return [key for blob_bucket, key in self._blobs if blob_bucket == bucket]
+
+    def _delay(self) -> None:
+        if self.latency > 0:
+            time.sleep(self.latency)
+
+    def _get_blob(self, bucket: str, key: str) -> _Blob:
+        blob = self._load(bucket, key)
+        if blob is None:
+            raise BlobNotFoundError(f"Could not find {bucket}/{key}")
+        return blob
+
+    def _put_blob(self, bucket: str, key: str, data: bytes, content_type: str=None, metadata: dict=None) -> int:
+        self._generation += 1
+        self._store(bucket, key, _Blob(data, self._generation, content_type, dict(metadata or {})))
+        return self._generation
+
+    def list(
+            self,
+            bucket: str,
+            prefix: str=None,
+            delimiter: str=None,
+    ) -> typing.Iterator[str]:
+        self._delay()
+        prefix = prefix or ""
+        returned = set()
+        for key in self._list_now(bucket, prefix):
+            if delimiter:
+                position = key.find(delimiter, len(prefix))
+                if position >= 0:
+                    key = key[:position + len(delimiter)]
+            if key not in returned:
+                returned.add(key)
+                yield key
+
+    def upload_file_handle(
+            self,
+            bucket: str,
+            key: str,
+            src_file_handle: typing.BinaryIO,
+            content_type: str=None,
+            metadata: dict=None):
+        self._delay()
+        data = src_file_handle.read()
+        with self._lock:
+            self._put_blob(bucket, key, data, content_type, metadata)
+
+    def upload_if_generation_match(self, bucket: str, key: str, data: bytes, generation: int) -> int:
+        self._delay()
+        with self._lock:
+            blob = self._load(bucket, key)
+            current_generation = 0 if blob is None else blob.generation
+            if current_generation != generation:
+                raise BlobPreconditionFailedError(f"{bucket}/{key} does not match generation {generation}")
+            return self._put_blob(bucket, key, data)
+
+    def delete(self, bucket: str, key: str) -> None:
+        """Deletes a blob.  Deleting a blob that does not exist does nothing."""
+        self._delay()
+        with self._lock:
+            self._remove(bucket, key)
+
+    def get(self, bucket: str, key: str) -> bytes:
+        self._delay()
+        return self._get_now(bucket, key)
+
+    # reads without the delay, for drs.storage.aio, which waits out the latency without blocking.
+
+    def _get_now(self, bucket: str, key: str) -> bytes:
+        with self._lock:
+            return self._get_blob(bucket, key).data
+
+    def _list_now(self, bucket: str, prefix: str) -> typing.List[str]:
+        with self._lock:
+            return sorted(key for key in self._keys(bucket) if key.startswith(prefix))
+
+    def get_with_generation(self, bucket: str, key: str) -> typing.Tuple[bytes, int]:
+        self._delay()
+        with self._lock:
+            blob = self._get_blob(bucket, key)
+        return blob.data, blob.generation
+
+    def get_range(self, bucket: str, key: str, start: int, end: int) -> bytes:
+        self._delay()
+        with self._lock:
+            return self._get_blob(bucket, key).data[start:end + 1]
+
+    def get_cloud_checksum(self, bucket: str, key: str) -> str:
+        return self.stat(bucket, key).cloud_checksum
+
+    def get_content_type(self, bucket: str, key: str) -> str:
+        return self.stat(bucket, key).content_type
+
+    def get_user_metadata(self, bucket: str, key: str) -> typing.Dict[str, str]:
+        return self.stat(bucket, key).user_metadata
+
+    def get_size(self, bucket: str, key: str) -> int:
+        return self.stat(bucket, key).size
+
+    def stat(self, bucket: str, key: str) -> BlobStat:
+        self._delay()
+        with self._lock:
+            blob = self._get_blob(bucket, key)
+        return BlobStat(
+            size=len(blob.data),
+            content_type=blob.content_type,
+            user_metadata=dict(blob.metadata),
+            # same format as the GCS backend: the CRC32C as 8 lower-case hex digits.
+            cloud_checksum=f"{google_crc32c.value(blob.data):08x}",
+            generation=blob.generation,
+        )
+
+    def copy(
+            self,
+            src_bucket: str, src_key: str,
+            dst_bucket: str, dst_key: str,
+            copy_token: typing.Any=None,
+            **kwargs):
+        self._delay()
+        with self._lock:
+            blob = self._get_blob(src_bucket, src_key)
+            if copy_token is not None and copy_token != blob.generation:
+                raise BlobPreconditionFailedError(f"{src_bucket}/{src_key} does not match generation {copy_token}")
+            self._put_blob(dst_bucket, dst_key, blob.data, blob.content_type, blob.metadata)
+
+    def check_bucket_exists(self, bucket: str) -> bool:
+        self._delay()
+        with self._lock:
+            return any(True for _ in self._keys(bucket))
+
+
+class FilesystemBlobStore(MemoryBlobStore):
+    """
+    Blobstore kept in a local directory.  The contents of a blob are stored at `<root>/<bucket>/<key>`, and its
+    generation, content type and user metadata alongside, at `<root>/.metadata/<bucket>/<key>.json`.
+
+    Preconditions are only enforced between the threads of one process, and a key cannot also be the prefix of another
+    key followed by "/".
+    """
+
+    METADATA_DIR = ".metadata"
+
+    def __init__(self, root: str, latency: float = 0.0) -> None:
+        super().__init__(latency)
+        self.root = os.path.abspath(root)
+        # generations must keep increasing across restarts.
+        self._generation = time.time_ns()
+
+    def _data_path(self, bucket: str, key: str) -> str:
+        return os.path.join(self.root, bucket, *key.split("/"))
+
+    def _metadata_path(self, bucket: str, key: str) -> str:
+        return os.path.join(self.root, self.METADATA_DIR, bucket, *key.split("/")) + ".json"
+
+    @staticmethod
+    def _write_atomically(path: str, data: bytes) -> None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as fh:
+                fh.write(data)
+            os.replace(temp_path, path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+    def _load(self, bucket: str, key: str) -> typing.Optional[_Blob]:
+        try:
+            with open(self._metadata_path(bucket, key)) as fh:
+                attributes = json.load(fh)
+            with open(self._data_path(bucket, key), "rb") as fh:
+                data = fh.read()
+        except (FileNotFoundError, NotADirectoryError, IsADirectoryError):
+            return None
+        return _Blob(data, attributes['generation'], attributes['content_type'], attributes['metadata'])
+
+    def get_range(self, bucket: str, key: str, start: int, end: int) -> bytes:
+        # blobs are replaced atomically, so a file that is open can be read without the lock.
+        self._delay()
+        try:
+            with open(self._data_path(bucket, key), "rb") as fh:
+                fh.seek(start)
+                return fh.read(end + 1 - start)
+        except (FileNotFoundError, NotADirectoryError, IsADirectoryError):
+            raise BlobNotFoundError(f"Could not find {bucket}/{key}")
+
+    def _store(self, bucket: str, key: str, blob: _Blob) -> None:
+        attributes = dict(generation=blob.generation, content_type=blob.content_type, metadata=blob.metadata)
+        self._write_atomically(self._data_path(bucket, key), blob.data)
+        # the blob exists once its metadata does.
+        self._write_atomically(self._metadata_path(bucket, key), json.dumps(attributes).encode("utf-8"))
+
+    def _remove(self, bucket: str, key: str) -> None:
+        try:
+            os.unlink(self._metadata_path(bucket, key))
+        except (FileNotFoundError, NotADirectoryError):
+            return
+        os.unlink(self._data_path(bucket, key))
+
+    def _keys(self, bucket: str) -> typing.Iterable[str]:
+        metadata_root = os.path.join(self.root, self.METADATA_DIR, bucket)
+        suffix = ".json"
+        for directory, _, filenames in os.walk(metadata_root):
+            relative = os.path.relpath(directory, metadata_root)
+            for filename in filenames:
+                if filename.endswith(suffix) and not filename.startswith(".tmp-"):
+                    path = os.path.normpath(os.path.join(relative, filename[:-len(suffix)]))
+                    yield path.replace(os.sep, "/")
@@ -0,0 +1,107 @@
+import os
+import threading
+import time
+import typing
+
+import requests.adapters
+
+DEFAULT_POOL_SIZE = 10
+
+
+def get_pool_size() -> int:
+    """
+    Number of pooled HTTP connections kept per host.  Each gunicorn worker is a separate process with its own pool, so
+    this should be sized to the number of threads per worker.
+    """
+    return int(os.environ.get("DRS_GCS_POOL_SIZE", DEFAULT_POOL_SIZE))
+
+
+def create_http_adapter(pool_size: int) -> requests.adapters.HTTPAdapter:
+    return requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+
+
+class HandleRegistry:
+    """
+    Process-wide holder for a blobstore handle.  The handle is built lazily by `factory` on first use and shared by
+    every thread in the process.  After a fork (e.g., gunicorn preloading the app before spawning workers), the child
+    discards the inherited handle, since its connections and credential state belong to the parent, and builds a new
+    one on next use.
+
+    `factory` returns a tuple of (handle, http adapter).  The adapter may be None if the handle does not pool
+    connections; otherwise it is used to report pool statistics.
+    """
+
+    def __init__(self, factory: typing.Callable[[], typing.Tuple[typing.Any, typing.Optional[typing.Any]]]) -> None:
+        self._factory = factory
+        self._lock = threading.Lock()
+        self._handle = None  # type: typing.Any
+        self._adapter = None  # type: typing.Any
+        self._pid = None  # type: typing.Optional[int]
+        self._created = None  # type: typing.Optional[float]
+        self._acquisitions = 0
+        self._initializations = 0
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def get(self) -> typing.Any:
+        with self._lock:
+            if self._handle is None or self._pid != os.getpid():
+                self._handle, self._adapter = self._factory()
+                self._pid = os.getpid()
+                self._created = time.time()
+                self._initializations += 1
+            self._acquisitions += 1
+            return self._handle
+
+    def reset(self) -> None:
+        """Drop the current handle, closing its pooled connections.  The next `get` builds a new one."""
+        with self._lock:
+            if self._adapter is not None and self._pid == os.getpid():
+                self._adapter.close()
+            self._handle = None
+            self._adapter = None
+            self._pid = None
+
+    def _after_fork(self) -> None:
+        # the lock may have been held by another thread of the parent at the time of the fork, so it cannot be trusted
+        # in the child.  the inherited sockets are shared with the parent, so they must not be closed here either.
+        self._lock = threading.Lock()
+        self._handle = None
+        self._adapter = None
+        self._pid = None
+        self._acquisitions = 0
+        self._initializations = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(
+                pid=os.getpid(),
+                initialized=self._handle is not None and self._pid == os.getpid(),
+                pool_size=get_pool_size(),
+                acquisitions=self._acquisitions,
+                initializations=self._initializations,
+            )  # type: typing.Dict[str, typing.Any]
+            if not stats['initialized']:
+                return stats
+            stats['age_seconds'] = time.time() - self._created
+            stats['hosts'] = _connection_pool_stats(self._adapter)
+            return stats
+
+
+def _connection_pool_stats(adapter: typing.Optional[requests.adapters.HTTPAdapter]) -> typing.List[dict]:
+    if adapter is None:
+        return []
+    hosts = list()
+    pools = adapter.poolmanager.pools
+    for key in pools.keys():
+        pool = pools.get(key)
+        if pool is None:
+            continue
+        hosts.append(dict(
+            host=pool.host,
+            port=pool.port,
+            connections_created=pool.num_connections,
+            requests=pool.num_requests,
+            idle_connections=pool.pool.qsize() if pool.pool is not None else 0,
+        ))
+    return hosts
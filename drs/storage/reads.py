@@ -0,0 +1,170 @@
+"""
+Lookups that can be run against either a blobstore handle or an asyncio reader.
+
+A lookup is a generator that yields the reads it needs, as `Get` and `List` values, and is sent the result of each one;
+a `Get` of an object that does not exist raises BlobNotFoundError inside the generator instead.  It may also yield
+`Spawn` to start another lookup in the background, with the same handle or reader.  The lookup's return value is its
+result.  `run` performs the reads with a blocking handle, and `run_async` awaits them with a reader from
+drs.storage.aio, so the logic of a lookup (caching, fallbacks, which errors mean "not found") is written once.
+
+Identical reads that are in flight at the same time in this process are made once, and their result is shared by every
+lookup waiting for it.  Many clients looking up the same file at once (e.g., the tasks of a job that start together)
+then cost one call to the blobstore for each read, rather than one per client.  A read is only shared with lookups
+that start before the object it reads is written by this process (see `note_write`), so a lookup never receives what was
+read from before a write that this process has already made.
+"""
+import asyncio
+import functools
+import logging
+import os
+import threading
+import typing
+
+from cloud_blobstore import BlobNotFoundError
+
+from drs.util.concurrency import AsyncSingleFlight, SingleFlight, get_executor
+from drs.util.metrics import timed
+
+logger = logging.getLogger(__name__)
+
+
+class Get(typing.NamedTuple):
+    """Read the contents of an object.  The result is bytes."""
+    bucket: str
+    key: str
+
+
+class List(typing.NamedTuple):
+    """List the keys of the objects that start with `prefix`.  The result is a tuple of keys."""
+    bucket: str
+    prefix: str
+
+
+class Spawn(typing.NamedTuple):
+    """Start running `lookup` in the background, without waiting for it.  The result is None."""
+    lookup: typing.Generator
+
+
+Read = typing.Union[Get, List, Spawn]
+Lookup = typing.Generator[Read, typing.Any, typing.Any]
+
+# the number of threads that run spawned lookups with a blocking handle.
+BACKGROUND_THREADS = 4
+
+_flight = SingleFlight()
+# the async reads of the process are made by the event loop of the ASGI app.
+_async_flight = AsyncSingleFlight()
+
+# write generations, which are part of the key that reads are shared under, so that a read that started before a write
+# is not shared with lookups that start after it.  objects are hashed into a fixed number of slots, so the memory used
+# does not grow with the number of objects written; a collision only costs a read that could have been shared.  a write
+# may change the result of any listing of its bucket, so listings are keyed by a generation per bucket.
+_GENERATION_SLOTS = 4096
+_generations = [0] * _GENERATION_SLOTS
+_list_generations = dict()  # type: typing.Dict[str, int]
+_generations_lock = threading.Lock()
+
+
+def note_write(bucket: str, key: str) -> None:
+    """
+    Records that this process has written (or deleted) `key`, so reads of it, or listings of its bucket, that are
+    already in flight are not shared with lookups that start from now on.  It must be called after the write is done.
+    """
+    with _generations_lock:
+        _generations[hash((bucket, key)) % _GENERATION_SLOTS] += 1
+        _list_generations[bucket] = _list_generations.get(bucket, 0) + 1
+
+
+def _flight_key(source: typing.Any, read: typing.Union[Get, List]) -> typing.Hashable:
+    if isinstance(read, Get):
+        generation = _generations[hash((read.bucket, read.key)) % _GENERATION_SLOTS]
+    else:
+        generation = _list_generations.get(read.bucket, 0)
+    return id(source), read, generation
+
+
+def _perform(handle: typing.Any, read: typing.Union[Get, List]) -> typing.Any:
+    if isinstance(read, Get):
+        return handle.get(read.bucket, read.key)
+    # a tuple, since the same result may be handed to several lookups.
+    return tuple(handle.list(read.bucket, read.prefix))
+
+
+async def _perform_async(reader: typing.Any, read: typing.Union[Get, List]) -> typing.Any:
+    if isinstance(read, Get):
+        with timed("aio.get"):
+            return await reader.get(read.bucket, read.key)
+    with timed("aio.list"):
+        return tuple(await reader.list(read.bucket, read.prefix))
+
+
+def run(handle: typing.Any, lookup: Lookup) -> typing.Any:
+    """Run `lookup`, reading with a blobstore handle."""
+    result, error = None, None
+    while True:
+        try:
+            read = lookup.send(result) if error is None else lookup.throw(error)
+        except StopIteration as ex:
+            return ex.value
+        result, error = None, None
+        if isinstance(read, Spawn):
+            future = get_executor("lookups", BACKGROUND_THREADS).submit(run, handle, read.lookup)
+            future.add_done_callback(lambda future: _log_failure(future.exception()))
+            continue
+        try:
+            result = _flight.do(_flight_key(handle, read), functools.partial(_perform, handle, read))
+        except BlobNotFoundError as ex:
+            error = ex
+
+
+async def run_async(reader: typing.Any, lookup: Lookup) -> typing.Any:
+    """Run `lookup`, awaiting reads from a :class:`~drs.storage.aio.AsyncBlobReader`."""
+    result, error = None, None
+    while True:
+        try:
+            read = lookup.send(result) if error is None else lookup.throw(error)
+        except StopIteration as ex:
+            return ex.value
+        result, error = None, None
+        if isinstance(read, Spawn):
+            task = asyncio.ensure_future(run_async(reader, read.lookup))
+            # the loop only keeps weak references to tasks, so one that nothing refers to could be collected mid-way.
+            _background_tasks.add(task)
+            task.add_done_callback(_background_task_done)
+            continue
+        try:
+            result = await _async_flight.do(
+                _flight_key(reader, read), functools.partial(_perform_async, reader, read))
+        except BlobNotFoundError as ex:
+            error = ex
+
+
+_background_tasks = set()  # type: typing.Set[asyncio.Future]
+
+
+def _background_task_done(task: asyncio.Future) -> None:
+    _background_tasks.discard(task)
+    if not task.cancelled():
+        _log_failure(task.exception())
+
+
+def _log_failure(exception: typing.Optional[BaseException]) -> None:
+    if exception is not None:
+        logger.warning("Background lookup failed", exc_info=exception)
+
+
+def get_coalescing_stats() -> dict:
+    """Counts of the reads that were made, and of those that shared a read already in flight."""
+    return dict(sync=_flight.stats(), asyncio=_async_flight.stats())
+
+
+def _after_fork() -> None:
+    # reads in flight in the parent will never finish in the child.
+    global _flight, _async_flight, _generations_lock
+    _flight = SingleFlight()
+    _async_flight = AsyncSingleFlight()
+    _generations_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork)
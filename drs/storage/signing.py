@@ -0,0 +1,142 @@
+import binascii
+import datetime
+import hashlib
+import os
+import time
+import typing
+from urllib.parse import quote
+
+from drs.storage.pool import HandleRegistry
+from drs.util.cache import LRUCache
+
+ENDPOINT = "https://storage.googleapis.com"
+HOST = "storage.googleapis.com"
+# the longest lifetime GCS allows for a V4 signed URL.
+MAX_EXPIRY = 7 * 24 * 60 * 60
+
+
+def _quote_param(value: typing.Any) -> str:
+    return quote(str(value), safe="~")
+
+
+class URLSigner:
+    """
+    Issues V4 signed URLs for GET requests of GCS objects.
+
+    `credentials` is anything that implements `sign_bytes` and `signer_email` as google.auth's signing credentials do.
+    RSA signatures are expensive, so time is divided into windows of `reuse` seconds, and every URL for the same blob
+    issued within a window is the same URL, served from a cache of `cache_size` entries.  That URL is signed as of the
+    start of the window, and stays valid for `expiry` seconds after the end of it.
+    """
+
+    def __init__(
+            self,
+            credentials: typing.Any,
+            expiry: int,
+            reuse: int,
+            cache_size: int,
+            clock: typing.Callable[[], float] = time.time) -> None:
+        if reuse <= 0 or expiry + reuse > MAX_EXPIRY:
+            raise ValueError(f"Signed URLs must be reused for a positive time, and expire within {MAX_EXPIRY} seconds")
+        self.credentials = credentials
+        self.expiry = expiry
+        self.reuse = reuse
+        self.cache = LRUCache(cache_size)
+        self._clock = clock
+
+    def sign(self, bucket: str, key: str) -> str:
+        window = int(self._clock() // self.reuse)
+        cache_key = (bucket, key, window)
+        url = self.cache.get(cache_key)
+        if url is None:
+            request_time = datetime.datetime.utcfromtimestamp(window * self.reuse)
+            url = self.sign_url(bucket, key, request_time, self.expiry + self.reuse)
+            self.cache.put(cache_key, url, 1)
+        return url
+
+    def sign_url(self, bucket: str, key: str, request_time: datetime.datetime, expires: int) -> str:
+        """Returns a URL to GET `key`, valid from `request_time` (in UTC) for `expires` seconds."""
+        request_timestamp = request_time.strftime("%Y%m%dT%H%M%SZ")
+        credential_scope = f"{request_time.strftime('%Y%m%d')}/auto/storage/goog4_request"
+        resource = f"/{bucket}/{quote(key, safe='/~')}"
+        query_parameters = {
+            'X-Goog-Algorithm': "GOOG4-RSA-SHA256",
+            'X-Goog-Credential': f"{self.credentials.signer_email}/{credential_scope}",
+            'X-Goog-Date': request_timestamp,
+            'X-Goog-Expires': expires,
+            'X-Goog-SignedHeaders': "host",
+        }
+        canonical_query_string = "&".join(
+            f"{_quote_param(name)}={_quote_param(value)}" for name, value in sorted(query_parameters.items()))
+        canonical_request = "\n".join((
+            "GET",
+            resource,
+            canonical_query_string,
+            f"host:{HOST}\n",
+            "host",
+            "UNSIGNED-PAYLOAD",
+        ))
+        string_to_sign = "\n".join((
+            "GOOG4-RSA-SHA256",
+            request_timestamp,
+            credential_scope,
+            hashlib.sha256(canonical_request.encode("utf-8")).hexdigest(),
+        ))
+        signature = binascii.hexlify(self.credentials.sign_bytes(string_to_sign.encode("utf-8"))).decode("ascii")
+        return f"{ENDPOINT}{resource}?{canonical_query_string}&X-Goog-Signature={signature}"
+
+
+class _IAMSigningCredentials:
+    """Signs with the IAM signBlob API, for credentials without a private key, such as App Engine's."""
+
+    def __init__(self, signer: typing.Any, signer_email: str) -> None:
+        self._signer = signer
+        self.signer_email = signer_email
+
+    def sign_bytes(self, message: bytes) -> bytes:
+        return self._signer.sign(message)
+
+
+def _load_signing_credentials() -> typing.Any:
+    """
+    Returns the service account key in DRS_SIGNING_KEY_FILE if it is set, and the application default credentials
+    otherwise.
+    """
+    key_file = os.environ.get("DRS_SIGNING_KEY_FILE")
+    if key_file:
+        from google.oauth2 import service_account
+        return service_account.Credentials.from_service_account_file(key_file)
+
+    import google.auth
+    import google.auth.credentials
+    from google.auth import iam
+    from google.auth.transport.requests import Request
+
+    credentials, _ = google.auth.default(scopes=["https://www.googleapis.com/auth/cloud-platform"])
+    if isinstance(credentials, google.auth.credentials.Signing):
+        return credentials
+    request = Request()
+    credentials.refresh(request)
+    # compute engine credentials know the email of their service account once refreshed; credentials in general do not.
+    service_account_email = getattr(credentials, "service_account_email", None)
+    if not service_account_email:
+        raise ValueError("The application default credentials cannot sign URLs; set DRS_SIGNING_KEY_FILE")
+    return _IAMSigningCredentials(iam.Signer(request, credentials, service_account_email), service_account_email)
+
+
+def _create_url_signer() -> typing.Tuple[URLSigner, None]:
+    signer = URLSigner(
+        _load_signing_credentials(),
+        expiry=int(os.environ.get("DRS_SIGNED_URL_EXPIRY", 3600)),
+        reuse=int(os.environ.get("DRS_SIGNED_URL_REUSE", 300)),
+        cache_size=int(os.environ.get("DRS_SIGNED_URL_CACHE_SIZE", 100000)),
+    )
+    return signer, None
+
+
+_signer_registry = HandleRegistry(_create_url_signer)
+
+
+def get_url_signer() -> URLSigner:
+    """Returns the URL signer shared by all threads of this process."""
+    return _signer_registry.get()
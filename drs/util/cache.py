@@ -0,0 +1,237 @@
+import collections
+import threading
+import time
+import typing
+
+
+class LRUCache:
+    """
+    Thread-safe least-recently-used cache bounded by the total size of its entries.  The size of each entry is supplied
+    by the caller, so it can be measured in whatever unit is cheapest to compute (e.g., the length of the serialized
+    document the value was parsed from).
+    """
+
+    def __init__(self, max_size: int) -> None:
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._entries = collections.OrderedDict()  # type: collections.OrderedDict
+        self._size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: typing.Hashable) -> typing.Any:
+        """Returns the cached value for `key`, or None if it is not cached."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: typing.Hashable, value: typing.Any, size: int) -> None:
+        if size > self.max_size:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= previous[1]
+            self._entries[key] = (value, size)
+            self._size += size
+            while self._size > self.max_size:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._size -= evicted_size
+                self.evictions += 1
+
+    def invalidate(self, key: typing.Hashable) -> None:
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._size -= entry[1]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(
+                entries=len(self._entries),
+                size=self._size,
+                max_size=self.max_size,
+                hits=self.hits,
+                misses=self.misses,
+                evictions=self.evictions,
+            )
+
+
+class TTLSet:
+    """
+    Thread-safe set whose members expire `ttl` seconds after they are added.  At most `max_entries` members are kept;
+    beyond that, the oldest are dropped first.
+
+    As with :class:`StaleWhileRevalidateCache`, a caller that adds a member because of what it read takes the `epoch`
+    before reading, and passes it to :meth:`add`, which ignores the member if anything was discarded in between.
+    """
+
+    def __init__(self, ttl: float, max_entries: int, clock: typing.Callable[[], float] = time.monotonic) -> None:
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._expiry = collections.OrderedDict()  # type: collections.OrderedDict
+        self._epoch = 0
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def epoch(self) -> int:
+        with self._lock:
+            return self._epoch
+
+    def add(self, key: typing.Hashable, epoch: int = None) -> None:
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            if epoch is not None and epoch != self._epoch:
+                return
+            self._expiry.pop(key, None)
+            self._expiry[key] = self._clock() + self.ttl
+            while len(self._expiry) > self.max_entries:
+                self._expiry.popitem(last=False)
+
+    def __contains__(self, key: typing.Hashable) -> bool:
+        with self._lock:
+            expiry = self._expiry.get(key)
+            if expiry is not None and expiry <= self._clock():
+                del self._expiry[key]
+                expiry = None
+            if expiry is None:
+                self.misses += 1
+                return False
+            self.hits += 1
+            return True
+
+    def discard(self, key: typing.Hashable) -> None:
+        with self._lock:
+            self._expiry.pop(key, None)
+            self._epoch += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._expiry.clear()
+            self._epoch += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(
+                entries=len(self._expiry),
+                ttl=self.ttl,
+                hits=self.hits,
+                misses=self.misses,
+            )
+
+
+class StaleWhileRevalidateCache:
+    """
+    Thread-safe cache whose entries are fresh for `fresh_for` seconds after they are stored, and then stale for
+    `stale_for` seconds more, after which they are dropped.  A stale entry is still served, while one caller, the one
+    that :meth:`claim_refresh` returns True for, refreshes it.  At most `max_entries` entries are kept; beyond that,
+    the least recently stored are dropped first.  If `fresh_for` is not positive, nothing is cached.
+
+    A value read before an entry was invalidated must not be stored after it, or a reader that raced a writer would put
+    back what the writer invalidated.  Callers take the `epoch` before reading and pass it to :meth:`put`, which ignores
+    the value if anything was invalidated in between.
+    """
+
+    def __init__(self, fresh_for: float, stale_for: float, max_entries: int,
+                 clock: typing.Callable[[], float] = time.monotonic) -> None:
+        self.fresh_for = fresh_for
+        self.stale_for = stale_for
+        self.max_entries = max_entries
+        self._clock = clock
+        self._lock = threading.Lock()
+        # key -> [value, time stored, whether a refresh is in flight]
+        self._entries = collections.OrderedDict()  # type: collections.OrderedDict
+        self._epoch = 0
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refreshes = 0
+
+    @property
+    def epoch(self) -> int:
+        with self._lock:
+            return self._epoch
+
+    def get(self, key: typing.Hashable) -> typing.Optional[typing.Tuple[typing.Any, bool]]:
+        """Returns a tuple of (value, whether it is fresh) for `key`, or None if it is not cached."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                age = self._clock() - entry[1]
+                if age < self.fresh_for:
+                    self.hits += 1
+                    return entry[0], True
+                if age < self.fresh_for + self.stale_for:
+                    self.stale_hits += 1
+                    return entry[0], False
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def claim_refresh(self, key: typing.Hashable) -> bool:
+        """Returns True iff the caller should refresh the entry for `key`, i.e., no one else is refreshing it."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[2]:
+                return False
+            entry[2] = True
+            self.refreshes += 1
+            return True
+
+    def abandon_refresh(self, key: typing.Hashable) -> None:
+        """Gives up the refresh of `key`, so that the next caller to find it stale refreshes it instead."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry[2] = False
+
+    def put(self, key: typing.Hashable, value: typing.Any, epoch: int) -> None:
+        if self.fresh_for <= 0:
+            return
+        with self._lock:
+            if epoch != self._epoch:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    entry[2] = False
+                return
+            self._entries.pop(key, None)
+            self._entries[key] = [value, self._clock(), False]
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key: typing.Hashable) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+            self._epoch += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._epoch += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(
+                entries=len(self._entries),
+                fresh_for=self.fresh_for,
+                stale_for=self.stale_for,
+                hits=self.hits,
+                stale_hits=self.stale_hits,
+                misses=self.misses,
+                refreshes=self.refreshes,
+            )
@@ -0,0 +1,103 @@
+import asyncio
+import os
+import threading
+import typing
+from concurrent.futures import Future, ThreadPoolExecutor
+
+_executors = dict()  # type: typing.Dict[str, ThreadPoolExecutor]
+_lock = threading.Lock()
+
+
+def get_executor(name: str, max_workers: int) -> ThreadPoolExecutor:
+    """
+    Returns the process-wide thread pool called `name`, creating it on first use.  Pools are shared by all requests
+    served by this process, so `max_workers` bounds the concurrency of the whole worker, not of a single request.
+    """
+    with _lock:
+        executor = _executors.get(name)
+        if executor is None:
+            executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+            _executors[name] = executor
+        return executor
+
+
+class SingleFlight:
+    """
+    Deduplicates concurrent calls: while a call for a key is in flight, other threads calling for the same key wait for
+    it and receive its result, or its exception, instead of making the call themselves.  Nothing is remembered once the
+    call returns, so later calls for the key are made afresh.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._calls = dict()  # type: typing.Dict[typing.Hashable, Future]
+        self.calls = 0
+        self.coalesced = 0
+
+    def do(self, key: typing.Hashable, function: typing.Callable[[], typing.Any]) -> typing.Any:
+        with self._lock:
+            future = self._calls.get(key)
+            if future is None:
+                future = self._calls[key] = Future()
+                self.calls += 1
+                leader = True
+            else:
+                self.coalesced += 1
+                leader = False
+        if not leader:
+            return future.result()
+
+        try:
+            result = function()
+        except BaseException as ex:
+            self._finish(key)
+            future.set_exception(ex)
+            raise
+        self._finish(key)
+        future.set_result(result)
+        return result
+
+    def _finish(self, key: typing.Hashable) -> None:
+        # calls that arrive from now on make their own call, rather than joining one that has already returned.
+        with self._lock:
+            del self._calls[key]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(calls=self.calls, coalesced=self.coalesced, in_flight=len(self._calls))
+
+
+class AsyncSingleFlight:
+    """
+    :class:`SingleFlight` for coroutines running on one event loop.  The shared call runs as a task of its own, so a
+    caller that is cancelled does not cancel the call for the others.
+    """
+
+    def __init__(self) -> None:
+        self._tasks = dict()  # type: typing.Dict[typing.Hashable, asyncio.Future]
+        self.calls = 0
+        self.coalesced = 0
+
+    async def do(self, key: typing.Hashable, function: typing.Callable[[], typing.Awaitable]) -> typing.Any:
+        task = self._tasks.get(key)
+        if task is None:
+            task = self._tasks[key] = asyncio.ensure_future(function())
+            task.add_done_callback(lambda _: self._tasks.pop(key, None))
+            self.calls += 1
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def stats(self) -> dict:
+        return dict(calls=self.calls, coalesced=self.coalesced, in_flight=len(self._tasks))
+
+
+def _after_fork():
+    # the threads of the parent's pools do not exist in the child.
+    global _lock
+    _lock = threading.Lock()
+    _executors.clear()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork)
@@ -0,0 +1,161 @@
+import bisect
+import contextvars
+import functools
+import threading
+import time
+import typing
+
+# upper bounds, in seconds, of the histogram buckets.
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    def __init__(self, buckets: typing.Sequence[float]) -> None:
+        self.buckets = buckets
+        # the last count is for observations larger than every bucket.
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.total += value
+
+
+class RequestSpans:
+    """The number of calls to, and the total time spent in, each span during one request."""
+
+    def __init__(self) -> None:
+        self.spans = dict()  # type: typing.Dict[str, typing.List[float]]
+
+    def add(self, name: str, seconds: float) -> None:
+        span = self.spans.get(name)
+        if span is None:
+            self.spans[name] = [1, seconds]
+        else:
+            span[0] += 1
+            span[1] += seconds
+
+    def server_timing(self) -> str:
+        """Format the spans as the value of a Server-Timing header, with durations in milliseconds."""
+        return ", ".join(
+            f'{name};dur={seconds * 1000:.3f};desc="{int(count)} calls"' if count > 1 else
+            f'{name};dur={seconds * 1000:.3f}'
+            for name, (count, seconds) in self.spans.items())
+
+
+_request_spans = contextvars.ContextVar("request_spans", default=None)  # type: contextvars.ContextVar
+
+
+def start_request() -> RequestSpans:
+    """Collect the spans observed by this thread from now on, until the next call."""
+    spans = RequestSpans()
+    _request_spans.set(spans)
+    return spans
+
+
+def current_request() -> typing.Optional[RequestSpans]:
+    return _request_spans.get()
+
+
+class MetricsRegistry:
+    """Thread-safe collection of latency histograms, one per span name."""
+
+    def __init__(self, buckets: typing.Sequence[float] = DEFAULT_BUCKETS) -> None:
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._histograms = dict()  # type: typing.Dict[str, Histogram]
+
+    def observe(self, name: str, seconds: float) -> None:
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = Histogram(self.buckets)
+            histogram.observe(seconds)
+        spans = _request_spans.get()
+        if spans is not None:
+            spans.add(name, seconds)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._histograms.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                name: dict(count=histogram.count, total_seconds=histogram.total)
+                for name, histogram in self._histograms.items()
+            }
+
+    def render(self) -> str:
+        """Render the histograms in the Prometheus text exposition format."""
+        metric = "drs_span_duration_seconds"
+        lines = [
+            f"# HELP {metric} Time spent in instrumented operations.",
+            f"# TYPE {metric} histogram",
+        ]
+        with self._lock:
+            for name, histogram in sorted(self._histograms.items()):
+                cumulative = 0
+                for bound, count in zip(list(self.buckets) + ["+Inf"], histogram.counts):
+                    cumulative += count
+                    lines.append(f'{metric}_bucket{{span="{name}",le="{bound}"}} {cumulative}')
+                lines.append(f'{metric}_sum{{span="{name}"}} {histogram.total}')
+                lines.append(f'{metric}_count{{span="{name}"}} {histogram.count}')
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+
+class timed:
+    """
+    Records the time spent in a block, or in every call of a function, as a span called `name`:
+
+        with timed("parse"):
+            ...
+
+        @timed("get_helper")
+        def get_helper(...):
+            ...
+    """
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self._start = None  # type: typing.Optional[float]
+
+    def __enter__(self) -> "timed":
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        registry.observe(self.name, time.perf_counter() - self._start)
+
+    def __call__(self, func: typing.Callable) -> typing.Callable:
+        name = self.name
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            # each call gets its own timer, since calls may overlap in different threads.
+            with timed(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+
+def timed_iterator(name: str, iterator: typing.Iterator) -> typing.Iterator:
+    """Wraps `iterator` so that the time spent producing its items is recorded as one span called `name`."""
+    elapsed = 0.0
+    try:
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                elapsed += time.perf_counter() - start
+            yield item
+    finally:
+        registry.observe(name, elapsed)
@@ -0,0 +1,35 @@
+import threading
+import time
+import typing
+
+
+class RateLimiter:
+    """
+    Thread-safe token bucket: allows `burst` events at once, and `rate` events per second on average after that.  The
+    number of events refused since the last one allowed is kept, so that the next one can report it.
+    """
+
+    def __init__(self, rate: float, burst: int, clock: typing.Callable[[], float] = time.monotonic) -> None:
+        self.rate = rate
+        self.burst = burst
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._tokens = float(burst)
+        self._updated = clock()
+        self._suppressed = 0
+
+    def acquire(self) -> typing.Optional[int]:
+        """
+        Returns None if the event is refused.  Otherwise, returns the number of events refused since the last one that
+        was allowed.
+        """
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(float(self.burst), self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens < 1:
+                self._suppressed += 1
+                return None
+            self._tokens -= 1
+            suppressed, self._suppressed = self._suppressed, 0
+            return suppressed
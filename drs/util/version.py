@@ -1,5 +1,36 @@
 import datetime
+import functools
+import os
+import re
+import typing
 
 
 def datetime_to_version_format(timestamp: datetime.datetime) -> str:
     return timestamp.strftime("%Y-%m-%dT%H%M%S.%fZ")
+
+
+# the strings datetime_to_version_format produces.  %Y does not zero-pad years before 1000, so those never match.
+_VERSION_FORMAT = re.compile(
+    r"([1-9][0-9]{3})-([0-9]{2})-([0-9]{2})"
+    r"T([0-9]{2})([0-9]{2})([0-9]{2})\.([0-9]{6})Z")
+
+
+def is_version_format(val: typing.Any) -> bool:
+    """
+    Returns True iff `val` is a string that datetime_to_version_format could have produced, i.e., a valid timestamp in
+    the format 'YYYY-MM-DDTHHmmSS.zzzzzzZ'.
+    """
+    return isinstance(val, str) and _is_version_format(val)
+
+
+@functools.lru_cache(maxsize=int(os.environ.get("DRS_VERSION_CACHE_SIZE", 4096)))
+def _is_version_format(val: str) -> bool:
+    match = _VERSION_FORMAT.fullmatch(val)
+    if match is None:
+        return False
+    try:
+        # rejects dates and times that do not exist, e.g., February 30th.
+        datetime.datetime(*map(int, match.groups()))  # type: ignore
+    except ValueError:
+        return False
+    return True
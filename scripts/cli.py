@@ -1,13 +1,17 @@
 #!/usr/bin/env python
 
-import io
 import os
 import sys
+import csv
+import time
+import hashlib
 import argparse
 import mimetypes
 import json
+import threading
 import requests
 import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from uuid import uuid4
 
 from urllib.parse import urlencode
@@ -19,10 +23,16 @@ sys.path.insert(0, pkg_root)  # noqa
 
 from drs.util.version import datetime_to_version_format
 from drs.storage import get_blobstore_handle
+from drs.storage.blobstore import DEFAULT_PART_SIZE, BlobPreconditionFailedError
+from drs.storage.blob_index import rebuild_blob_index
+from drs.storage.encoding import COMPACT, JSON
+from drs.storage.files import list_file_uuids, migrate_file_metadata, rebuild_latest_version
 
 blobstore_handle = get_blobstore_handle()
 staging_bucket = os.environ['DRS_BUCKET_TEST']
 
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+
 def put_file(source_url, uuid, version=None):
     if version is None:
         version = datetime_to_version_format(datetime.datetime.utcnow())
@@ -35,41 +45,257 @@ def put_file(source_url, uuid, version=None):
     )
     return resp
 
-def checksum_and_stage_file(file_handle, size, content_type="application/octet-stream"):
-    key = f"staging/{uuid4()}"
+def report_throughput(action, size, seconds):
+    mib_per_second = size / seconds / (1024 * 1024) if seconds > 0 else float("inf")
+    print(f"{action} {size} bytes in {seconds:.1f}s ({mib_per_second:.1f} MiB/s)", file=sys.stderr)
+
+def checksum_file(path, size, verbose=True):
+    """Compute the checksums the staging area requires, reading the file one chunk at a time."""
+    start = time.perf_counter()
     chunk_size = get_s3_multipart_chunk_size(size)
-    with ChecksummingSink(write_chunk_size=chunk_size) as sink:
-        data = file_handle.read()
-        sink.write(data)
+    with ChecksummingSink(write_chunk_size=chunk_size) as sink, open(path, "rb") as fh:
+        for data in iter(lambda: fh.read(chunk_size), b""):
+            sink.write(data)
         sums = sink.get_checksums()
+    if verbose:
+        report_throughput("checksummed", size, time.perf_counter() - start)
+    return {name: value.lower() for name, value in sums.items()}
+
+def stage_file(path, size, sums, content_type="application/octet-stream", workers=1, part_size=DEFAULT_PART_SIZE,
+               verbose=True):
+    key = f"staging/{uuid4()}"
 
     metadata = dict()
-    metadata['hca-dss-crc32c'] = sums['crc32c'].lower()
-    metadata['hca-dss-s3_etag'] = sums['s3_etag'].lower()
-    metadata['hca-dss-sha1'] = sums['sha1'].lower()
-    metadata['hca-dss-sha256'] = sums['sha256'].lower()
+    metadata['hca-dss-crc32c'] = sums['crc32c']
+    metadata['hca-dss-s3_etag'] = sums['s3_etag']
+    metadata['hca-dss-sha1'] = sums['sha1']
+    metadata['hca-dss-sha256'] = sums['sha256']
 
-    with io.BytesIO(data) as fh:
-        blobstore_handle.upload_file_handle(staging_bucket, key, fh, content_type, metadata)
+    start = time.perf_counter()
+    blobstore_handle.upload_from_path(
+        staging_bucket, key, path, content_type, metadata, part_size=part_size, workers=workers)
+    if verbose:
+        report_throughput("staged", size, time.perf_counter() - start)
 
     return f"gs://{staging_bucket}/{key}"
 
-def upload_file(path, uuid, version=None):
+def checksum_and_stage_file(path, size, content_type="application/octet-stream", workers=1,
+                            part_size=DEFAULT_PART_SIZE):
+    sums = checksum_file(path, size)
+    return stage_file(path, size, sums, content_type, workers, part_size)
+
+def upload_file(path, uuid, version=None, workers=1, part_size=DEFAULT_PART_SIZE):
     mt = mimetypes.MimeTypes()
     content_type = mt.guess_type(path)[0]
-    size = os.path.getsize(args.path)
-    with open(args.path, "rb") as f:
-        source_url = checksum_and_stage_file(f, size, content_type)
+    size = os.path.getsize(path)
+    source_url = checksum_and_stage_file(path, size, content_type, workers, part_size)
     resp = put_file(source_url, uuid, version)
     print(uuid, resp.json()['version'])
 
-def download_file(local_path, uuid, version=None):
+def file_url(uuid, version=None):
     url = f"https://{os.environ['API_DOMAIN_NAME']}/v1/files/{uuid}"
     if version is not None:
         url += f"?version={version}"
-    resp = requests.get(url)
-    with open(local_path, "wb") as fh:
-        fh.write(resp.content)
+    return url
+
+def sha256_file(path):
+    hasher = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for data in iter(lambda: fh.read(DOWNLOAD_CHUNK_SIZE), b""):
+            hasher.update(data)
+    return hasher.hexdigest()
+
+def stream_download(url, local_path, expected_sha256=None):
+    """
+    Write the file at `url` to `local_path` as it arrives, without holding it in memory.  The file only appears at
+    `local_path` once it is complete, and, if `expected_sha256` is given, verified.
+    :return: the number of bytes written.
+    """
+    temp_path = local_path + ".part"
+    hasher = hashlib.sha256()
+    size = 0
+    with requests.get(url, stream=True) as resp:
+        resp.raise_for_status()
+        with open(temp_path, "wb") as fh:
+            for data in resp.iter_content(DOWNLOAD_CHUNK_SIZE):
+                fh.write(data)
+                hasher.update(data)
+                size += len(data)
+    if expected_sha256 is not None and hasher.hexdigest() != expected_sha256:
+        os.unlink(temp_path)
+        raise ValueError(f"{url} has SHA-256 {hasher.hexdigest()}, expected {expected_sha256}")
+    os.replace(temp_path, local_path)
+    return size
+
+def download_file(local_path, uuid, version=None):
+    stream_download(file_url(uuid, version), local_path)
+
+class Journal:
+    """
+    Records the items of a bulk command as they complete, one JSON document per line, so that a command that was
+    interrupted can be run again and pick up where it left off.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.entries = dict()
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path) as fh:
+                for line in fh:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # the last line may have been cut short by the interruption.
+                        continue
+                    self.entries[entry['key']] = entry
+
+    def get(self, key):
+        with self._lock:
+            return self.entries.get(key)
+
+    def record(self, key, **entry):
+        entry['key'] = key
+        with self._lock:
+            self.entries[key] = entry
+            with open(self.path, "a") as fh:
+                fh.write(json.dumps(entry) + "\n")
+
+def run_parallel(function, items, workers):
+    """
+    Call `function` with each of `items` on a pool of `workers` threads.  Each call returns a tuple of (row, bytes
+    transferred); rows are written to stdout as tab-separated values as the calls complete.
+    :return: the number of calls that failed.
+    """
+    failures = 0
+    transferred = 0
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(function, *item): item for item in items}
+        for future in as_completed(futures):
+            try:
+                row, size = future.result()
+            except Exception as ex:
+                failures += 1
+                print(f"failed {futures[future]}: {ex}", file=sys.stderr)
+            else:
+                transferred += size
+                print("\t".join(row), flush=True)
+    report_throughput(f"{len(futures) - failures} of {len(futures)} files done, transferred", transferred,
+                      time.perf_counter() - start)
+    return failures
+
+def upload_item(journal, path, uuid=None, version=None, part_workers=1, part_size=DEFAULT_PART_SIZE):
+    """
+    Upload a file unless the journal shows it has been uploaded already.  A file that changed since it was uploaded
+    becomes a new version of the same UUID.
+    """
+    key = os.path.abspath(path)
+    stat = os.stat(path)
+    entry = journal.get(key)
+    if entry is not None and (entry['size'], entry['mtime']) == (stat.st_size, stat.st_mtime):
+        return (entry['uuid'], entry['version'], path), 0
+
+    sums = checksum_file(path, stat.st_size, verbose=False)
+    if entry is not None and entry['sha256'] == sums['sha256']:
+        journal.record(key, **dict(entry, mtime=stat.st_mtime))
+        return (entry['uuid'], entry['version'], path), 0
+
+    if uuid is None:
+        uuid = entry['uuid'] if entry is not None else str(uuid4())
+    content_type = mimetypes.guess_type(path)[0]
+    source_url = stage_file(path, stat.st_size, sums, content_type, part_workers, part_size, verbose=False)
+    resp = put_file(source_url, uuid, version)
+    resp.raise_for_status()
+    version = resp.json()['version']
+    journal.record(key, uuid=uuid, version=version, size=stat.st_size, mtime=stat.st_mtime, sha256=sums['sha256'])
+    return (uuid, version, path), stat.st_size
+
+def download_item(journal, uuid, version, path):
+    """Download a file unless a file with the same contents is already at `path`."""
+    resp = requests.head(file_url(uuid, version))
+    resp.raise_for_status()
+    version = resp.headers['X-DSS-VERSION']
+    sha256 = resp.headers['X-DSS-SHA256']
+    key = os.path.abspath(path)
+
+    if os.path.exists(path):
+        stat = os.stat(path)
+        entry = journal.get(key)
+        unchanged = entry is not None and (entry['size'], entry['mtime']) == (stat.st_size, stat.st_mtime)
+        if unchanged and entry['sha256'] == sha256:
+            return (uuid, version, path), 0
+        if sha256_file(path) == sha256:
+            journal.record(key, uuid=uuid, version=version, size=stat.st_size, mtime=stat.st_mtime, sha256=sha256)
+            return (uuid, version, path), 0
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    size = stream_download(file_url(uuid, version), path, sha256)
+    stat = os.stat(path)
+    journal.record(key, uuid=uuid, version=version, size=stat.st_size, mtime=stat.st_mtime, sha256=sha256)
+    return (uuid, version, path), size
+
+def read_manifest(path):
+    """Read a manifest: tab-separated values, with a header row naming the columns."""
+    with open(path, newline="") as fh:
+        return list(csv.DictReader(fh, delimiter="\t"))
+
+def upload_dir(directory, journal_path, workers, part_workers, part_size):
+    journal = Journal(journal_path)
+    paths = [os.path.join(dirpath, filename) for dirpath, _, filenames in os.walk(directory) for filename in filenames]
+    items = [(journal, path, None, None, part_workers, part_size)
+             for path in sorted(paths)
+             if os.path.abspath(path) != os.path.abspath(journal_path)]
+    print("uuid\tversion\tpath")
+    return run_parallel(upload_item, items, workers)
+
+def upload_manifest(manifest_path, journal_path, workers, part_workers, part_size):
+    journal = Journal(journal_path or manifest_path + ".journal")
+    items = [(journal, row['path'], row.get('uuid') or None, row.get('version') or None, part_workers, part_size)
+             for row in read_manifest(manifest_path)]
+    print("uuid\tversion\tpath")
+    return run_parallel(upload_item, items, workers)
+
+def download_manifest(manifest_path, journal_path, workers):
+    journal = Journal(journal_path or manifest_path + ".journal")
+    items = [(journal, row['uuid'], row.get('version') or None, row.get('path') or row['uuid'])
+             for row in read_manifest(manifest_path)]
+    print("uuid\tversion\tpath")
+    return run_parallel(download_item, items, workers)
+
+def rebuild_latest(uuids=None):
+    bucket = os.environ['DRS_BUCKET']
+    if not uuids:
+        uuids = list_file_uuids(blobstore_handle, bucket)
+    for uuid in uuids:
+        print(uuid, rebuild_latest_version(blobstore_handle, bucket, uuid))
+
+def migrate_metadata(encoding, workers):
+    bucket = os.environ['DRS_BUCKET']
+    keys = list(blobstore_handle.list(bucket, "files/"))
+
+    def migrate(key):
+        try:
+            return key, migrate_file_metadata(blobstore_handle, bucket, key, encoding)
+        except BlobPreconditionFailedError:
+            # the document was written while it was being migrated; a later run will pick it up.
+            return key, None
+
+    rewritten = skipped = 0
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for key, changed in executor.map(migrate, keys):
+            if changed is None:
+                skipped += 1
+                print(f"skipped {key}: it changed while it was being migrated", file=sys.stderr)
+                continue
+            rewritten += changed
+            print(key, "rewritten" if changed else "unchanged", flush=True)
+    print(f"{rewritten} of {len(keys)} metadata documents rewritten as {encoding}, {skipped} skipped", file=sys.stderr)
+
+def rebuild_blob_index_snapshot():
+    bucket = os.environ['DRS_BUCKET']
+    print(rebuild_blob_index(blobstore_handle, bucket), "blobs indexed")
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
@@ -79,14 +305,82 @@ if __name__ == "__main__":
     upload_parser.add_argument("path", default=None)
     upload_parser.add_argument("--uuid", default=str(uuid4()))
     upload_parser.add_argument("--version", default=None)
+    upload_parser.add_argument("--workers", type=int, default=8,
+                               help="Number of parts of the file to upload at once")
+    upload_parser.add_argument("--part-size", type=int, default=DEFAULT_PART_SIZE,
+                               help="Size of the parts of the upload, in bytes.  A multiple of 256 KiB.")
 
     download_parser = subparsers.add_parser("download")
     download_parser.add_argument("path", default=None)
     download_parser.add_argument("--uuid", required=True)
     download_parser.add_argument("--version", default=None)
 
+    def add_bulk_arguments(bulk_parser, transfers_parts=True):
+        bulk_parser.add_argument("--journal", default=None,
+                                 help="File in which to record progress.  Defaults to the manifest's path with "
+                                      "'.journal' appended.  Run the command again with the same journal to resume.")
+        bulk_parser.add_argument("--workers", type=int, default=8, help="Number of files to transfer at once")
+        if transfers_parts:
+            bulk_parser.add_argument("--part-workers", type=int, default=1,
+                                     help="Number of parts of each file to upload at once")
+            bulk_parser.add_argument("--part-size", type=int, default=DEFAULT_PART_SIZE,
+                                     help="Size of the parts of the upload, in bytes.  A multiple of 256 KiB.")
+
+    upload_dir_parser = subparsers.add_parser(
+        "upload-dir",
+        help="Upload every file under a directory as a new file.  Writes a manifest of the files to stdout.")
+    upload_dir_parser.add_argument("path")
+    add_bulk_arguments(upload_dir_parser)
+
+    upload_manifest_parser = subparsers.add_parser(
+        "upload-manifest",
+        help="Upload the files listed in a tab-separated manifest with the columns path, and optionally uuid and "
+             "version.  Writes a manifest of the files to stdout.")
+    upload_manifest_parser.add_argument("manifest")
+    add_bulk_arguments(upload_manifest_parser)
+
+    download_manifest_parser = subparsers.add_parser(
+        "download-manifest",
+        help="Download the files listed in a tab-separated manifest with the columns uuid, and optionally version and "
+             "path, such as the one written by upload-dir or upload-manifest.")
+    download_manifest_parser.add_argument("manifest")
+    add_bulk_arguments(download_manifest_parser, transfers_parts=False)
+
+    rebuild_latest_parser = subparsers.add_parser(
+        "rebuild-latest",
+        help="Reset latest-version pointers to the most recent version in the bucket")
+    rebuild_latest_parser.add_argument("--uuid", action="append", dest="uuids", default=None,
+                                       help="File to repair.  May be repeated.  Defaults to every file in the bucket.")
+
+    migrate_metadata_parser = subparsers.add_parser(
+        "migrate-metadata",
+        help="Rewrite every file metadata document in the bucket in another encoding.  Safe to run again if "
+             "interrupted.")
+    migrate_metadata_parser.add_argument("--encoding", choices=(COMPACT, JSON), default=COMPACT)
+    migrate_metadata_parser.add_argument("--workers", type=int, default=8,
+                                         help="Number of documents to rewrite at once")
+
+    subparsers.add_parser(
+        "rebuild-blob-index",
+        help="Rebuild the index of blobs that lets ingest skip existence checks")
+
     args = parser.parse_args()
     if "upload" == args.command:
-        upload_file(args.path, args.uuid, args.version)
+        upload_file(args.path, args.uuid, args.version, args.workers, args.part_size)
     elif "download" == args.command:
         download_file(args.path, args.uuid, args.version)
+    elif "upload-dir" == args.command:
+        if args.journal is None:
+            parser.error("upload-dir requires --journal")
+        sys.exit(1 if upload_dir(args.path, args.journal, args.workers, args.part_workers, args.part_size) else 0)
+    elif "upload-manifest" == args.command:
+        sys.exit(1 if upload_manifest(args.manifest, args.journal, args.workers, args.part_workers, args.part_size)
+                 else 0)
+    elif "download-manifest" == args.command:
+        sys.exit(1 if download_manifest(args.manifest, args.journal, args.workers) else 0)
+    elif "rebuild-latest" == args.command:
+        rebuild_latest(args.uuids)
+    elif "migrate-metadata" == args.command:
+        migrate_metadata(args.encoding, args.workers)
+    elif "rebuild-blob-index" == args.command:
+        rebuild_blob_index_snapshot()
@@ -0,0 +1,15 @@
+#!/usr/bin/env python
+"""
+Compile drs-api.yml into drs-api.json, which create_app loads instead of parsing and validating the YAML.  See drs.spec.
+"""
+import os
+import sys
+
+pkg_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))  # noqa
+sys.path.insert(0, pkg_root)  # noqa
+
+from drs.spec import COMPILED_SPEC_PATH, compile_spec
+
+if __name__ == '__main__':
+    compile_spec()
+    print(f"Wrote {COMPILED_SPEC_PATH}")
@@ -0,0 +1,64 @@
+"""
+Setup shared by the tests that serve files from an in-memory blobstore.
+"""
+import hashlib
+import json
+import os
+import typing
+import unittest
+from unittest import mock
+
+import google_crc32c
+
+from drs import storage
+from drs.storage import FileMetadata, files
+from drs.storage.files import update_latest_version, write_file_metadata
+
+UUID = "5a7c8e3e-0d4f-4a36-9a55-0c6d3bd9e4e1"
+VERSION = "2018-01-01T000000.000000Z"
+
+
+def file_metadata(version: str, data: bytes = b"abc", content_type: str = "application/octet-stream") -> dict:
+    """Returns the metadata document of a version of a file with contents `data`."""
+    return {
+        FileMetadata.FORMAT: FileMetadata.FILE_FORMAT_VERSION,
+        FileMetadata.CREATOR_UID: 0,
+        FileMetadata.VERSION: version,
+        FileMetadata.CONTENT_TYPE: content_type,
+        FileMetadata.SIZE: len(data),
+        FileMetadata.CRC32C: f"{google_crc32c.value(data):08x}",
+        FileMetadata.S3_ETAG: hashlib.md5(data).hexdigest(),
+        FileMetadata.SHA1: hashlib.sha1(data).hexdigest(),
+        FileMetadata.SHA256: hashlib.sha256(data).hexdigest(),
+    }
+
+
+class MemoryBlobStoreTestCase(unittest.TestCase):
+    """
+    Runs each test against a new in-memory blobstore, holding the bucket "bucket", and empty metadata caches.
+    Subclasses may set further environment variables in `environment`.
+    """
+    environment = dict()  # type: typing.Dict[str, str]
+
+    def setUp(self):
+        patcher = mock.patch.dict(os.environ, DRS_BLOBSTORE="memory", DRS_BUCKET="bucket", **self.environment)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        storage._handle_registry.reset()
+        self.addCleanup(storage._handle_registry.reset)
+        files.metadata_cache.clear()
+        files.missing_metadata_cache.clear()
+        files.latest_version_cache.clear()
+        self.handle = storage.get_blobstore_handle()
+
+    def write_metadata(self, uuid: str, version: str, **kwargs) -> dict:
+        """Writes the metadata document of a file version; see :func:`file_metadata` for `kwargs`."""
+        metadata = file_metadata(version, **kwargs)
+        write_file_metadata(self.handle, "bucket", uuid, version, json.dumps(metadata))
+        return metadata
+
+    def write_version(self, uuid: str, version: str, **kwargs) -> dict:
+        """Writes the metadata document of a file version and makes it the latest version of the file."""
+        metadata = self.write_metadata(uuid, version, **kwargs)
+        update_latest_version(self.handle, "bucket", uuid, version)
+        return metadata
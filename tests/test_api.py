@@ -39,6 +39,12 @@ class TestApi(unittest.TestCase):
         )
         self.assertEqual(message, resp.json['the message'])
 
+    def test_health(self):
+        resp = self.client.get('/v1/health')
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json['status'], "ok")
+        self.assertEqual(resp.json['blobstore']['pid'], os.getpid())
+
     def test_blobstore_handle(self):
         data = os.urandom(100)
         handle = storage.get_blobstore_handle()
@@ -0,0 +1,181 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+Tests of the ASGI application, which serves reads of file metadata from an event loop.
+"""
+import asyncio
+import io
+import json
+import os
+import sys
+import typing
+import unittest
+from unittest import mock
+from uuid import uuid4
+
+pkg_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))  # noqa
+sys.path.insert(0, pkg_root)  # noqa
+
+import drs
+from drs.asgi import create_asgi_app
+from drs.storage import files, reads
+from drs.storage.aio import LocalAsyncReader
+from drs.storage.files import latest_version_key
+from drs.storage.local import MemoryBlobStore
+from drs.util.cache import StaleWhileRevalidateCache
+from tests import UUID, VERSION, MemoryBlobStoreTestCase
+OLD_UUID = "0b1dc2c5-6c8c-4d8e-8a55-6b2a4f8b9d1e"
+
+# headers that must be the same whichever way a request is served.
+COMPARED_HEADERS = ('Location', 'ETag', 'Cache-Control', 'Content-Type', 'X-DSS-CREATOR-UID', 'X-DSS-VERSION',
+                    'X-DSS-CONTENT-TYPE', 'X-DSS-SIZE', 'X-DSS-CRC32C', 'X-DSS-S3-ETAG', 'X-DSS-SHA1', 'X-DSS-SHA256')
+
+
+class TestAsgi(MemoryBlobStoreTestCase):
+    environment = dict(DRS_GET_REDIRECT="public")
+
+    def setUp(self):
+        super().setUp()
+        self.write_version(UUID, VERSION)
+        # a file written before latest-version pointers, which can only be found by listing.
+        self.write_metadata(OLD_UUID, VERSION)
+
+        self.client = drs.create_app().app.test_client()
+        self.app = create_asgi_app()
+        self.loop = asyncio.new_event_loop()
+        self.addCleanup(self.loop.close)
+
+    def request(self, method: str, path: str, query: str = "",
+                headers: typing.Dict[str, str] = None) -> typing.Tuple[int, typing.Dict[str, str], bytes]:
+        scope = {
+            'type': "http",
+            'asgi': {'version': "3.0"},
+            'http_version': "1.1",
+            'method': method,
+            'scheme': "http",
+            'path': path,
+            'raw_path': path.encode("latin-1"),
+            'root_path': "",
+            'query_string': query.encode("latin-1"),
+            'headers': [(name.lower().encode("latin-1"), value.encode("latin-1"))
+                        for name, value in dict(headers or dict(), Host="localhost").items()],
+            'client': ("127.0.0.1", 12345),
+            'server': ("localhost", 80),
+        }
+        messages = list()
+
+        async def receive():
+            return {'type': "http.request", 'body': b"", 'more_body': False}
+
+        async def send(message):
+            messages.append(message)
+
+        self.loop.run_until_complete(self.app(scope, receive, send))
+        start, *bodies = messages
+        response_headers = {name.decode("latin-1").lower(): value.decode("latin-1")
+                            for name, value in start['headers']}
+        return start['status'], response_headers, b"".join(body.get('body', b"") for body in bodies)
+
+    def assertSameResponse(self, method: str, path: str, query: str = "", headers: typing.Dict[str, str] = None):
+        status, asgi_headers, body = self.request(method, path, query, headers)
+        expected = self.client.open(path, method=method, query_string=query, headers=headers)
+        self.assertEqual(status, expected.status_code)
+        for name in COMPARED_HEADERS:
+            self.assertEqual(asgi_headers.get(name.lower()), expected.headers.get(name), name)
+        if status >= 400 and method == "GET":
+            self.assertEqual(json.loads(body.decode("utf-8"))['code'], expected.json['code'])
+        return status
+
+    def test_fast_path(self):
+        etag = f'"{UUID}.{VERSION}"'
+        cases = [
+            ("HEAD", f"/v1/files/{UUID}", "", None, 200),
+            ("HEAD", f"/v1/files/{UUID}", f"version={VERSION}", None, 200),
+            ("HEAD", f"/v1/files/{OLD_UUID}", "", None, 200),
+            ("GET", f"/v1/files/{UUID}", "", None, 302),
+            ("GET", f"/v1/files/{UUID}", f"version={VERSION}", None, 302),
+            ("HEAD", f"/v1/files/{UUID}", "", {'If-None-Match': etag}, 304),
+            ("GET", f"/v1/files/{UUID}", f"version={VERSION}", {'If-None-Match': f'W/{etag}'}, 304),
+            ("HEAD", f"/v1/files/{uuid4()}", "", None, 404),
+            ("GET", f"/v1/files/{uuid4()}", "", None, 404),
+            ("GET", f"/v1/files/{UUID}", "version=2019-01-01T000000.000000Z", None, 404),
+        ]
+        with mock.patch.object(self.app, "fallback") as fallback:
+            for method, path, query, headers, status in cases:
+                with self.subTest(method=method, query=query, headers=headers):
+                    self.assertEqual(self.assertSameResponse(method, path, query, headers), status)
+        fallback.assert_not_called()
+
+    def test_fast_path_does_not_block(self):
+        with mock.patch.object(MemoryBlobStore, "_delay") as blocking_delay:
+            self.assertEqual(self.request("HEAD", f"/v1/files/{UUID}")[0], 200)
+        blocking_delay.assert_not_called()
+
+    def test_fallback(self):
+        cases = [
+            ("HEAD", f"/v1/files/{UUID}", "version=yesterday"),
+            ("GET", f"/v1/files/{UUID}", f"version={VERSION}&version={VERSION}"),
+            ("GET", "/v1/files/not-a-uuid", ""),
+            ("GET", "/v1/files/", ""),
+            ("GET", "/metrics", ""),
+        ]
+        for method, path, query in cases:
+            with self.subTest(method=method, path=path, query=query):
+                with mock.patch.object(self.app, "_serve_file") as serve_file:
+                    self.assertSameResponse(method, path, query)
+                serve_file.assert_not_called()
+
+    def test_proxied_gets_fall_back(self):
+        with mock.patch.dict(os.environ, DRS_GET_REDIRECT="proxy"):
+            with mock.patch.object(self.app, "_serve_file") as serve_file:
+                self.assertSameResponse("GET", f"/v1/files/{uuid4()}")
+            serve_file.assert_not_called()
+            with mock.patch.object(self.app, "fallback") as fallback:
+                self.assertSameResponse("HEAD", f"/v1/files/{UUID}")
+            fallback.assert_not_called()
+
+    def test_stale_latest_version_is_refreshed(self):
+        now = [0.0]
+        cache = StaleWhileRevalidateCache(fresh_for=5, stale_for=10, max_entries=10, clock=lambda: now[0])
+        next_version = "2018-01-02T000000.000000Z"
+        with mock.patch.object(files, "latest_version_cache", cache):
+            self.assertEqual(self.request("HEAD", f"/v1/files/{UUID}")[1]['x-dss-version'], VERSION)
+            self.write_metadata(UUID, next_version)
+            # another process moves the pointer.
+            self.handle.upload_file_handle("bucket", latest_version_key(UUID), io.BytesIO(next_version.encode("utf-8")))
+            now[0] = 5.0
+            self.assertEqual(self.request("HEAD", f"/v1/files/{UUID}")[1]['x-dss-version'], VERSION)
+            self.loop.run_until_complete(asyncio.gather(*reads._background_tasks))
+            self.assertEqual(self.request("HEAD", f"/v1/files/{UUID}")[1]['x-dss-version'], next_version)
+
+    def test_unexpected_errors(self):
+        with mock.patch.object(LocalAsyncReader, "get", side_effect=RuntimeError("oops")):
+            status, headers, body = self.request("GET", f"/v1/files/{UUID}")
+        self.assertEqual(status, 500)
+        self.assertEqual(headers['content-type'], "application/problem+json")
+        self.assertEqual(json.loads(body.decode("utf-8"))['code'], "unhandled_exception")
+
+    def test_lifespan(self):
+        self.request("HEAD", f"/v1/files/{UUID}")
+        messages = [{'type': "lifespan.startup"}, {'type': "lifespan.shutdown"}]
+        sent = list()
+        closed = list()
+
+        async def receive():
+            return messages.pop(0)
+
+        async def send(message):
+            sent.append(message['type'])
+
+        async def close(reader):
+            closed.append(reader)
+
+        with mock.patch.object(LocalAsyncReader, "close", close):
+            self.loop.run_until_complete(self.app({'type': "lifespan"}, receive, send))
+        self.assertEqual(sent, ["lifespan.startup.complete", "lifespan.shutdown.complete"])
+        self.assertEqual(closed, [self.app.reader])
+
+
+if __name__ == '__main__':
+    unittest.main()
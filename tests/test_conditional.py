@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+Tests of entity tags and conditional requests for file metadata.
+"""
+import os
+import sys
+import unittest
+from unittest import mock
+
+pkg_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))  # noqa
+sys.path.insert(0, pkg_root)  # noqa
+
+import drs
+from drs.storage.local import MemoryBlobStore
+from tests import UUID, VERSION, MemoryBlobStoreTestCase
+
+NEXT_VERSION = "2018-01-02T000000.000000Z"
+
+
+class TestConditionalRequests(MemoryBlobStoreTestCase):
+    environment = dict(DRS_GET_REDIRECT="public")
+
+    def setUp(self):
+        super().setUp()
+        self.write_version(UUID, VERSION)
+        self.client = drs.create_app().app.test_client()
+
+    def test_versioned_responses_are_immutable(self):
+        for method in (self.client.head, self.client.get):
+            with self.subTest(method=method.__name__):
+                resp = method(f"/v1/files/{UUID}?version={VERSION}")
+                self.assertIn(resp.status_code, (200, 302))
+                self.assertEqual(resp.headers['ETag'], f'"{UUID}.{VERSION}"')
+                self.assertIn("immutable", resp.headers['Cache-Control'])
+
+    def test_versioned_requests_are_answered_without_reads(self):
+        with mock.patch.object(MemoryBlobStore, "_delay") as blobstore_calls:
+            for method in (self.client.head, self.client.get):
+                with self.subTest(method=method.__name__):
+                    resp = method(f"/v1/files/{UUID}?version={VERSION}",
+                                  headers={'If-None-Match': f'"other", W/"{UUID}.{VERSION}"'})
+                    self.assertEqual(resp.status_code, 304)
+                    self.assertEqual(resp.headers['ETag'], f'"{UUID}.{VERSION}"')
+                    self.assertNotIn('X-DSS-VERSION', resp.headers)
+        blobstore_calls.assert_not_called()
+
+    def test_mismatched_tags(self):
+        for tag in (f'"{UUID}.{VERSION}"', "*"):
+            with self.subTest(tag=tag):
+                resp = self.client.head(f"/v1/files/{UUID}?version={NEXT_VERSION}", headers={'If-None-Match': tag})
+                self.assertEqual(resp.status_code, 404)
+
+    def test_latest_version_is_revalidated(self):
+        resp = self.client.head(f"/v1/files/{UUID}")
+        self.assertEqual(resp.headers['Cache-Control'], "no-cache")
+        etag = resp.headers['ETag']
+        self.assertEqual(self.client.head(f"/v1/files/{UUID}", headers={'If-None-Match': etag}).status_code, 304)
+        self.assertEqual(self.client.head(f"/v1/files/{UUID}", headers={'If-None-Match': "*"}).status_code, 304)
+
+        self.write_version(UUID, NEXT_VERSION)
+        resp = self.client.head(f"/v1/files/{UUID}", headers={'If-None-Match': etag})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.headers['X-DSS-VERSION'], NEXT_VERSION)
+
+    def test_signed_redirects_are_not_cached(self):
+        with mock.patch.dict(os.environ, DRS_GET_REDIRECT="signed"), \
+                mock.patch("drs.api.files.get_url_signer") as get_url_signer:
+            get_url_signer.return_value.sign.return_value = "https://storage.googleapis.com/signed"
+            resp = self.client.get(f"/v1/files/{UUID}?version={VERSION}",
+                                   headers={'If-None-Match': f'"{UUID}.{VERSION}"'})
+        self.assertEqual(resp.status_code, 302)
+        self.assertNotIn('ETag', resp.headers)
+        self.assertNotIn('Cache-Control', resp.headers)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+Tests of the error responses.
+"""
+import os
+import sys
+import unittest
+from unittest import mock
+from uuid import uuid4
+
+pkg_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))  # noqa
+sys.path.insert(0, pkg_root)  # noqa
+
+import drs
+from drs import storage
+from drs.util.ratelimit import RateLimiter
+
+
+class TestRateLimiter(unittest.TestCase):
+    def test_rate_limiter(self):
+        now = [0.0]
+        limiter = RateLimiter(rate=1, burst=2, clock=lambda: now[0])
+        self.assertEqual([limiter.acquire() for _ in range(4)], [0, 0, None, None])
+        now[0] = 1.5
+        self.assertEqual([limiter.acquire() for _ in range(2)], [2, None])
+        now[0] = 100
+        self.assertEqual([limiter.acquire() for _ in range(3)], [1, 0, None])
+
+
+class TestErrors(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch.dict(os.environ, DRS_BLOBSTORE="memory", DRS_BUCKET="bucket")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        storage._handle_registry.reset()
+        self.addCleanup(storage._handle_registry.reset)
+        self.app = drs.create_app()
+        self.app.app.config['TESTING'] = True
+        self.client = self.app.app.test_client()
+
+    def test_expected_errors(self):
+        with mock.patch("traceback.format_exc") as format_exc:
+            with self.subTest("A file that does not exist"):
+                resp = self.client.get(f"/v1/files/{uuid4()}")
+                self.assertEqual(resp.status_code, 404)
+                self.assertEqual(resp.json, dict(status=404, code="not_found", title="Cannot find file!"))
+
+            with self.subTest("A parameter that does not validate"):
+                resp = self.client.get("/v1/files/not-a-uuid")
+                self.assertEqual(resp.status_code, 400)
+                self.assertEqual(resp.json['code'], "illegal_arguments")
+                self.assertNotIn('stacktrace', resp.json)
+
+            with self.subTest("A path that does not exist"):
+                resp = self.client.get("/wp-login.php")
+                self.assertEqual(resp.status_code, 404)
+                self.assertNotIn('stacktrace', resp.json)
+        format_exc.assert_not_called()
+
+        with mock.patch.dict(os.environ, DRS_ERROR_MODE="debug"):
+            resp = self.client.get(f"/v1/files/{uuid4()}")
+            self.assertIn("Traceback", resp.json['stacktrace'])
+
+    def test_unexpected_errors(self):
+        limiter = RateLimiter(rate=0, burst=1)
+        with mock.patch("drs.api.files.lookup_file_metadata", side_effect=RuntimeError("oops")), \
+                mock.patch("drs._stacktrace_log_limiter", limiter), \
+                mock.patch("drs.logger.error") as log_error:
+            for _ in range(3):
+                resp = self.client.get(f"/v1/files/{uuid4()}")
+                self.assertEqual(resp.status_code, 500)
+                self.assertEqual(resp.json['code'], "unhandled_exception")
+                self.assertIn("RuntimeError: oops", resp.json['stacktrace'])
+        self.assertEqual(log_error.call_count, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
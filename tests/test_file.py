@@ -10,9 +10,11 @@ import sys
 import datetime
 import requests
 import json
+import time
 import typing
 import dcplib
 import unittest
+from unittest import mock
 from uuid import uuid4
 
 from dcplib.s3_multipart import get_s3_multipart_chunk_size
@@ -145,6 +147,105 @@ class TestFileApi(unittest.TestCase):
             )
             self.assertEqual(resp.status_code, requests.codes.not_found)
 
+    def test_file_batch(self):
+        size = 1024
+        source_url = self._checksum_and_stage_file(io.BytesIO(os.urandom(size)), size)
+        uuid = str(uuid4())
+        version = datetime_to_version_format(datetime.datetime.utcnow())
+        latest_version = datetime_to_version_format(datetime.datetime.utcnow())
+        self._put_file(source_url, uuid, version)
+        self._put_file(source_url, uuid, latest_version)
+        missing_uuid = str(uuid4())
+
+        resp = self.client.post(
+            "/v1/files/batch",
+            data=json.dumps(dict(files=[
+                dict(uuid=uuid, version=version),
+                dict(uuid=uuid),
+                dict(uuid=missing_uuid),
+                dict(uuid=uuid, version="ABCD"),
+            ])),
+            headers={
+                'Content-Type': "application/json"
+            }
+        )
+        self.assertEqual(resp.status_code, requests.codes.ok)
+        results = resp.json['files']
+        self.assertEqual([result['status'] for result in results], [200, 200, 404, 400])
+        self.assertEqual(results[0]['version'], version)
+        self.assertEqual(results[0]['metadata']['size'], size)
+        self.assertEqual(results[1]['version'], latest_version)
+        self.assertEqual(results[2]['uuid'], missing_uuid)
+        self.assertEqual(results[2]['code'], "not_found")
+        self.assertEqual(results[3]['code'], "illegal_version")
+
+    def test_file_put_batch(self):
+        source_url = self._checksum_and_stage_file(io.BytesIO(os.urandom(1024)), 1024)
+        other_source_url = self._checksum_and_stage_file(io.BytesIO(os.urandom(128)), 128)
+        uuid = str(uuid4())
+        version = datetime_to_version_format(datetime.datetime.utcnow())
+        items = [
+            dict(uuid=uuid, version=version, source_url=source_url, creator_uid=123),
+            dict(uuid=str(uuid4()), version="ABCD", source_url=source_url, creator_uid=123),
+        ]
+
+        with self.subTest("Per-item status matches the single-file PUT"):
+            resp = self._put_batch(items)
+            self.assertEqual(resp.status_code, requests.codes.ok)
+            self.assertEqual([result['status'] for result in resp.json['files']],
+                             [requests.codes.created, requests.codes.bad_request])
+
+        with self.subTest("Registering the same files again is idempotent, and a different payload conflicts"):
+            resp = self._put_batch([
+                items[0],
+                dict(uuid=uuid, version=version, source_url=other_source_url, creator_uid=123),
+            ])
+            self.assertEqual([result['status'] for result in resp.json['files']],
+                             [requests.codes.ok, requests.codes.conflict])
+            self.assertEqual(resp.json['files'][1]['code'], "file_already_exists")
+
+    def test_file_put_async(self):
+        size = 1024
+        source_url = self._checksum_and_stage_file(io.BytesIO(os.urandom(size)), size)
+        uuid = str(uuid4())
+        version = datetime_to_version_format(datetime.datetime.utcnow())
+
+        with mock.patch.dict(os.environ, DRS_ASYNC_COPY_THRESHOLD=str(size)):
+            resp = self._put_file(source_url, uuid, version)
+        self.assertEqual(resp.status_code, requests.codes.accepted)
+        job_id = resp.json['job_id']
+
+        for _ in range(30):
+            resp = self.client.get(f"/v1/jobs/{job_id}")
+            self.assertEqual(resp.status_code, requests.codes.ok)
+            if resp.json['status'] in ("succeeded", "failed"):
+                break
+            time.sleep(1)
+        self.assertEqual(resp.json['status'], "succeeded")
+        self.assertEqual(resp.json['result']['status'], requests.codes.created)
+
+        resp = self.client.head(f"/v1/files/{uuid}?version={version}")
+        self.assertEqual(resp.status_code, requests.codes.ok)
+        self.assertEqual(self._put_file(source_url, uuid, version).status_code, requests.codes.ok)
+
+        # a different file with the same version conflicts at once, rather than in a job.
+        other_source_url = self._checksum_and_stage_file(io.BytesIO(os.urandom(size)), size)
+        with mock.patch.dict(os.environ, DRS_ASYNC_COPY_THRESHOLD=str(size)):
+            resp = self._put_file(other_source_url, uuid, version)
+        self.assertEqual(resp.status_code, requests.codes.conflict)
+
+        resp = self.client.get(f"/v1/jobs/{uuid4()}")
+        self.assertEqual(resp.status_code, requests.codes.not_found)
+
+    def _put_batch(self, items):
+        return self.client.put(
+            "/v1/files/batch",
+            data=json.dumps(dict(files=items)),
+            headers={
+                'Content-Type': "application/json"
+            }
+        )
+
     def _put_file(self, source_url, uuid, version):
         resp = self.client.put(
             f"/v1/files/{uuid}?version={version}",
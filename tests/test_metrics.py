@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+Tests of the timing instrumentation and the metrics endpoint.
+"""
+import os
+import sys
+import unittest
+from unittest import mock
+from uuid import uuid4
+
+pkg_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))  # noqa
+sys.path.insert(0, pkg_root)  # noqa
+
+import drs
+from drs import storage
+from drs.storage.instrumented import InstrumentedBlobStore
+from drs.storage.local import MemoryBlobStore
+from drs.util import metrics
+from drs.util.metrics import MetricsRegistry, timed
+
+
+class TestMetrics(unittest.TestCase):
+    def setUp(self):
+        metrics.registry.clear()
+
+    def test_histogram(self):
+        registry = MetricsRegistry(buckets=(0.1, 1.0))
+        for seconds in (0.05, 0.1, 0.5, 2.0):
+            registry.observe("op", seconds)
+        self.assertEqual(registry.render().splitlines()[2:], [
+            'drs_span_duration_seconds_bucket{span="op",le="0.1"} 2',
+            'drs_span_duration_seconds_bucket{span="op",le="1.0"} 3',
+            'drs_span_duration_seconds_bucket{span="op",le="+Inf"} 4',
+            'drs_span_duration_seconds_sum{span="op"} 2.65',
+            'drs_span_duration_seconds_count{span="op"} 4',
+        ])
+
+    def test_timed(self):
+        @timed("decorated")
+        def decorated():
+            return 1
+
+        spans = metrics.start_request()
+        self.assertEqual(decorated(), 1)
+        decorated()
+        with timed("block"):
+            pass
+        self.assertEqual(metrics.registry.stats()['decorated']['count'], 2)
+        self.assertEqual(spans.spans['block'][0], 1)
+        self.assertRegex(spans.server_timing(), r'^decorated;dur=[0-9.]+;desc="2 calls", block;dur=[0-9.]+$')
+
+    def test_instrumented_blobstore(self):
+        handle = InstrumentedBlobStore(MemoryBlobStore())
+        handle.upload_if_absent("bucket", "a", b"")
+        self.assertEqual(list(handle.list("bucket")), ["a"])
+        with self.assertRaises(Exception):
+            handle.get("bucket", "missing")
+        stats = metrics.registry.stats()
+        # calls the blobstore makes to itself are not counted.
+        self.assertNotIn("blobstore.upload_if_generation_match", stats)
+        for span in ("blobstore.upload_if_absent", "blobstore.list", "blobstore.list.iterate", "blobstore.get"):
+            self.assertEqual(stats[span]['count'], 1, span)
+
+
+class TestMetricsApi(unittest.TestCase):
+    def setUp(self):
+        environment = dict(DRS_BLOBSTORE="memory", DRS_BUCKET="bucket", DRS_SERVER_TIMING="true")
+        patcher = mock.patch.dict(os.environ, environment)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        storage._handle_registry.reset()
+        self.addCleanup(storage._handle_registry.reset)
+        self.app = drs.create_app()
+        self.app.app.config['TESTING'] = True
+        self.client = self.app.app.test_client()
+
+    def test_metrics(self):
+        resp = self.client.head(f"/v1/files/{uuid4()}")
+        self.assertEqual(resp.status_code, 404)
+        self.assertIn("get_helper;dur=", resp.headers['Server-Timing'])
+        self.assertIn("blobstore.get;dur=", resp.headers['Server-Timing'])
+        self.assertIn("request;dur=", resp.headers['Server-Timing'])
+
+        resp = self.client.get("/metrics")
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(resp.content_type.startswith("text/plain"))
+        self.assertIn('drs_span_duration_seconds_count{span="get_helper"}', resp.data.decode("utf-8"))
+
+
+if __name__ == '__main__':
+    unittest.main()
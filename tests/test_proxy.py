@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+Tests of serving file contents through the service.
+"""
+import io
+import os
+import sys
+import unittest
+from unittest import mock
+
+pkg_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))  # noqa
+sys.path.insert(0, pkg_root)  # noqa
+
+import drs
+import drs.api.files
+from drs import storage
+from tests import UUID, VERSION, MemoryBlobStoreTestCase
+
+DATA = bytes(range(256)) * 40
+
+
+class TestProxy(MemoryBlobStoreTestCase):
+    environment = dict(DRS_GET_REDIRECT="proxy", DRS_PROXY_CHUNK_SIZE="1000", DRS_PROXY_MAX_STREAMS="1")
+
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch.object(drs.api.files, "_proxy_streams", None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        metadata = self.write_metadata(UUID, VERSION, data=DATA, content_type="application/x-test")
+        self.handle.upload_file_handle("bucket", storage.compose_blob_key(metadata), io.BytesIO(DATA))
+        self.client = drs.create_app().app.test_client()
+        self.url = f"/v1/files/{UUID}?version={VERSION}"
+
+    def get(self, **kwargs):
+        # buffering the response reads and closes it, as a server would once the response is sent.
+        return self.client.get(self.url, buffered=True, **kwargs)
+
+    def test_whole_file(self):
+        with mock.patch.object(self.handle, "get_range", wraps=self.handle.get_range) as get_range:
+            resp = self.get()
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.data, DATA)
+        self.assertEqual(resp.headers['Content-Type'], "application/x-test")
+        self.assertEqual(resp.headers['Content-Length'], str(len(DATA)))
+        self.assertEqual(resp.headers['Accept-Ranges'], "bytes")
+        self.assertEqual(resp.headers['X-DSS-VERSION'], VERSION)
+        # the blob is read in chunks, never as a whole.
+        self.assertEqual(get_range.call_count, 11)
+        chunk_sizes = [end + 1 - start for (_, _, start, end), _ in get_range.call_args_list]
+        self.assertEqual(max(chunk_sizes), 1000)
+
+    def test_ranges(self):
+        for header, start, stop in (("bytes=2-4", 2, 5), ("bytes=-3", len(DATA) - 3, len(DATA)),
+                                    ("bytes=9990-20000", 9990, len(DATA)), ("bytes=500-", 500, len(DATA))):
+            with self.subTest(header=header):
+                resp = self.get(headers=dict(Range=header))
+                self.assertEqual(resp.status_code, 206)
+                self.assertEqual(resp.data, DATA[start:stop])
+                self.assertEqual(resp.headers['Content-Range'], f"bytes {start}-{stop - 1}/{len(DATA)}")
+                self.assertEqual(resp.headers['Content-Length'], str(stop - start))
+
+    def test_unsatisfiable_range(self):
+        resp = self.get(headers=dict(Range=f"bytes={len(DATA)}-"))
+        self.assertEqual(resp.status_code, 416)
+        self.assertEqual(resp.headers['Content-Range'], f"bytes */{len(DATA)}")
+
+    def test_unsupported_ranges_are_ignored(self):
+        for header in ("bytes=0-1,4-5", "lines=1-2"):
+            with self.subTest(header=header):
+                resp = self.get(headers=dict(Range=header))
+                self.assertEqual(resp.status_code, 200)
+                self.assertEqual(resp.data, DATA)
+
+    def test_concurrent_streams_are_limited(self):
+        first = self.client.get(self.url, buffered=False)
+        self.assertEqual(first.status_code, 200)
+        second = self.get()
+        self.assertEqual(second.status_code, 503)
+        self.assertEqual(second.json['code'], "too_many_streams")
+
+        self.assertEqual(b"".join(first.response), DATA)
+        first.close()
+        self.assertEqual(self.get().status_code, 200)
+
+    def test_failed_responses_do_not_hold_streams(self):
+        for chunk_size in ("0", "a lot"):
+            with self.subTest(chunk_size=chunk_size):
+                with mock.patch.dict(os.environ, DRS_PROXY_CHUNK_SIZE=chunk_size):
+                    self.assertEqual(self.get().status_code, 500)
+        self.assertEqual(self.get().status_code, 200)
+
+
+if __name__ == '__main__':
+    unittest.main()
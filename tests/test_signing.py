@@ -0,0 +1,139 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+Tests of signed GET URLs, using a locally generated key.
+"""
+import binascii
+import datetime
+import hashlib
+import json
+import os
+import sys
+import unittest
+from unittest import mock
+from urllib.parse import parse_qs, urlsplit
+
+from cryptography.hazmat.backends import default_backend
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import padding, rsa
+from google.auth.crypt import RSASigner
+from google.cloud.storage._signing import generate_signed_url_v4
+from google.oauth2 import service_account
+
+pkg_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))  # noqa
+sys.path.insert(0, pkg_root)  # noqa
+
+import drs
+from drs import storage
+from drs.storage import signing
+from drs.storage.signing import URLSigner
+from tests import UUID, VERSION, MemoryBlobStoreTestCase
+
+
+def generate_credentials() -> service_account.Credentials:
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048, backend=default_backend())
+    pem = key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption())
+    return service_account.Credentials(
+        RSASigner.from_string(pem), "signer@project.iam.gserviceaccount.com", "https://oauth2.googleapis.com/token")
+
+
+class Clock:
+    def __init__(self, now: float) -> None:
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class TestURLSigner(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.credentials = generate_credentials()
+
+    def setUp(self):
+        self.clock = Clock(1546300800.0)  # 2019-01-01T00:00:00Z
+        self.signer = URLSigner(self.credentials, expiry=3600, reuse=300, cache_size=100, clock=self.clock)
+
+    def test_matches_client_library(self):
+        request_time = datetime.datetime(2019, 1, 1, 12, 30, 15)
+        key = "blobs/abc~def ghi+jkl"
+        expected = generate_signed_url_v4(
+            self.credentials, f"/bucket/{key.replace(' ', '%20').replace('+', '%2B')}",
+            expiration=datetime.timedelta(seconds=600), _request_timestamp="20190101T123015Z")
+        self.assertEqual(self.signer.sign_url("bucket", key, request_time, 600), expected)
+
+    def test_signature_verifies(self):
+        url = self.signer.sign("bucket", "blobs/abc")
+        query = parse_qs(urlsplit(url).query)
+        self.assertEqual(query['X-Goog-Date'], ["20190101T000000Z"])
+        self.assertEqual(query['X-Goog-Expires'], ["3900"])
+
+        canonical_query_string = urlsplit(url).query.rsplit("&X-Goog-Signature=", 1)[0]
+        canonical_request = "\n".join(
+            ("GET", "/bucket/blobs/abc", canonical_query_string, "host:storage.googleapis.com\n", "host",
+             "UNSIGNED-PAYLOAD"))
+        string_to_sign = "\n".join((
+            "GOOG4-RSA-SHA256", "20190101T000000Z", "20190101/auto/storage/goog4_request",
+            hashlib.sha256(canonical_request.encode("utf-8")).hexdigest()))
+        public_key = self.credentials.signer._key.public_key()
+        public_key.verify(binascii.unhexlify(query['X-Goog-Signature'][0]), string_to_sign.encode("utf-8"),
+                          padding.PKCS1v15(), hashes.SHA256())
+
+    def test_urls_are_reused_within_a_window(self):
+        with mock.patch.object(self.credentials, "sign_bytes", wraps=self.credentials.sign_bytes) as sign_bytes:
+            first = self.signer.sign("bucket", "blobs/abc")
+            self.clock.now += 299
+            self.assertEqual(self.signer.sign("bucket", "blobs/abc"), first)
+            self.assertEqual(sign_bytes.call_count, 1)
+
+            self.assertNotEqual(self.signer.sign("bucket", "blobs/def"), first)
+            self.assertEqual(sign_bytes.call_count, 2)
+
+            self.clock.now += 1
+            second = self.signer.sign("bucket", "blobs/abc")
+            self.assertNotEqual(second, first)
+            self.assertEqual(parse_qs(urlsplit(second).query)['X-Goog-Date'], ["20190101T000500Z"])
+            self.assertEqual(sign_bytes.call_count, 3)
+
+    def test_expiry_is_limited(self):
+        with self.assertRaises(ValueError):
+            URLSigner(self.credentials, expiry=7 * 24 * 60 * 60, reuse=300, cache_size=100)
+        with self.assertRaises(ValueError):
+            URLSigner(self.credentials, expiry=3600, reuse=0, cache_size=100)
+
+
+class TestSignedRedirect(MemoryBlobStoreTestCase):
+    environment = dict(DRS_GET_REDIRECT="signed")
+
+    def setUp(self):
+        super().setUp()
+        signing._signer_registry.reset()
+        self.addCleanup(signing._signer_registry.reset)
+        self.credentials = generate_credentials()
+        patcher = mock.patch("drs.storage.signing._load_signing_credentials", return_value=self.credentials)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        metadata = self.write_metadata(UUID, VERSION)
+        self.client = drs.create_app().app.test_client()
+        self.blob_key = storage.compose_blob_key(metadata)
+
+    def test_get_redirects_to_signed_url(self):
+        resp = self.client.get(f"/v1/files/{UUID}?version={VERSION}")
+        self.assertEqual(resp.status_code, 302)
+        location = urlsplit(resp.headers['Location'])
+        self.assertEqual(location.netloc, "storage.googleapis.com")
+        self.assertEqual(location.path, f"/bucket/{self.blob_key}")
+        query = parse_qs(location.query)
+        self.assertEqual(query['X-Goog-Credential'][0].split("/")[0], self.credentials.signer_email)
+        self.assertIn('X-Goog-Signature', query)
+
+        self.assertEqual(self.client.get(f"/v1/files/{UUID}?version={VERSION}").headers['Location'],
+                         resp.headers['Location'])
+        self.assertEqual(signing.get_url_signer().cache.stats()['entries'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
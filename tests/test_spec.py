@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+Tests of the compiled API specification.
+"""
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+pkg_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))  # noqa
+sys.path.insert(0, pkg_root)  # noqa
+
+import drs
+from drs.spec import SPEC_PATH, compile_spec, load_compiled_spec
+
+
+class TestCompiledSpec(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.source = os.path.join(self.directory.name, "drs-api.yml")
+        self.compiled = os.path.join(self.directory.name, "drs-api.json")
+        shutil.copy(SPEC_PATH, self.source)
+
+    def test_compiled_spec_is_only_used_while_current(self):
+        self.assertIsNone(load_compiled_spec(self.source, self.compiled))
+        compile_spec(self.source, self.compiled)
+        spec = load_compiled_spec(self.source, self.compiled)
+        self.assertEqual(spec['swagger'], "2.0")
+        # connexion expects response codes to be strings.
+        self.assertIn("302", spec['paths']['/files/{uuid}']['get']['responses'])
+
+        with open(self.source, "a") as fh:
+            fh.write("\n")
+        self.assertIsNone(load_compiled_spec(self.source, self.compiled))
+
+    def test_app_serves_compiled_spec(self):
+        compile_spec(self.source, self.compiled)
+        spec = load_compiled_spec(self.source, self.compiled)
+        with mock.patch("drs.load_compiled_spec", return_value=spec), \
+                mock.patch("drs.PrevalidatedFlaskApi._validate_spec") as validate_spec, \
+                mock.patch.dict(os.environ, DRS_BLOBSTORE="memory", DRS_BUCKET="bucket"):
+            app = drs.create_app()
+            resp = app.app.test_client().get("/v1/files/5a7c8e3e-0d4f-4a36-9a55-0c6d3bd9e4e1")
+        self.assertEqual(resp.status_code, 404)
+        self.assertEqual(resp.json['code'], "not_found")
+        validate_spec.assert_called_once()
+
+
+if __name__ == '__main__':
+    unittest.main()
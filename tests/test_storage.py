@@ -0,0 +1,1016 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+Unit tests for the storage layer that do not require a cloud bucket.
+"""
+import asyncio
+import io
+import os
+import pickle
+import sys
+import json
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+pkg_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))  # noqa
+sys.path.insert(0, pkg_root)  # noqa
+
+from cloud_blobstore import BlobAlreadyExistsError, BlobNotFoundError
+
+from drs.storage.blobstore import BlobRewriteTokenError, BlobStat, RewriteProgress
+from drs import storage
+from drs.storage import blob_index
+from drs.storage.blob_index import BlobIndex, get_blob_index, rebuild_blob_index
+from drs.storage.copy import checkpoint_key, resumable_copy
+from drs.storage import FileMetadata, encoding, files, reads
+from drs.storage.gs import DRSGSBlobStore
+from drs.storage.files import (get_file_metadata, get_latest_version, latest_version_key, list_file_uuids,
+                               rebuild_latest_version, update_latest_version, write_file_metadata)
+from drs.storage.jobs import JobStatus, claim_job, create_job, get_job, update_job
+from drs.storage.local import FilesystemBlobStore, MemoryBlobStore
+from drs.storage.pool import HandleRegistry, create_http_adapter
+from drs.util.cache import LRUCache, StaleWhileRevalidateCache, TTLSet
+from drs.util.concurrency import AsyncSingleFlight, SingleFlight
+
+
+class FakeBlobStore(MemoryBlobStore):
+    """In-memory blobstore that counts reads and can write blobs in one call."""
+    def __init__(self):
+        super().__init__()
+        self.gets = 0
+
+    def get(self, bucket, key):
+        self.gets += 1
+        return super().get(bucket, key)
+
+    def put(self, bucket, key, data=b""):
+        self.upload_file_handle(bucket, key, io.BytesIO(data))
+
+    def exists(self, bucket, key):
+        return key in self.list(bucket, key)
+
+
+class TestHandleRegistry(unittest.TestCase):
+    def setUp(self):
+        self.created = list()
+
+        def factory():
+            handle = object()
+            self.created.append(handle)
+            return handle, create_http_adapter(2)
+
+        self.registry = HandleRegistry(factory)
+
+    def test_handle_is_shared(self):
+        handles = list()
+
+        def worker():
+            for _ in range(10):
+                handles.append(self.registry.get())
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(self.created), 1)
+        self.assertTrue(all(handle is self.created[0] for handle in handles))
+        stats = self.registry.stats()
+        self.assertTrue(stats['initialized'])
+        self.assertEqual(stats['acquisitions'], 80)
+        self.assertEqual(stats['initializations'], 1)
+
+    def test_reinitialized_after_fork(self):
+        first = self.registry.get()
+        with mock.patch("os.getpid", return_value=os.getpid() + 1):
+            self.assertFalse(self.registry.stats()['initialized'])
+            second = self.registry.get()
+        self.assertIsNot(first, second)
+
+        self.registry._after_fork()
+        self.assertFalse(self.registry.stats()['initialized'])
+        self.assertIsNot(self.registry.get(), second)
+        self.assertEqual(len(self.created), 3)
+
+    def test_reset(self):
+        first = self.registry.get()
+        self.registry.reset()
+        self.assertFalse(self.registry.stats()['initialized'])
+        self.assertIsNot(self.registry.get(), first)
+
+
+class TestLatestVersion(unittest.TestCase):
+    bucket = "bucket"
+    uuid = "5a7c8e3e-0d4f-4a36-9a55-0c6d3bd9e4e1"
+    versions = ["2018-01-01T000000.000000Z", "2018-01-02T000000.000000Z", "2018-01-03T000000.000000Z"]
+
+    def setUp(self):
+        self.handle = FakeBlobStore()
+
+    def test_pointer_only_moves_forward(self):
+        self.assertIsNone(get_latest_version(self.handle, self.bucket, self.uuid))
+        self.assertTrue(update_latest_version(self.handle, self.bucket, self.uuid, self.versions[1]))
+        self.assertFalse(update_latest_version(self.handle, self.bucket, self.uuid, self.versions[0]))
+        self.assertFalse(update_latest_version(self.handle, self.bucket, self.uuid, self.versions[1]))
+        self.assertEqual(get_latest_version(self.handle, self.bucket, self.uuid), self.versions[1])
+        self.assertTrue(update_latest_version(self.handle, self.bucket, self.uuid, self.versions[2]))
+        self.assertEqual(get_latest_version(self.handle, self.bucket, self.uuid), self.versions[2])
+
+    def test_new_pointer_starts_at_the_latest_listed_version(self):
+        # a file written before latest-version pointers existed gets an older version.
+        for version in self.versions[1:]:
+            self.handle.put(self.bucket, f"files/{self.uuid}.{version}")
+        self.handle.put(self.bucket, f"files/{self.uuid}.{self.versions[0]}")
+        self.assertTrue(update_latest_version(self.handle, self.bucket, self.uuid, self.versions[0]))
+        self.assertEqual(get_latest_version(self.handle, self.bucket, self.uuid), self.versions[2])
+
+    def test_concurrent_update_is_retried(self):
+        update_latest_version(self.handle, self.bucket, self.uuid, self.versions[0])
+        upload = self.handle.upload_if_generation_match
+
+        def racing_upload(bucket, key, data, generation):
+            # another writer advances the pointer between our read and our write.
+            self.handle.upload_if_generation_match = upload
+            upload(bucket, key, self.versions[2].encode("utf-8"), generation)
+            upload(bucket, key, data, generation)
+
+        self.handle.upload_if_generation_match = racing_upload
+        self.assertFalse(update_latest_version(self.handle, self.bucket, self.uuid, self.versions[1]))
+        self.assertEqual(get_latest_version(self.handle, self.bucket, self.uuid), self.versions[2])
+
+    def test_cached_lookup(self):
+        now = [0.0]
+        cache = StaleWhileRevalidateCache(fresh_for=5, stale_for=10, max_entries=10, clock=lambda: now[0])
+
+        def lookup():
+            return reads.run(self.handle, files.cached_latest_version_lookup(self.bucket, self.uuid))
+
+        with mock.patch.object(files, "latest_version_cache", cache):
+            update_latest_version(self.handle, self.bucket, self.uuid, self.versions[0])
+            self.assertEqual(lookup(), self.versions[0])
+            self.assertEqual(lookup(), self.versions[0])
+            self.assertEqual(self.handle.gets, 1)
+
+            # another process moves the pointer.  this one serves what it has, and then looks again in the background.
+            self.handle.put(self.bucket, latest_version_key(self.uuid), self.versions[1].encode("utf-8"))
+            self.assertEqual(lookup(), self.versions[0])
+            now[0] = 5.0
+            self.assertEqual(lookup(), self.versions[0])
+            deadline = time.time() + 5
+            while cache.get((self.bucket, self.uuid)) != (self.versions[1], True) and time.time() < deadline:
+                time.sleep(0.001)
+            self.assertEqual(lookup(), self.versions[1])
+
+            # versions written by this process are seen at once.
+            update_latest_version(self.handle, self.bucket, self.uuid, self.versions[2])
+            self.assertEqual(lookup(), self.versions[2])
+
+    def test_cached_lookup_reads_back_writes_while_a_read_is_in_flight(self):
+        cache = StaleWhileRevalidateCache(fresh_for=5, stale_for=10, max_entries=10)
+        update_latest_version(self.handle, self.bucket, self.uuid, self.versions[0])
+        reading, release = threading.Event(), threading.Event()
+        get = self.handle.get
+
+        def slow_get(bucket, key):
+            data = get(bucket, key)
+            if not reading.is_set():
+                reading.set()
+                release.wait(5)
+            return data
+
+        def lookup():
+            return reads.run(self.handle, files.cached_latest_version_lookup(self.bucket, self.uuid))
+
+        results = list()
+        with mock.patch.object(files, "latest_version_cache", cache), \
+                mock.patch.object(self.handle, "get", slow_get):
+            thread = threading.Thread(target=lambda: results.append(lookup()))
+            thread.start()
+            reading.wait(5)
+            self.assertTrue(update_latest_version(self.handle, self.bucket, self.uuid, self.versions[1]))
+            timer = threading.Timer(1, release.set)
+            timer.start()
+            self.addCleanup(timer.cancel)
+            self.assertEqual(lookup(), self.versions[1])
+            release.set()
+            thread.join()
+            # the read that was in flight must not have replaced what this process wrote.
+            self.assertEqual(results, [self.versions[0]])
+            self.assertEqual(lookup(), self.versions[1])
+            self.assertEqual(cache.get((self.bucket, self.uuid)), (self.versions[1], True))
+
+    def test_rebuild(self):
+        for version in self.versions[:2]:
+            self.handle.put(self.bucket, f"files/{self.uuid}.{version}")
+        # the pointer refers to a version that was never written.
+        update_latest_version(self.handle, self.bucket, self.uuid, self.versions[2])
+        self.assertEqual(list(list_file_uuids(self.handle, self.bucket)), [self.uuid])
+        self.assertEqual(rebuild_latest_version(self.handle, self.bucket, self.uuid), self.versions[1])
+        self.assertEqual(get_latest_version(self.handle, self.bucket, self.uuid), self.versions[1])
+
+        for version in self.versions[:2]:
+            self.handle.delete(self.bucket, f"files/{self.uuid}.{version}")
+        self.assertIsNone(rebuild_latest_version(self.handle, self.bucket, self.uuid))
+        self.assertFalse(self.handle.exists(self.bucket, latest_version_key(self.uuid)))
+
+
+class TestCache(unittest.TestCase):
+    def test_lru_evicts_by_size(self):
+        cache = LRUCache(max_size=10)
+        cache.put("a", 1, 4)
+        cache.put("b", 2, 4)
+        self.assertEqual(cache.get("a"), 1)
+        cache.put("c", 3, 4)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), 1)
+        self.assertEqual(cache.get("c"), 3)
+        cache.put("too big", 4, 11)
+        self.assertIsNone(cache.get("too big"))
+        self.assertEqual(cache.stats(), dict(entries=2, size=8, max_size=10, hits=3, misses=2, evictions=1))
+
+    def test_ttl_set_expires(self):
+        now = [0.0]
+        missing = TTLSet(ttl=5, max_entries=2, clock=lambda: now[0])
+        missing.add("a")
+        self.assertIn("a", missing)
+        now[0] = 5.0
+        self.assertNotIn("a", missing)
+
+        for key in ("a", "b", "c"):
+            missing.add(key)
+        self.assertNotIn("a", missing)
+        missing.discard("b")
+        self.assertNotIn("b", missing)
+        self.assertIn("c", missing)
+
+    def test_ttl_set_ignores_members_read_before_a_discard(self):
+        missing = TTLSet(ttl=5, max_entries=2)
+        epoch = missing.epoch
+        missing.discard("a")
+        missing.add("a", epoch)
+        self.assertNotIn("a", missing)
+        missing.add("a", missing.epoch)
+        self.assertIn("a", missing)
+
+
+class TestStaleWhileRevalidateCache(unittest.TestCase):
+    def test_entries_go_stale_then_expire(self):
+        now = [0.0]
+        cache = StaleWhileRevalidateCache(fresh_for=5, stale_for=10, max_entries=2, clock=lambda: now[0])
+        self.assertIsNone(cache.get("a"))
+        cache.put("a", 1, cache.epoch)
+        self.assertEqual(cache.get("a"), (1, True))
+        self.assertFalse(cache.claim_refresh("b"))
+
+        now[0] = 5.0
+        self.assertEqual(cache.get("a"), (1, False))
+        self.assertTrue(cache.claim_refresh("a"))
+        self.assertFalse(cache.claim_refresh("a"))
+        cache.abandon_refresh("a")
+        self.assertTrue(cache.claim_refresh("a"))
+        cache.put("a", 2, cache.epoch)
+        self.assertEqual(cache.get("a"), (2, True))
+
+        now[0] = 20.0
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.stats(), dict(entries=0, fresh_for=5, stale_for=10, hits=2, stale_hits=1, misses=2,
+                                             refreshes=2))
+
+    def test_values_read_before_an_invalidation_are_dropped(self):
+        now = [0.0]
+        cache = StaleWhileRevalidateCache(fresh_for=5, stale_for=10, max_entries=2, clock=lambda: now[0])
+        cache.put("a", 1, cache.epoch)
+        now[0] = 5.0
+        self.assertTrue(cache.claim_refresh("a"))
+        epoch = cache.epoch
+        cache.invalidate("b")
+        cache.put("a", 2, epoch)
+        self.assertEqual(cache.get("a"), (1, False))
+        # the refresh is over, so someone else may try again.
+        self.assertTrue(cache.claim_refresh("a"))
+
+    def test_disabled(self):
+        cache = StaleWhileRevalidateCache(fresh_for=0, stale_for=10, max_entries=2)
+        cache.put("a", 1, cache.epoch)
+        self.assertIsNone(cache.get("a"))
+
+
+class TestSingleFlight(unittest.TestCase):
+    def test_concurrent_calls_are_coalesced(self):
+        flight = SingleFlight()
+        started, release = threading.Event(), threading.Event()
+        calls = list()
+
+        def call():
+            calls.append(None)
+            started.set()
+            release.wait()
+            return len(calls)
+
+        results = list()
+        leader = threading.Thread(target=lambda: results.append(flight.do("key", call)))
+        leader.start()
+        started.wait()
+        followers = [threading.Thread(target=lambda: results.append(flight.do("key", call))) for _ in range(4)]
+        for thread in followers:
+            thread.start()
+        while flight.coalesced < 4:
+            time.sleep(0.001)
+        self.assertEqual(flight.do("other", lambda: "other"), "other")
+        release.set()
+        for thread in [leader] + followers:
+            thread.join()
+        self.assertEqual(results, [1] * 5)
+        self.assertEqual(flight.stats(), dict(calls=2, coalesced=4, in_flight=0))
+
+        # once the call returns, the next one is made afresh.
+        self.assertEqual(flight.do("key", call), 2)
+
+    def test_exceptions_are_shared(self):
+        flight = SingleFlight()
+        with self.assertRaises(BlobNotFoundError):
+            flight.do("key", mock.Mock(side_effect=BlobNotFoundError()))
+        self.assertEqual(flight.stats()['in_flight'], 0)
+
+    def test_async(self):
+        flight = AsyncSingleFlight()
+        calls = list()
+
+        async def call():
+            calls.append(None)
+            await asyncio.sleep(0.01)
+            return len(calls)
+
+        async def main():
+            return await asyncio.gather(*[flight.do("key", call) for _ in range(5)])
+
+        loop = asyncio.new_event_loop()
+        self.addCleanup(loop.close)
+        self.assertEqual(loop.run_until_complete(main()), [1] * 5)
+        self.assertEqual(flight.stats(), dict(calls=1, coalesced=4, in_flight=0))
+
+
+DOCUMENT = {
+    FileMetadata.FORMAT: FileMetadata.FILE_FORMAT_VERSION,
+    FileMetadata.CREATOR_UID: 123,
+    FileMetadata.VERSION: "2018-01-01T012345.678901Z",
+    FileMetadata.CONTENT_TYPE: "application/json; dcp-type=data",
+    FileMetadata.SIZE: 1 << 40,
+    FileMetadata.CRC32C: "352441c2",
+    FileMetadata.S3_ETAG: "900150983cd24fb0d6963f7d28e17f72-17",
+    FileMetadata.SHA1: "a9993e364706816aba3e25717850c26c9cd0d89d",
+    FileMetadata.SHA256: "ba7816bf8f01cfea414140de5dae2223b00361a396177a9cb410ff61f20015ad",
+}
+
+
+class TestFileMetadataRecord(unittest.TestCase):
+    def test_record(self):
+        file_metadata = FileMetadata.from_dict(DOCUMENT)
+        self.assertEqual(file_metadata.to_dict(), DOCUMENT)
+        self.assertEqual(list(file_metadata.to_dict()), list(DOCUMENT))
+        self.assertEqual(file_metadata.blob_key, storage.compose_blob_key(DOCUMENT))
+        self.assertEqual(storage.compose_blob_key(file_metadata), file_metadata.blob_key)
+        self.assertEqual(dict(file_metadata.headers), {
+            'X-DSS-CREATOR-UID': "123",
+            'X-DSS-VERSION': DOCUMENT[FileMetadata.VERSION],
+            'X-DSS-CONTENT-TYPE': DOCUMENT[FileMetadata.CONTENT_TYPE],
+            'X-DSS-SIZE': str(1 << 40),
+            'X-DSS-CRC32C': DOCUMENT[FileMetadata.CRC32C],
+            'X-DSS-S3-ETAG': DOCUMENT[FileMetadata.S3_ETAG],
+            'X-DSS-SHA1': DOCUMENT[FileMetadata.SHA1],
+            'X-DSS-SHA256': DOCUMENT[FileMetadata.SHA256],
+        })
+        self.assertFalse(hasattr(file_metadata, "__dict__"))
+
+    def test_immutable(self):
+        file_metadata = FileMetadata.from_dict(DOCUMENT)
+        with self.assertRaises(AttributeError):
+            file_metadata.size = 0
+        with self.assertRaises(AttributeError):
+            del file_metadata.sha1
+        with self.assertRaises(AttributeError):
+            file_metadata.extra = 0
+        self.assertEqual(file_metadata.size, 1 << 40)
+
+    def test_equality(self):
+        file_metadata = FileMetadata.from_dict(DOCUMENT)
+        self.assertEqual(file_metadata, FileMetadata.from_dict(dict(DOCUMENT)))
+        self.assertEqual(len({file_metadata, FileMetadata.from_dict(DOCUMENT)}), 1)
+        self.assertEqual(pickle.loads(pickle.dumps(file_metadata)), file_metadata)
+
+        compact = FileMetadata.from_dict(dict(DOCUMENT, format=FileMetadata.COMPACT_FORMAT_VERSION))
+        self.assertNotEqual(compact, file_metadata)
+        self.assertTrue(compact.same_file(file_metadata))
+        self.assertFalse(FileMetadata.from_dict(dict(DOCUMENT, size=0)).same_file(file_metadata))
+
+    def test_missing_fields(self):
+        with self.assertRaises(KeyError):
+            FileMetadata.from_dict({k: v for k, v in DOCUMENT.items() if k != FileMetadata.SHA1})
+
+
+class TestFileMetadata(unittest.TestCase):
+    bucket = "bucket"
+    uuid = "5a7c8e3e-0d4f-4a36-9a55-0c6d3bd9e4e1"
+    version = DOCUMENT[FileMetadata.VERSION]
+
+    def setUp(self):
+        self.handle = FakeBlobStore()
+        files.metadata_cache.clear()
+        files.missing_metadata_cache.clear()
+        files.latest_version_cache.clear()
+
+    def test_metadata_is_cached(self):
+        write_file_metadata(self.handle, self.bucket, self.uuid, self.version, json.dumps(DOCUMENT))
+        file_metadata = get_file_metadata(self.handle, self.bucket, self.uuid, self.version)
+        self.assertEqual(file_metadata, FileMetadata.from_dict(DOCUMENT))
+        for _ in range(2):
+            self.assertIs(get_file_metadata(self.handle, self.bucket, self.uuid, self.version), file_metadata)
+        self.assertEqual(self.handle.gets, 1)
+
+    def test_missing_metadata_is_cached_until_written(self):
+        for _ in range(3):
+            with self.assertRaises(BlobNotFoundError):
+                get_file_metadata(self.handle, self.bucket, self.uuid, self.version)
+        self.assertEqual(self.handle.gets, 1)
+
+        write_file_metadata(self.handle, self.bucket, self.uuid, self.version, json.dumps(DOCUMENT))
+        self.assertEqual(get_file_metadata(self.handle, self.bucket, self.uuid, self.version),
+                         FileMetadata.from_dict(DOCUMENT))
+
+    def test_lookup_racing_a_write_is_not_cached_as_missing(self):
+        reading, release = threading.Event(), threading.Event()
+        get = self.handle.get
+
+        def slow_get(bucket, key):
+            try:
+                return get(bucket, key)
+            finally:
+                if not reading.is_set():
+                    reading.set()
+                    release.wait(5)
+
+        results = list()
+
+        def lookup():
+            try:
+                results.append(get_file_metadata(self.handle, self.bucket, self.uuid, self.version))
+            except BlobNotFoundError:
+                results.append(None)
+
+        with mock.patch.object(self.handle, "get", slow_get):
+            thread = threading.Thread(target=lookup)
+            thread.start()
+            reading.wait(5)
+            write_file_metadata(self.handle, self.bucket, self.uuid, self.version, json.dumps(DOCUMENT))
+            release.set()
+            thread.join()
+        self.assertEqual(results, [None])
+        self.assertEqual(get_file_metadata(self.handle, self.bucket, self.uuid, self.version),
+                         FileMetadata.from_dict(DOCUMENT))
+
+    def test_record_file_reads_existing_documents_afresh(self):
+        from drs import DRSException
+        from drs.api.files import record_file
+
+        with self.assertRaises(BlobNotFoundError):
+            get_file_metadata(self.handle, self.bucket, self.uuid, self.version)
+        # another process writes the document while this one remembers it as missing.
+        self.handle.put(self.bucket, f"files/{self.uuid}.{self.version}", json.dumps(DOCUMENT).encode("utf-8"))
+
+        file_metadata = FileMetadata.from_dict(DOCUMENT)
+        self.assertEqual(record_file(self.handle, self.bucket, self.uuid, self.version, file_metadata), 200)
+        self.assertEqual(get_file_metadata(self.handle, self.bucket, self.uuid, self.version), file_metadata)
+        with self.assertRaises(DRSException) as raised:
+            record_file(self.handle, self.bucket, self.uuid, self.version,
+                        FileMetadata.from_dict(dict(DOCUMENT, size=0)))
+        self.assertEqual(raised.exception.status, 409)
+
+    def test_async_put_of_an_existing_version_is_answered_at_once(self):
+        from drs import DRSException
+        from drs.api import files as api_files
+
+        self.handle.upload_file_handle(self.bucket, "staging/abc", io.BytesIO(b"abc"), "application/octet-stream", {
+            'hca-dss-sha256': DOCUMENT[FileMetadata.SHA256],
+            'hca-dss-sha1': DOCUMENT[FileMetadata.SHA1],
+            'hca-dss-s3_etag': "900150983cd24fb0d6963f7d28e17f72",
+            'hca-dss-crc32c': DOCUMENT[FileMetadata.CRC32C],
+        })
+        document = dict(DOCUMENT, **{FileMetadata.CONTENT_TYPE: "application/octet-stream",
+                                     FileMetadata.SIZE: 3,
+                                     FileMetadata.S3_ETAG: "900150983cd24fb0d6963f7d28e17f72"})
+        write_file_metadata(self.handle, self.bucket, self.uuid, self.version, json.dumps(document))
+
+        def ingest(creator_uid):
+            return api_files.ingest_file(
+                self.handle, self.bucket, self.uuid, self.version, f"gs://{self.bucket}/staging/abc", creator_uid)
+
+        with mock.patch.dict(os.environ, DRS_ASYNC_COPY_THRESHOLD="0"), \
+                mock.patch.object(api_files, "submit_copy_job") as submit_copy_job:
+            self.assertEqual(ingest(document[FileMetadata.CREATOR_UID]), (200, None))
+            with self.assertRaises(DRSException) as raised:
+                ingest(456)
+            self.assertEqual(raised.exception.status, 409)
+        submit_copy_job.assert_not_called()
+        self.assertEqual(get_latest_version(self.handle, self.bucket, self.uuid), self.version)
+
+    def test_concurrent_lookups_share_reads(self):
+        write_file_metadata(self.handle, self.bucket, self.uuid, self.version, json.dumps(DOCUMENT))
+        self.handle.latency = 0.1
+        results = list()
+
+        def lookup(version):
+            try:
+                results.append(get_file_metadata(self.handle, self.bucket, self.uuid, version))
+            except BlobNotFoundError:
+                results.append(None)
+
+        threads = [threading.Thread(target=lookup, args=(version,))
+                   for version in [self.version, "2019-01-01T000000.000000Z"] * 4]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(sorted(results, key=str), [FileMetadata.from_dict(DOCUMENT)] * 4 + [None] * 4)
+        self.assertEqual(self.handle.gets, 2)
+
+    def test_reads_are_not_shared_across_writes(self):
+        update_latest_version(self.handle, self.bucket, self.uuid, "2018-01-01T000000.000000Z")
+        reading, release = threading.Event(), threading.Event()
+        get = self.handle.get
+
+        def slow_get(bucket, key):
+            # the first read gets its answer, which is then held up on its way back.
+            data = get(bucket, key)
+            if not reading.is_set():
+                reading.set()
+                release.wait(5)
+            return data
+
+        results = list()
+        with mock.patch.object(self.handle, "get", slow_get):
+            thread = threading.Thread(
+                target=lambda: results.append(get_latest_version(self.handle, self.bucket, self.uuid)))
+            thread.start()
+            reading.wait(5)
+            self.assertTrue(update_latest_version(self.handle, self.bucket, self.uuid, "2018-01-02T000000.000000Z"))
+            # if the lookup joined the read in flight, it would wait for it, so don't let it wait forever.
+            timer = threading.Timer(1, release.set)
+            timer.start()
+            self.addCleanup(timer.cancel)
+            self.assertEqual(get_latest_version(self.handle, self.bucket, self.uuid), "2018-01-02T000000.000000Z")
+            self.assertFalse(release.is_set())
+            release.set()
+            thread.join()
+        self.assertEqual(results, ["2018-01-01T000000.000000Z"])
+
+    def test_concurrent_writes(self):
+        results = list()
+
+        def writer(i):
+            try:
+                write_file_metadata(self.handle, self.bucket, self.uuid, self.version,
+                                    json.dumps(dict(DOCUMENT, creator_uid=i)))
+            except BlobAlreadyExistsError:
+                results.append(None)
+            else:
+                results.append(i)
+
+        threads = [threading.Thread(target=writer, args=(i,)) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        winners = [i for i in results if i is not None]
+        self.assertEqual(len(winners), 1)
+        self.assertEqual(get_file_metadata(self.handle, self.bucket, self.uuid, self.version).creator_uid, winners[0])
+
+
+class TestMetadataEncoding(unittest.TestCase):
+    file_metadata = FileMetadata.from_dict(DOCUMENT)
+
+    def test_round_trip(self):
+        json_document = encoding.encode_file_metadata(self.file_metadata, encoding.JSON)
+        compact_document = encoding.encode_file_metadata(self.file_metadata, encoding.COMPACT)
+        self.assertEqual(encoding.document_encoding(json_document), encoding.JSON)
+        self.assertEqual(encoding.document_encoding(compact_document), encoding.COMPACT)
+        self.assertLess(len(compact_document), len(json_document) / 2)
+
+        self.assertEqual(json.loads(json_document), DOCUMENT)
+        self.assertEqual(encoding.decode_file_metadata(json_document), self.file_metadata)
+        decoded = encoding.decode_file_metadata(compact_document)
+        self.assertEqual(decoded.to_dict(), dict(DOCUMENT, format=FileMetadata.COMPACT_FORMAT_VERSION))
+        self.assertTrue(decoded.same_file(self.file_metadata))
+        self.assertEqual(encoding.encode_file_metadata(decoded, encoding.JSON), json_document)
+
+    def test_unrepresentable_documents_fall_back_to_json(self):
+        for field, value in ((FileMetadata.SHA1, DOCUMENT[FileMetadata.SHA1].upper()),
+                             (FileMetadata.S3_ETAG, "900150983cd24fb0d6963f7d28e17f72-017"),
+                             (FileMetadata.CONTENT_TYPE, None),
+                             (FileMetadata.CREATOR_UID, "someone"),
+                             (FileMetadata.VERSION, "2018-01-01")):
+            with self.subTest(field=field):
+                file_metadata = FileMetadata.from_dict(dict(DOCUMENT, **{field: value}))
+                document = encoding.encode_file_metadata(file_metadata, encoding.COMPACT)
+                self.assertEqual(encoding.document_encoding(document), encoding.JSON)
+                self.assertEqual(encoding.decode_file_metadata(document), file_metadata)
+
+    def test_configured_encoding(self):
+        with mock.patch.dict(os.environ, DRS_METADATA_ENCODING="compact"):
+            document = encoding.encode_file_metadata(self.file_metadata)
+        self.assertEqual(encoding.document_encoding(document), encoding.COMPACT)
+        with mock.patch.dict(os.environ, DRS_METADATA_ENCODING="xml"), self.assertRaises(ValueError):
+            encoding.encode_file_metadata(self.file_metadata)
+
+    def test_migrate(self):
+        handle = FakeBlobStore()
+        files.metadata_cache.clear()
+        files.missing_metadata_cache.clear()
+        uuid, version = "5a7c8e3e-0d4f-4a36-9a55-0c6d3bd9e4e1", DOCUMENT[FileMetadata.VERSION]
+        key = f"files/{uuid}.{version}"
+        write_file_metadata(handle, "bucket", uuid, version, json.dumps(DOCUMENT))
+
+        self.assertTrue(files.migrate_file_metadata(handle, "bucket", key, encoding.COMPACT))
+        self.assertFalse(files.migrate_file_metadata(handle, "bucket", key, encoding.COMPACT))
+        self.assertEqual(encoding.document_encoding(handle.get("bucket", key)), encoding.COMPACT)
+        self.assertTrue(get_file_metadata(handle, "bucket", uuid, version).same_file(self.file_metadata))
+
+        self.assertTrue(files.migrate_file_metadata(handle, "bucket", key, encoding.JSON))
+        self.assertEqual(json.loads(handle.get("bucket", key)), DOCUMENT)
+
+
+class TestMemoryBlobStore(unittest.TestCase):
+    bucket = "bucket"
+
+    def setUp(self):
+        self.handle = MemoryBlobStore()
+
+    def test_blobstore(self):
+        self.handle.upload_file_handle(self.bucket, "dir/a", io.BytesIO(b"abc"), "text/plain", dict(k="v"))
+        self.handle.upload_file_handle(self.bucket, "dir/sub/b", io.BytesIO(b""))
+        self.assertEqual(list(self.handle.list(self.bucket, "dir/")), ["dir/a", "dir/sub/b"])
+        self.assertEqual(list(self.handle.list(self.bucket, "dir/", delimiter="/")), ["dir/a", "dir/sub/"])
+        stat = self.handle.stat(self.bucket, "dir/a")
+        self.assertEqual((stat.size, stat.content_type, stat.user_metadata), (3, "text/plain", dict(k="v")))
+        # the CRC32C of b"abc", as GCS reports it.
+        self.assertEqual(stat.cloud_checksum, "364b3fb7")
+
+        self.handle.copy(self.bucket, "dir/a", "other", "a")
+        self.assertEqual(self.handle.get("other", "a"), b"abc")
+        self.assertTrue(self.handle.check_bucket_exists("other"))
+        self.assertIsNone(self.handle.delete(self.bucket, "dir/a"))
+        with self.assertRaises(BlobNotFoundError):
+            self.handle.get(self.bucket, "dir/a")
+        self.assertIsNone(self.handle.delete(self.bucket, "dir/a"))
+
+    def test_upload_if_absent(self):
+        generation = self.handle.upload_if_absent(self.bucket, "a", b"first")
+        with self.assertRaises(BlobAlreadyExistsError):
+            self.handle.upload_if_absent(self.bucket, "a", b"second")
+        self.assertEqual(self.handle.get_with_generation(self.bucket, "a"), (b"first", generation))
+
+    def test_upload_from_path(self):
+        with tempfile.NamedTemporaryFile() as fh:
+            fh.write(b"abcdef")
+            fh.flush()
+            self.handle.upload_from_path(self.bucket, "a", fh.name, "text/plain", dict(k="v"), part_size=2, workers=2)
+        stat = self.handle.stat(self.bucket, "a")
+        self.assertEqual((stat.size, stat.content_type, stat.user_metadata), (6, "text/plain", dict(k="v")))
+        self.assertEqual(self.handle.get(self.bucket, "a"), b"abcdef")
+
+    def test_get_range(self):
+        self.handle.upload_file_handle(self.bucket, "dir/a", io.BytesIO(b"abcdef"))
+        self.assertEqual(self.handle.get_range(self.bucket, "dir/a", 0, 0), b"a")
+        self.assertEqual(self.handle.get_range(self.bucket, "dir/a", 2, 4), b"cde")
+        self.assertEqual(self.handle.get_range(self.bucket, "dir/a", 4, 9), b"ef")
+        with self.assertRaises(BlobNotFoundError):
+            self.handle.get_range(self.bucket, "dir/b", 0, 1)
+
+
+class TestFilesystemBlobStore(TestMemoryBlobStore):
+    def setUp(self):
+        self.root = tempfile.TemporaryDirectory()
+        self.handle = FilesystemBlobStore(self.root.name)
+
+    def tearDown(self):
+        self.root.cleanup()
+
+    def test_blobs_survive_restart(self):
+        generation = self.handle.upload_if_absent(self.bucket, "dir/a", b"abc")
+        handle = FilesystemBlobStore(self.root.name)
+        self.assertEqual(handle.get_with_generation(self.bucket, "dir/a"), (b"abc", generation))
+        self.assertGreater(handle.upload_if_generation_match(self.bucket, "dir/a", b"def", generation), generation)
+        self.assertEqual(list(handle.list(self.bucket)), ["dir/a"])
+
+
+class TestGSRewrite(unittest.TestCase):
+    def test_invalid_tokens(self):
+        from google.api_core import exceptions
+        handle = DRSGSBlobStore(mock.MagicMock())
+        blob_obj = handle.gcp_client.bucket.return_value.blob.return_value
+        for status in (400, 410):
+            with self.subTest(status=status):
+                blob_obj.rewrite.side_effect = exceptions.from_http_status(status, "invalid token")
+                with self.assertRaises(BlobRewriteTokenError):
+                    handle.rewrite("bucket", "src", "bucket", "dst", token="token")
+                with self.assertRaises(exceptions.GoogleAPICallError):
+                    handle.rewrite("bucket", "src", "bucket", "dst")
+        blob_obj.rewrite.side_effect = exceptions.from_http_status(503, "unavailable")
+        with self.assertRaises(exceptions.ServiceUnavailable):
+            handle.rewrite("bucket", "src", "bucket", "dst", token="token")
+
+
+class TestGSUploadFromPath(unittest.TestCase):
+    def setUp(self):
+        self.handle = DRSGSBlobStore(mock.MagicMock())
+        self.blob_obj = self.handle.gcp_client.bucket.return_value.blob.return_value
+        self.file = tempfile.NamedTemporaryFile()
+        self.addCleanup(self.file.close)
+        self.file.write(b"x" * 1024)
+        self.file.flush()
+
+    def test_large_files_are_uploaded_in_concurrent_parts(self):
+        with mock.patch("drs.storage.gs.transfer_manager.upload_chunks_concurrently") as upload_chunks_concurrently:
+            self.handle.upload_from_path(
+                "bucket", "key", self.file.name, "text/plain", dict(k="v"), part_size=256, workers=4)
+        self.assertEqual(self.blob_obj.metadata, dict(k="v"))
+        upload_chunks_concurrently.assert_called_once_with(
+            self.file.name, self.blob_obj, content_type="text/plain", chunk_size=256, worker_type="thread",
+            max_workers=4)
+        self.blob_obj.upload_from_filename.assert_not_called()
+
+    def test_small_files_are_uploaded_in_one_stream(self):
+        with mock.patch("drs.storage.gs.transfer_manager.upload_chunks_concurrently") as upload_chunks_concurrently:
+            self.handle.upload_from_path("bucket", "key", self.file.name, "text/plain", part_size=1024, workers=4)
+        upload_chunks_concurrently.assert_not_called()
+        self.assertEqual(self.blob_obj.chunk_size, 1024)
+        self.blob_obj.upload_from_filename.assert_called_once_with(self.file.name, content_type="text/plain")
+
+
+class TestBlobStoreSelection(unittest.TestCase):
+    def test_backend_is_chosen_by_environment(self):
+        with mock.patch.dict(os.environ, DRS_BLOBSTORE="memory", DRS_BLOBSTORE_LATENCY="0.5"):
+            handle, _ = storage._create_blobstore_handle()
+        self.assertIsInstance(handle, MemoryBlobStore)
+        self.assertEqual(handle.latency, 0.5)
+
+        with tempfile.TemporaryDirectory() as root:
+            with mock.patch.dict(os.environ, DRS_BLOBSTORE="filesystem", DRS_BLOBSTORE_ROOT=root):
+                handle, _ = storage._create_blobstore_handle()
+            self.assertIsInstance(handle, FilesystemBlobStore)
+            self.assertEqual(handle.root, root)
+
+        with mock.patch.dict(os.environ, DRS_BLOBSTORE="s3"):
+            with self.assertRaises(ValueError):
+                storage._create_blobstore_handle()
+
+    def test_latency_is_injected(self):
+        handle = MemoryBlobStore(latency=0.01)
+        with mock.patch("time.sleep") as sleep:
+            handle.upload_file_handle("bucket", "a", io.BytesIO(b""))
+            handle.get_size("bucket", "a")
+        self.assertEqual(sleep.call_args_list, [mock.call(0.01), mock.call(0.01)])
+
+
+class TestJobs(unittest.TestCase):
+    bucket = "bucket"
+
+    def setUp(self):
+        self.handle = FakeBlobStore()
+
+    def test_job_is_created_once(self):
+        generation = create_job(self.handle, self.bucket, dict(job_id="a"))
+        self.assertIsNotNone(generation)
+        self.assertIsNone(create_job(self.handle, self.bucket, dict(job_id="a")))
+        job, _ = get_job(self.handle, self.bucket, "a")
+        self.assertEqual(job['status'], JobStatus.PENDING)
+
+    def test_claim(self):
+        generation = create_job(self.handle, self.bucket, dict(job_id="a"))
+        with self.subTest("A pending job can only be claimed by its creator"):
+            self.assertIsNone(claim_job(self.handle, self.bucket, "a"))
+            job, generation = claim_job(self.handle, self.bucket, "a", generation)
+            self.assertEqual(job['status'], JobStatus.RUNNING)
+
+        with self.subTest("A running job cannot be claimed again until it is abandoned"):
+            self.assertIsNone(claim_job(self.handle, self.bucket, "a"))
+            with mock.patch.dict(os.environ, DRS_JOB_LEASE_SECONDS="-1"):
+                job, generation = claim_job(self.handle, self.bucket, "a")
+
+        with self.subTest("A failed job can be claimed again"):
+            update_job(self.handle, self.bucket, job, generation, status=JobStatus.FAILED, result=dict(status=500))
+            job, generation = claim_job(self.handle, self.bucket, "a")
+            self.assertIsNone(job['result'])
+
+        with self.subTest("A job that succeeded cannot be claimed"):
+            update_job(self.handle, self.bucket, job, generation, status=JobStatus.SUCCEEDED, result=dict(status=201))
+            with mock.patch.dict(os.environ, DRS_JOB_LEASE_SECONDS="-1"):
+                self.assertIsNone(claim_job(self.handle, self.bucket, "a"))
+
+    def test_failed_job_is_replaced_by_a_retry_with_a_different_payload(self):
+        from drs import DRSException
+        from drs.api import files as api_files
+
+        job = dict(uuid="5a7c8e3e-0d4f-4a36-9a55-0c6d3bd9e4e1", version="2019-01-01T000000.000000Z",
+                   file_metadata=dict(size=1))
+        retry = dict(job, file_metadata=dict(size=2))
+        with mock.patch.object(api_files, "resume_copy_job") as resume_copy_job:
+            job_id = api_files.submit_copy_job(self.handle, self.bucket, job)
+            _, generation = resume_copy_job.call_args[0][2:]
+
+            with self.subTest("A pending job is not replaced"):
+                with self.assertRaises(DRSException) as raised:
+                    api_files.submit_copy_job(self.handle, self.bucket, retry)
+                self.assertEqual(raised.exception.status, 409)
+
+            with self.subTest("A failed job is replaced"):
+                claimed_job, generation = claim_job(self.handle, self.bucket, job_id, generation)
+                update_job(self.handle, self.bucket, claimed_job, generation, status=JobStatus.FAILED,
+                           result=dict(status=500))
+                self.assertEqual(api_files.submit_copy_job(self.handle, self.bucket, retry), job_id)
+                replaced_job, generation = get_job(self.handle, self.bucket, job_id)
+                self.assertEqual(replaced_job['file_metadata'], retry['file_metadata'])
+                self.assertEqual(replaced_job['status'], JobStatus.PENDING)
+                self.assertEqual(resume_copy_job.call_args[0][2:], (job_id, generation))
+
+            with self.subTest("A job that succeeded is not replaced"):
+                claimed_job, generation = claim_job(self.handle, self.bucket, job_id, generation)
+                update_job(self.handle, self.bucket, claimed_job, generation, status=JobStatus.SUCCEEDED,
+                           result=dict(status=201))
+                with self.assertRaises(DRSException) as raised:
+                    api_files.submit_copy_job(self.handle, self.bucket, job)
+                self.assertEqual(raised.exception.status, 409)
+
+
+class SteppedRewriteBlobStore(FakeBlobStore):
+    """Rewrites `step_size` bytes per call, and can be made to fail after a number of calls."""
+    step_size = 4
+
+    def __init__(self):
+        super().__init__()
+        self.rewrites = list()
+        self.fail_after = None
+        self.expired_tokens = set()
+
+    def rewrite(self, src_bucket, src_key, dst_bucket, dst_key, token=None, copy_token=None):
+        if self.fail_after is not None and len(self.rewrites) >= self.fail_after:
+            raise RuntimeError("crashed")
+        if token in self.expired_tokens:
+            self.expired_tokens.remove(token)
+            raise BlobRewriteTokenError("invalid rewrite token")
+        self.rewrites.append(token)
+        data = self.get(src_bucket, src_key)
+        done = int(token or 0) + self.step_size
+        if done < len(data):
+            return RewriteProgress(token=str(done), bytes_rewritten=done, total_bytes=len(data), stat=None)
+        self.put(dst_bucket, dst_key, data)
+        stat = BlobStat(len(data), None, dict(), "crc", self.stat(dst_bucket, dst_key).generation)
+        return RewriteProgress(token=None, bytes_rewritten=len(data), total_bytes=len(data), stat=stat)
+
+
+class TestResumableCopy(unittest.TestCase):
+    bucket = "bucket"
+
+    def setUp(self):
+        self.handle = SteppedRewriteBlobStore()
+        self.handle.put(self.bucket, "src", b"0123456789")
+
+    def checkpoints(self):
+        return list(self.handle.list(self.bucket, "checkpoints/"))
+
+    def test_copy_reports_progress(self):
+        progress = list()
+        stat = resumable_copy(self.handle, self.bucket, "src", self.bucket, "dst",
+                              progress=lambda done, total: progress.append((done, total)))
+        self.assertEqual(stat.size, 10)
+        self.assertEqual(progress, [(4, 10), (8, 10), (10, 10)])
+        self.assertEqual(self.handle.get(self.bucket, "dst"), b"0123456789")
+        self.assertEqual(self.checkpoints(), [])
+
+    def test_copy_resumes_from_checkpoint(self):
+        self.handle.fail_after = 2
+        with self.assertRaises(RuntimeError):
+            resumable_copy(self.handle, self.bucket, "src", self.bucket, "dst")
+        source = dict(src_bucket=self.bucket, src_key="src", copy_token=None)
+        self.assertEqual(self.checkpoints(), [checkpoint_key("dst", source)])
+
+        with self.subTest("Other errors while resuming keep the checkpoint"):
+            with self.assertRaises(RuntimeError):
+                resumable_copy(self.handle, self.bucket, "src", self.bucket, "dst")
+            self.assertEqual(self.checkpoints(), [checkpoint_key("dst", source)])
+
+        self.handle.fail_after = None
+        resumable_copy(self.handle, self.bucket, "src", self.bucket, "dst")
+        self.assertEqual(self.handle.rewrites, [None, "4", "8"])
+        self.assertEqual(self.checkpoints(), [])
+
+    def test_copies_of_different_sources_have_their_own_checkpoints(self):
+        self.handle.put(self.bucket, "other", b"0123456789")
+        self.handle.fail_after = 1
+        for src_key in ("src", "other"):
+            with self.assertRaises(RuntimeError):
+                resumable_copy(self.handle, self.bucket, src_key, self.bucket, "dst")
+            self.handle.fail_after += 1
+        self.assertEqual(len(self.checkpoints()), 2)
+
+        self.handle.fail_after = None
+        resumable_copy(self.handle, self.bucket, "other", self.bucket, "dst")
+        self.assertEqual(self.handle.rewrites[-2:], ["4", "8"])
+        self.assertEqual(self.checkpoints(), [checkpoint_key("dst", dict(src_bucket=self.bucket, src_key="src",
+                                                                         copy_token=None))])
+
+    def test_copy_restarts_if_checkpoint_is_unusable(self):
+        self.handle.fail_after = 1
+        with self.assertRaises(RuntimeError):
+            resumable_copy(self.handle, self.bucket, "src", self.bucket, "dst")
+
+        with self.subTest("A checkpoint for a different source is ignored"):
+            self.handle.fail_after = 2
+            with self.assertRaises(RuntimeError):
+                resumable_copy(self.handle, self.bucket, "src", self.bucket, "dst", copy_token=1)
+            self.assertEqual(self.handle.rewrites, [None, None])
+
+        with self.subTest("An expired token restarts the copy"):
+            self.handle.fail_after = None
+            self.handle.expired_tokens.add("4")
+            resumable_copy(self.handle, self.bucket, "src", self.bucket, "dst", copy_token=1)
+            self.assertEqual(self.handle.rewrites, [None, None, None, "4", "8"])
+
+
+class TestBlobIndex(unittest.TestCase):
+    bucket = "bucket"
+
+    def setUp(self):
+        self.handle = FakeBlobStore()
+        blob_index._indexes.clear()
+
+    def test_membership(self):
+        keys = [f"blobs/{i:064x}.sha1.etag.crc" for i in range(1000)]
+        index = BlobIndex.deserialize(BlobIndex.from_keys(keys).serialize())
+        self.assertTrue(index.persisted)
+        self.assertEqual(len(index), len(keys))
+        self.assertTrue(all(key in index for key in keys))
+        others = [f"blobs/{i:064x}.sha1.etag.crc" for i in range(1000, 2000)]
+        self.assertFalse(any(key in index for key in others))
+        # the bloom filter is sized for a 1% false positive rate.
+        self.assertLess(sum(index.bloom.__contains__(blob_index.blob_key_digest(key)) for key in others), 50)
+
+        index.add(others[0])
+        self.assertIn(others[0], index)
+
+    def test_load_and_rebuild(self):
+        with self.subTest("Without a snapshot, the index is empty"):
+            index = get_blob_index(self.handle, self.bucket)
+            self.assertFalse(index.persisted)
+            self.assertEqual(len(index), 0)
+            index.add("blobs/added")
+            index.add("blobs/a")
+
+        for key in ("blobs/a", "blobs/b", "files/not-a-blob"):
+            self.handle.put(self.bucket, key)
+        self.assertEqual(rebuild_blob_index(self.handle, self.bucket), 2)
+
+        with self.subTest("The snapshot is loaded once the previous copy expires"):
+            self.assertIs(get_blob_index(self.handle, self.bucket), index)
+            with mock.patch.dict(os.environ, DRS_BLOB_INDEX_TTL="0"):
+                index = get_blob_index(self.handle, self.bucket)
+            self.assertTrue(index.persisted)
+            self.assertIn("blobs/a", index)
+            self.assertNotIn("files/not-a-blob", index)
+            # blobs seen by this process are kept across reloads, unless the snapshot has them.
+            self.assertIn("blobs/added", index)
+            self.assertEqual(index.stats()['added_entries'], 1)
+
+    def test_expired_index_is_served_while_it_is_reloaded(self):
+        self.handle.put(self.bucket, "blobs/a")
+        rebuild_blob_index(self.handle, self.bucket)
+        previous = get_blob_index(self.handle, self.bucket)
+        loading, release = threading.Event(), threading.Event()
+        get = self.handle.get
+
+        def slow_get(bucket, key):
+            loading.set()
+            release.wait(5)
+            return get(bucket, key)
+
+        reloaded = list()
+        with mock.patch.dict(os.environ, DRS_BLOB_INDEX_TTL="0"), mock.patch.object(self.handle, "get", slow_get):
+            thread = threading.Thread(target=lambda: reloaded.append(get_blob_index(self.handle, self.bucket)))
+            thread.start()
+            loading.wait(5)
+            # another caller neither waits for the download nor starts one of its own.
+            self.assertIs(get_blob_index(self.handle, self.bucket), previous)
+            release.set()
+            thread.join()
+        self.assertIsNot(reloaded[0], previous)
+        self.assertIs(get_blob_index(self.handle, self.bucket), reloaded[0])
+        self.assertEqual(self.handle.gets, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
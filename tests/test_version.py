@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+Property-based tests showing that the fast version check accepts exactly the versions the full parse accepts.
+"""
+import datetime
+import os
+import sys
+import unittest
+
+from hypothesis import example, given, settings, strategies as st
+
+pkg_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))  # noqa
+sys.path.insert(0, pkg_root)  # noqa
+
+from drs import DRSException, _check_DSS_VERSION, is_DSS_VERSION
+from drs.util.version import datetime_to_version_format, is_version_format
+
+# strings that are close to the format, including separators, time zones and field widths that iso8601 accepts.
+near_versions = st.from_regex(
+    r"[0-9]{3,5}-[0-9]{1,2}-[0-9]{1,3}[Tt ][0-9]{2}:?[0-9]{2}:?[0-9]{2,3}([.,][0-9]{0,7})?([Zz]|[+-]00:?00)?",
+    fullmatch=True)
+
+
+def reference_accepts(val) -> bool:
+    try:
+        _check_DSS_VERSION(val)
+    except DRSException:
+        return False
+    return True
+
+
+def mutate(version: str, position: int, character: str) -> str:
+    position %= len(version)
+    return version[:position] + character + version[position + 1:]
+
+
+class TestVersionFormat(unittest.TestCase):
+    @given(st.datetimes())
+    @example(datetime.datetime(999, 12, 31, 23, 59, 59, 999999))
+    @example(datetime.datetime(2000, 2, 29))
+    def test_formatted_datetimes(self, timestamp):
+        version = datetime_to_version_format(timestamp)
+        self.assertEqual(is_version_format(version), reference_accepts(version))
+        self.assertEqual(is_version_format(version), timestamp.year >= 1000)
+
+    @given(st.text())
+    @example("")
+    @example("2018-01-01T000000.000000Z\n")
+    @example("2018-01-01T000000.000000+00:00")
+    @example("2018-01-01T00:00:00.000000Z")
+    @example("2018-01-01T000000.000000z")
+    @example("2018-01-01t000000.000000Z")
+    @example("2018-01-01T000000,000000Z")
+    @example("2018-01-01T000000.00000Z")
+    @example("２０１８-01-01T000000.000000Z")
+    def test_text(self, val):
+        self.assertEqual(is_version_format(val), reference_accepts(val))
+
+    @settings(max_examples=500)
+    @given(near_versions)
+    @example("2019-02-29T000000.000000Z")
+    @example("2020-02-29T000000.000000Z")
+    @example("2018-04-31T000000.000000Z")
+    @example("2018-13-01T000000.000000Z")
+    @example("2018-01-01T240000.000000Z")
+    @example("2018-01-01T006000.000000Z")
+    @example("2018-01-01T000060.000000Z")
+    @example("0000-01-01T000000.000000Z")
+    def test_near_versions(self, val):
+        self.assertEqual(is_version_format(val), reference_accepts(val))
+
+    @settings(max_examples=500)
+    @given(st.datetimes(min_value=datetime.datetime(1000, 1, 1)), st.integers(), st.characters())
+    def test_mutated_versions(self, timestamp, position, character):
+        val = mutate(datetime_to_version_format(timestamp), position, character)
+        self.assertEqual(is_version_format(val), reference_accepts(val))
+
+    @given(st.one_of(st.none(), st.integers(), st.binary(), st.lists(st.text())))
+    def test_other_types(self, val):
+        self.assertFalse(is_version_format(val))
+
+    def test_errors_are_unchanged(self):
+        for val in ("not a timestamp", "2018-01-01T000000.000000+00:00", "0999-01-01T000000.000000Z"):
+            with self.assertRaises(DRSException) as expected:
+                _check_DSS_VERSION(val)
+            with self.assertRaises(DRSException) as actual:
+                is_DSS_VERSION(val)
+            self.assertEqual((actual.exception.status, actual.exception.code, actual.exception.message),
+                             (expected.exception.status, expected.exception.code, expected.exception.message))
+        self.assertEqual(is_DSS_VERSION("2018-01-01T000000.000000Z"), "2018-01-01T000000.000000Z")
+
+
+if __name__ == '__main__':
+    unittest.main()